@@ -0,0 +1,497 @@
+"""
+Local stand-in for the parts of tidalapi that tidal_api uses, for benchmarks.
+
+A `FakeTidal` holds a catalog (track metadata and track radios), the user's
+favorites and playlists, and hands out sessions with the same surface as a
+tidalapi session: `session.track()`, `track.get_track_radio()`,
+`session.user.favorites`, `session.user.playlists()` (also paged through
+`session.request`), `session.playlist()` and `playlist.items()/add()/delete()`.
+Every upstream call sleeps for a latency drawn from a configurable
+distribution and fails with a configurable error rate.
+
+The data is either synthetic (deterministic for a given seed) or replayed
+from a fixture recorded from a real account:
+
+    python -m benchmarks.fake_tidal record fixture.json
+
+records your favorites, playlists and the radios of some favorites, using
+the session saved by `tidal_login`.
+"""
+import json
+import math
+import time
+import random
+import argparse
+import tempfile
+import threading
+import collections
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from tidalapi.exceptions import MetadataNotAvailable, ObjectNotFound, TooManyRequests
+
+# Longest radio TIDAL returns for a track
+RADIO_SIZE = 100
+
+
+class LatencyModel:
+    """
+    Upstream latency in seconds, from a spec like "fixed:0.05",
+    "uniform:0.02,0.1" or "lognormal:0.05,0.5" (median and sigma).
+    """
+
+    def __init__(self, spec: str = "fixed:0", rng: Optional[random.Random] = None):
+        self.spec = spec
+        self.rng = rng or random.Random()
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",")] if params else [0.0]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+    def sample(self) -> float:
+        if self.kind == "uniform":
+            return self.rng.uniform(*self.params)
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return self.rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return self.params[0]
+
+
+class _Named:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeTrack:
+    def __init__(self, tidal: "FakeTidal", track_id=None, meta: Optional[dict] = None):
+        self._tidal = tidal
+        self.id = track_id
+        meta = meta or {}
+        self.name = meta.get("title")
+        self.artist = _Named(meta.get("artist"))
+        self.album = _Named(meta.get("album"))
+        self.duration = meta.get("duration", 0)
+
+    def get_track_radio(self, limit: int = RADIO_SIZE) -> List["FakeTrack"]:
+        self._tidal.upstream("track_radio")
+        radio = self._tidal.radio(self.id)
+        if radio is None:
+            raise MetadataNotAvailable("Track radio not available for this track")
+        return [self._tidal.make_track(track_id) for track_id in radio[:limit]]
+
+
+class FakePlaylist:
+    def __init__(self, tidal: "FakeTidal", playlist_id: str):
+        self._tidal = tidal
+        self.id = playlist_id
+        self._etag = "fake"
+
+    @property
+    def _data(self) -> dict:
+        return self._tidal.playlists[self.id]
+
+    @property
+    def name(self):
+        return self._data["title"]
+
+    @property
+    def description(self):
+        return self._data["description"]
+
+    @property
+    def created(self):
+        return _datetime(self._data["created"])
+
+    @property
+    def last_updated(self):
+        return _datetime(self._data["last_updated"])
+
+    @property
+    def num_tracks(self):
+        return len(self._data["items"])
+
+    @property
+    def num_videos(self):
+        return 0
+
+    @property
+    def duration(self):
+        return sum(self._tidal.track_meta(track_id)["duration"] for track_id in self._data["items"])
+
+    def items(self, limit: int = 100, offset: int = 0) -> List[FakeTrack]:
+        self._tidal.upstream("playlist_items")
+        item_ids = self._data["items"][offset:offset + min(limit, 100)]
+        return [self._tidal.make_track(track_id) for track_id in item_ids]
+
+    def add(self, media_ids: List, allow_duplicates: bool = False, position: int = -1, limit: int = 100) -> List[int]:
+        self._tidal.upstream("playlist_add")
+        items = self._data["items"]
+        if position < 0 or position > len(items):
+            position = len(items)
+        added = []
+        for track_id in list(media_ids)[:limit]:
+            track_id = int(track_id)
+            if allow_duplicates or (track_id not in items and track_id not in added):
+                added.append(track_id)
+        items[position:position] = added
+        self._data["last_updated"] = _now()
+        return added
+
+    def remove_by_indices(self, indices) -> bool:
+        self._tidal.upstream("playlist_remove")
+        indices = set(indices)
+        self._data["items"] = [track_id for i, track_id in enumerate(self._data["items"]) if i not in indices]
+        self._data["last_updated"] = _now()
+        return True
+
+    def move_by_indices(self, indices, position: int) -> bool:
+        # The items keep their playlist order and go before the item at `position` before the move
+        self._tidal.upstream("playlist_move")
+        items = self._data["items"]
+        if position < 0 or position >= len(items):
+            position = len(items)
+        indices = set(indices)
+        moving = [track_id for i, track_id in enumerate(items) if i in indices]
+        rest = [track_id for i, track_id in enumerate(items) if i not in indices]
+        at = sum(1 for i in range(position) if i not in indices)
+        self._data["items"] = rest[:at] + moving + rest[at:]
+        self._data["last_updated"] = _now()
+        return True
+
+    def edit(self, title: Optional[str] = None, description: Optional[str] = None) -> bool:
+        self._tidal.upstream("playlist_edit")
+        self._data["title"] = title or self._data["title"]
+        self._data["description"] = description or self._data["description"]
+        self._data["last_updated"] = _now()
+        return True
+
+    def delete(self) -> None:
+        self._tidal.upstream("playlist_delete")
+        self._tidal.playlists.pop(self.id, None)
+
+
+class FakeFavorites:
+    def __init__(self, tidal: "FakeTidal", user_id):
+        self._tidal = tidal
+        self.base_url = f"users/{user_id}/favorites"
+
+    def tracks(self, limit: Optional[int] = None, offset: int = 0, order: str = "NAME", order_direction: str = "ASC"):
+        self._tidal.upstream("favorites_tracks")
+        track_ids = self._tidal.favorites[offset:offset + limit if limit else None]
+        return [self._tidal.make_track(track_id) for track_id in track_ids]
+
+
+class FakeUser:
+    def __init__(self, tidal: "FakeTidal"):
+        self._tidal = tidal
+        self.id = tidal.user_id
+        self.username = "benchmark"
+        self.email = "benchmark@example.com"
+        self.favorites = FakeFavorites(tidal, self.id)
+
+    def playlists(self) -> List[FakePlaylist]:
+        self._tidal.upstream("user_playlists")
+        return [FakePlaylist(self._tidal, playlist_id) for playlist_id in self._tidal.playlists]
+
+    def create_playlist(self, title: str, description: str) -> FakePlaylist:
+        self._tidal.upstream("create_playlist")
+        return FakePlaylist(self._tidal, self._tidal.new_playlist(title, description))
+
+
+class _FakeResponse:
+    def __init__(self, json_obj: dict):
+        self._json = json_obj
+
+    def json(self) -> dict:
+        return self._json
+
+
+class FakeRequests:
+    """The raw request helper (session.request), only for paged favorites and playlists."""
+
+    def __init__(self, tidal: "FakeTidal"):
+        self._tidal = tidal
+
+    def request(self, method: str, path: str, params: Optional[dict] = None, **kwargs) -> _FakeResponse:
+        params = params or {}
+        offset = params.get("offset", 0)
+        if method == "GET" and path.endswith("/favorites/tracks"):
+            self._tidal.upstream("favorites_tracks")
+            limit = params.get("limit") or len(self._tidal.favorites)
+            track_ids = self._tidal.favorites[offset:offset + limit]
+            return _FakeResponse({
+                "items": [{"item": self._tidal.track_json(track_id)} for track_id in track_ids],
+                "totalNumberOfItems": len(self._tidal.favorites),
+            })
+        if method == "GET" and path == f"users/{self._tidal.user_id}/playlists":
+            self._tidal.upstream("user_playlists")
+            # TIDAL serves at most 50 playlists per request
+            limit = min(params.get("limit") or 10, 50)
+            playlist_ids = list(self._tidal.playlists)[offset:offset + limit]
+            return _FakeResponse({
+                "items": [self._tidal.playlist_json(playlist_id) for playlist_id in playlist_ids],
+                "totalNumberOfItems": len(self._tidal.playlists),
+            })
+        raise NotImplementedError(f"{method} {path} is not faked")
+
+    @staticmethod
+    def map_json(json_obj: dict, parse=None, session=None):
+        return [parse(item["item"] if "item" in item else item) for item in json_obj["items"]]
+
+
+class FakeSession:
+    def __init__(self, tidal: "FakeTidal"):
+        self._tidal = tidal
+        self.user = FakeUser(tidal)
+        self.request = FakeRequests(tidal)
+
+    def track(self, track_id=None) -> FakeTrack:
+        if track_id is None:
+            return FakeTrack(self._tidal)
+        self._tidal.upstream("track")
+        return self._tidal.make_track(int(track_id))
+
+    def parse_track(self, json_obj: dict) -> FakeTrack:
+        return FakeTrack(self._tidal, json_obj["id"], json_obj)
+
+    def parse_playlist(self, json_obj: dict) -> FakePlaylist:
+        return FakePlaylist(self._tidal, json_obj["uuid"])
+
+    def playlist(self, playlist_id: str) -> FakePlaylist:
+        self._tidal.upstream("playlist")
+        if playlist_id not in self._tidal.playlists:
+            raise ObjectNotFound(f"Playlist {playlist_id} not found")
+        return FakePlaylist(self._tidal, playlist_id)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _datetime(value: Optional[str]) -> Optional[datetime]:
+    # Like tidalapi, playlists without a date have None
+    return datetime.fromisoformat(value) if value else None
+
+
+class FakeTidal:
+    """
+    A fake TIDAL account and catalog.
+
+    Synthetic data is generated from `seed`: a catalog of `catalog_size` tracks,
+    each with a radio, `favorites` favorite tracks and `playlists` playlists of
+    `playlist_size` tracks. A fixture (see `record_fixture`) replaces it with
+    recorded data, which only contains the recorded tracks and radios.
+    """
+
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        error_rate: float = 0.0,
+        seed: int = 0,
+        catalog_size: int = 100000,
+        favorites: int = 500,
+        playlists: int = 20,
+        playlist_size: int = 200,
+        fixture: Optional[dict] = None,
+    ):
+        self.rng = random.Random(seed)
+        self.latency = LatencyModel(latency, self.rng)
+        self.error_rate = error_rate
+        self.seed = seed
+        self.catalog_size = catalog_size
+        self.user_id = 1
+        self.calls = collections.Counter()
+        self._lock = threading.Lock()
+
+        if fixture is not None:
+            self.fixture = True
+            self.tracks: Dict[int, dict] = {int(k): v for k, v in fixture["tracks"].items()}
+            self.radios: Dict[int, List[int]] = {int(k): v for k, v in fixture["radios"].items()}
+            self.favorites: List[int] = list(fixture["favorites"])
+            self.playlists: Dict[str, dict] = fixture["playlists"]
+        else:
+            self.fixture = False
+            self.tracks = {}
+            self.radios = {}
+            self.favorites = self.rng.sample(range(1, catalog_size + 1), min(favorites, catalog_size))
+            self.playlists = {}
+            for i in range(playlists):
+                playlist_id = self.new_playlist(f"Playlist {i}", "")
+                self.playlists[playlist_id]["items"] = self.rng.sample(range(1, catalog_size + 1), playlist_size)
+
+    @classmethod
+    def from_fixture(cls, path: str, **kwargs) -> "FakeTidal":
+        with open(path) as f:
+            return cls(fixture=json.load(f), **kwargs)
+
+    def session(self) -> FakeSession:
+        return FakeSession(self)
+
+    def upstream(self, name: str) -> None:
+        """Account for one upstream call: count it, wait for its latency and maybe fail it."""
+        with self._lock:
+            self.calls[name] += 1
+            delay = self.latency.sample()
+            failed = self.rng.random() < self.error_rate
+        time.sleep(delay)
+        if failed:
+            raise TooManyRequests("Too many requests (fake)")
+
+    def track_meta(self, track_id: int) -> dict:
+        meta = self.tracks.get(track_id)
+        if meta is None:
+            if self.fixture:
+                raise ObjectNotFound(f"Track {track_id} is not in the fixture")
+            meta = {
+                "title": f"Track {track_id}",
+                "artist": f"Artist {track_id % 500}",
+                "album": f"Album {track_id % 2000}",
+                "duration": 120 + track_id % 240,
+            }
+        return meta
+
+    def track_json(self, track_id: int) -> dict:
+        return dict(self.track_meta(track_id), id=track_id)
+
+    def make_track(self, track_id: int) -> FakeTrack:
+        return FakeTrack(self, track_id, self.track_meta(track_id))
+
+    def radio(self, track_id) -> Optional[List[int]]:
+        track_id = int(track_id)
+        if self.fixture:
+            return self.radios.get(track_id)
+        rng = random.Random(self.seed * 1_000_003 + track_id)
+        return rng.sample(range(1, self.catalog_size + 1), RADIO_SIZE)
+
+    def playlist_json(self, playlist_id: str) -> dict:
+        playlist = FakePlaylist(self, playlist_id)
+        return {
+            "uuid": playlist_id,
+            "title": playlist.name,
+            "description": playlist.description,
+            "numberOfTracks": playlist.num_tracks,
+            "duration": playlist.duration,
+            "created": self.playlists[playlist_id]["created"],
+            "lastUpdated": self.playlists[playlist_id]["last_updated"],
+        }
+
+    def new_playlist(self, title: str, description: str) -> str:
+        playlist_id = f"fake-{self.rng.getrandbits(64):016x}"
+        self.playlists[playlist_id] = {
+            "title": title,
+            "description": description,
+            "created": _now(),
+            "last_updated": _now(),
+            "items": [],
+        }
+        return playlist_id
+
+
+def install(session, library_db: Optional[str] = None) -> None:
+    """
+    Make tidal_api use `session` as its authenticated session, with the library
+    mirror and the recommendation graph in throwaway databases, and without the
+    background prefetch (benchmarks measure cold caches). Call before the first
+    request is served.
+    """
+    from tidal_api import app, service
+    from tidal_api.graph import graph
+    from tidal_api.library import library
+    from tidal_api.session_manager import session_manager
+
+    session_file = Path(tempfile.mkstemp(suffix=".json")[1])
+    app.SESSION_FILE = service.SESSION_FILE = session_file
+    try:
+        from tidal_api import asgi
+        asgi.SESSION_FILE = session_file
+    except ImportError:
+        pass
+
+    session_manager.get_session = lambda: session
+    library.path = library_db or tempfile.mkstemp(suffix=".sqlite3")[1]
+    graph.path = tempfile.mkstemp(suffix=".sqlite3")[1]
+    service.prefetcher.enabled = False
+
+
+def record_fixture(session, path: str, favorites: int = 200, radio_seeds: int = 20) -> dict:
+    """
+    Record favorites, playlists (with their tracks) and the radios of the
+    first `radio_seeds` favorites from a real session into a fixture file.
+    """
+    from tidal_api.tracks import TrackRecord
+
+    tracks = {}
+
+    def remember(items) -> List[int]:
+        ids = []
+        for item in items:
+            record = TrackRecord.from_track(item)
+            tracks[record.id] = {
+                "title": record.title,
+                "artist": record.artist,
+                "album": record.album,
+                "duration": record.duration,
+            }
+            ids.append(record.id)
+        return ids
+
+    favorite_ids = remember(
+        session.user.favorites.tracks(limit=favorites, order="DATE", order_direction="DESC")
+    )
+
+    playlists = {}
+    for playlist in session.user.playlists():
+        items = []
+        while len(items) < playlist.num_tracks:
+            page = playlist.items(limit=100, offset=len(items))
+            if not page:
+                break
+            items.extend(remember(page))
+        playlists[str(playlist.id)] = {
+            "title": playlist.name,
+            "description": playlist.description or "",
+            "created": (playlist.created or datetime.now(timezone.utc)).isoformat(),
+            "last_updated": (playlist.last_updated or datetime.now(timezone.utc)).isoformat(),
+            "items": items,
+        }
+
+    radios = {}
+    for track_id in favorite_ids[:radio_seeds]:
+        try:
+            radios[track_id] = remember(session.track(track_id).get_track_radio(limit=RADIO_SIZE))
+        except (MetadataNotAvailable, ObjectNotFound):
+            pass
+
+    fixture = {"tracks": tracks, "radios": radios, "favorites": favorite_ids, "playlists": playlists}
+    with open(path, "w") as f:
+        json.dump(fixture, f)
+    return fixture
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record a fixture for the fake TIDAL backend.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record = subparsers.add_parser("record", help="record a fixture from your TIDAL account")
+    record.add_argument("path")
+    record.add_argument("--favorites", type=int, default=200)
+    record.add_argument("--radio-seeds", type=int, default=20)
+    args = parser.parse_args()
+
+    from tidal_api.session_manager import session_manager
+
+    session = session_manager.get_session()
+    if session is None:
+        raise SystemExit("No TIDAL session found, login with the tidal_login tool first")
+
+    fixture = record_fixture(session, args.path, args.favorites, args.radio_seeds)
+    print(
+        f"Recorded {len(fixture['tracks'])} tracks, {len(fixture['favorites'])} favorites, "
+        f"{len(fixture['playlists'])} playlists and {len(fixture['radios'])} radios to {args.path}"
+    )
+
+
+if __name__ == "__main__":
+    main()
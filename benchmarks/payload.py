@@ -0,0 +1,98 @@
+"""
+Response size and serialization cost of batch recommendations, by response format.
+
+Builds the payload of a batch request (20 seeds x 50 tracks by default) on the
+fake TIDAL backend, then measures for every format (full rows, projected rows,
+columnar) and codec (json, orjson if installed):
+- bytes on the wire, uncompressed and gzip-compressed
+- encode and decode time per response (median), and the gzip time
+
+"rows / json" with the full track dicts is the format before projection,
+columnar encoding and the fast codec were added.
+
+Usage (from the project root):
+    python -m benchmarks.payload [--seeds 20] [--limit-per-track 50] [--ranked]
+"""
+import json
+import gzip
+import time
+import argparse
+import statistics
+
+from typing import Callable, List, Tuple
+
+from benchmarks.fake_tidal import FakeTidal, install
+
+
+def median_time(fn: Callable, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def codecs() -> List[Tuple[str, Callable, Callable]]:
+    available = [(
+        "json",
+        lambda payload: json.dumps(payload).encode("utf-8"),
+        json.loads,
+    )]
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        available.append(("orjson", orjson.dumps, orjson.loads))
+    return available
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seeds", type=int, default=20)
+    parser.add_argument("--limit-per-track", type=int, default=50)
+    parser.add_argument("--ranked", action="store_true", help="measure the ranked top-K instead of every seed's radio")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    fake = FakeTidal(favorites=args.seeds)
+    install(fake.session())
+
+    from tidal_api import service
+    from tidal_api.encoding import GZIP_LEVEL, parse_view
+
+    request = {
+        "track_ids": [str(track_id) for track_id in fake.favorites[:args.seeds]],
+        "limit_per_track": args.limit_per_track,
+        "rank": args.ranked,
+    }
+    payload, status = service.get_batch_recommendations(fake.session(), request)
+    if status != 200:
+        raise RuntimeError(payload)
+    print(f"{len(payload['recommendations'])} recommendations from {args.seeds} seeds\n")
+
+    formats = [
+        ("rows", None, None),
+        ("rows id,title,artist", "id,title,artist", None),
+        ("columnar", None, "columnar"),
+        ("columnar id,title,artist", "id,title,artist", "columnar"),
+    ]
+    print(f"{'format':<26} {'codec':<7} {'bytes':>8} {'gzip':>7} {'encode':>9} {'decode':>9} {'gzip':>9}")
+    for name, fields, fmt in formats:
+        view, _ = parse_view(fields, fmt)
+        shaped = view.apply(payload)
+        for codec, dumps, loads in codecs():
+            body = dumps(shaped)
+            compressed = gzip.compress(body, GZIP_LEVEL)
+            encode = median_time(lambda: dumps(view.apply(payload)), args.repeat)
+            decode = median_time(lambda: loads(body), args.repeat)
+            compress = median_time(lambda: gzip.compress(body, GZIP_LEVEL), args.repeat)
+            print(
+                f"{name:<26} {codec:<7} {len(body):>8} {len(compressed):>7} "
+                f"{encode * 1000:>7.2f}ms {decode * 1000:>7.2f}ms {compress * 1000:>7.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
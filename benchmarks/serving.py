@@ -0,0 +1,208 @@
+"""
+Benchmark the serving engines of tidal_api against each other: Flask's
+development server, waitress (at several thread counts) and ASGI.
+
+Each app is started in a subprocess on a local port, backed by the fake TIDAL
+backend (fake_tidal.py) with a fixed upstream latency, and loaded
+with concurrent batch recommendation requests. Every request asks for a new
+seed, so nothing is served from the radio cache. Reported per mode: throughput,
+latency percentiles and the peak number of threads in the server process
+(Linux only).
+
+Usage (from the project root):
+    python -m benchmarks.serving [--requests 400] [--concurrency 100] [--latency 0.05]
+                                 [--engines flask,waitress,asgi] [--threads 4,8,16,32]
+"""
+import os
+import sys
+import time
+import socket
+import logging
+import argparse
+import itertools
+import contextlib
+import subprocess
+
+from typing import Optional
+
+import anyio
+import httpx
+import uvicorn
+
+from werkzeug.serving import make_server
+
+from benchmarks.fake_tidal import FakeTidal, install
+from tidal_api import app as flask_app
+from tidal_api import asgi as asgi_app
+from tidal_api import wsgi as wsgi_app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(mode: str, port: int, latency: float, threads: int) -> None:
+    """Serve one app in this process, authenticated with a fake session."""
+    install(FakeTidal(latency=f"fixed:{latency}").session())
+
+    # Keep the per-request output of the apps out of the measurement
+    sys.stdout = open(os.devnull, "w")
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    if mode == "flask":
+        make_server("127.0.0.1", port, flask_app.app, threaded=True).serve_forever()
+    elif mode == "waitress":
+        logging.getLogger("waitress").setLevel(logging.ERROR)
+        wsgi_app.serve(wsgi_app.create_server(port, threads=threads))
+    else:
+        uvicorn.run(asgi_app.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server(mode: str, latency: float, threads: int, connections: int):
+    port = _free_port()
+    # Every load worker keeps a connection open, waitress must accept all of them
+    env = dict(os.environ, TIDAL_MCP_WSGI_CONNECTIONS=str(max(connections + 10, 100)))
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.serving",
+        "--serve", mode, "--port", str(port), "--latency", str(latency), "--threads", str(threads),
+    ], env=env)
+
+    # Wait until the server accepts connections
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def thread_count(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+async def run_load(base_url: str, server_pid: int, seeds, requests: int, concurrency: int) -> dict:
+    """
+    `requests` batch requests from `concurrency` workers, each with its own
+    keep-alive connection, like that many MCP servers with their own client.
+
+    A single httpx client shared by all workers would measure the client instead:
+    its connection pool does work proportional to the number of open connections
+    on every request, which with 100 kept-alive connections used several times
+    the CPU of the server. Servers closing their connections after every
+    response (Flask's development server) hid that cost.
+    """
+    latencies = []
+    errors = 0
+    peak_threads = None
+    remaining = requests
+
+    async def one(client):
+        nonlocal errors
+        payload = {"track_ids": [str(next(seeds))], "limit_per_track": 10}
+        started = time.perf_counter()
+        response = await client.post("/api/recommendations/batch", json=payload)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors += 1
+
+    async def worker(client):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await one(client)
+
+    async def sample_threads(done: anyio.Event):
+        nonlocal peak_threads
+        while not done.is_set():
+            threads = thread_count(server_pid)
+            if threads is not None:
+                peak_threads = max(peak_threads or 0, threads)
+            await anyio.sleep(0.01)
+
+    async with contextlib.AsyncExitStack() as stack:
+        clients = [
+            await stack.enter_async_context(httpx.AsyncClient(base_url=base_url, timeout=60))
+            for _ in range(concurrency)
+        ]
+        # Open the keep-alive connections first, like the MCP server's pooled client would have
+        async with anyio.create_task_group() as warmup:
+            for client in clients:
+                warmup.start_soon(one, client)
+        latencies.clear()
+        errors = 0
+
+        done = anyio.Event()
+        started = time.perf_counter()
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(sample_threads, done)
+            async with anyio.create_task_group() as load:
+                for client in clients:
+                    load.start_soon(worker, client)
+            done.set()
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "throughput": requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "errors": errors,
+        "peak_threads": peak_threads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake upstream latency in seconds")
+    parser.add_argument("--engines", default="flask,waitress,asgi", help="engines to compare")
+    parser.add_argument("--threads", default="4,8,16,32", help="waitress thread counts to compare")
+    parser.add_argument("--serve", choices=["flask", "waitress", "asgi"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.latency, int(args.threads))
+        return
+
+    runs = []
+    for engine in args.engines.split(","):
+        if engine == "waitress":
+            runs += [(engine, int(threads)) for threads in args.threads.split(",")]
+        else:
+            runs.append((engine, 0))
+
+    seeds = itertools.count(1)
+    for mode, threads in runs:
+        process, port = start_server(mode, args.latency, threads, args.concurrency)
+        try:
+            result = anyio.run(
+                run_load, f"http://127.0.0.1:{port}", process.pid, seeds, args.requests, args.concurrency
+            )
+        finally:
+            process.terminate()
+            process.wait()
+        peak_threads = result['peak_threads'] if result['peak_threads'] is not None else "n/a"
+        name = f"{mode} ({threads} threads)" if threads else mode
+        print(
+            f"{name:>21}: {result['throughput']:7.1f} req/s  "
+            f"p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms  "
+            f"peak threads {peak_threads:>4}  errors {result['errors']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Cold-start time of the MCP server: how long an MCP client waits from
+launching the server until its tool list, and until the first tool result.
+
+The MCP server is launched over stdio like an MCP client would, once per
+startup configuration:
+- embedded: tidal_api loaded in the MCP server process
+- http: backend started on the first tool call with this interpreter
+- http (uv): the same, launched with `uv run` (only if uv is installed)
+- http (reuse): a backend is already running on the port and gets reused
+- http (eager): backend started when the MCP server loads, as before lazy start
+
+The first tool call is `get_server_metrics`, which needs the backend but not
+a TIDAL login.
+
+Usage (from the project root):
+    python -m benchmarks.startup [--runs 3]
+"""
+import os
+import sys
+import time
+import shutil
+import signal
+import socket
+import argparse
+import statistics
+import subprocess
+
+from typing import Dict, List
+
+import anyio
+import httpx
+
+from mcp import ClientSession
+from mcp.client.stdio import StdioServerParameters, stdio_client
+
+PROJECT_ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+SERVER_SCRIPT = os.path.join(PROJECT_ROOT, "mcp_server", "server.py")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_backend(port: int) -> subprocess.Popen:
+    """Run a tidal_api backend on `port` and wait until it answers /health."""
+    env = dict(os.environ, TIDAL_MCP_PORT=str(port), PYTHONPATH=PROJECT_ROOT)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "tidal_api.app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        # Its own process group, so stopping it also stops the reloader's server process
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    os.killpg(process.pid, signal.SIGKILL)
+    raise RuntimeError("backend did not start")
+
+
+async def measure_once(env: Dict[str, str], errlog) -> dict:
+    params = StdioServerParameters(command=sys.executable, args=[SERVER_SCRIPT], env=env, cwd=PROJECT_ROOT)
+    started = time.perf_counter()
+    async with stdio_client(params, errlog=errlog) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            await session.list_tools()
+            tools_listed = time.perf_counter()
+            result = await session.call_tool("get_server_metrics")
+            first_result = time.perf_counter()
+    if result.isError:
+        raise RuntimeError(f"get_server_metrics failed: {result.content}")
+    return {
+        "tools_listed_ms": (tools_listed - started) * 1000,
+        "first_tool_result_ms": (first_result - started) * 1000,
+    }
+
+
+def measure(overrides: Dict[str, str], runs: int, errlog, reuse: bool = False) -> dict:
+    timings: List[dict] = []
+    for _ in range(runs):
+        port = _free_port()
+        env = dict(os.environ, TIDAL_MCP_PORT=str(port), **overrides)
+        backend = start_backend(port) if reuse else None
+        try:
+            timings.append(anyio.run(measure_once, env, errlog))
+        finally:
+            if backend is not None:
+                os.killpg(backend.pid, signal.SIGTERM)
+                backend.wait()
+    return {metric: statistics.median(t[metric] for t in timings) for metric in timings[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3, help="launches per configuration (the median is reported)")
+    parser.add_argument("--verbose", action="store_true", help="show the MCP server's stderr")
+    args = parser.parse_args()
+
+    errlog = sys.stderr if args.verbose else open(os.devnull, "w")
+    scenarios = [
+        ("embedded", {"TIDAL_MCP_MODE": "embedded"}, False),
+        ("http", {"TIDAL_MCP_MODE": "http", "TIDAL_MCP_LAUNCHER": "python"}, False),
+    ]
+    if shutil.which("uv"):
+        scenarios.append(("http (uv)", {"TIDAL_MCP_MODE": "http", "TIDAL_MCP_LAUNCHER": "uv"}, False))
+    scenarios += [
+        ("http (reuse)", {"TIDAL_MCP_MODE": "http"}, True),
+        ("http (eager)", {"TIDAL_MCP_MODE": "http", "TIDAL_MCP_LAUNCHER": "python", "TIDAL_MCP_START": "eager"}, False),
+    ]
+
+    for name, overrides, reuse in scenarios:
+        result = measure(overrides, args.runs, errlog, reuse=reuse)
+        print(
+            f"{name:<14} tools listed {result['tools_listed_ms']:7.0f} ms  "
+            f"first tool result {result['first_tool_result_ms']:7.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Benchmark suite for the MCP tools, backed by the fake TIDAL backend (fake_tidal.py).
+
+Measures:
+- end-to-end latency of every MCP tool (first call, then the median and p95 of repeated calls)
+- batch recommendation fan-out time and throughput for growing seed counts
+- memory: peak Python allocations per phase and the process's max RSS
+
+Results can be saved with --save and compared against a saved baseline with
+--baseline; the run fails if any metric regressed by more than --tolerance.
+
+Usage (from the project root):
+    python -m benchmarks.suite [--latency lognormal:0.08,0.4] [--error-rate 0] [--fixture fixture.json]
+                               [--mode embedded|http] [--save results.json] [--baseline results.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import statistics
+import threading
+import tracemalloc
+import contextlib
+
+from typing import Callable, Dict, List
+
+import anyio
+
+PROJECT_ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.fake_tidal import FakeTidal, install
+
+
+def load_tools(mode: str):
+    """
+    Import the MCP server module (the tools) with an embedded backend, and
+    point it at an in-process Flask app over HTTP if `mode` is "http".
+    """
+    os.environ["TIDAL_MCP_MODE"] = "embedded"
+    sys.path.insert(0, os.path.join(PROJECT_ROOT, "mcp_server"))
+    with contextlib.redirect_stdout(sys.stderr):
+        import server
+
+    if mode == "http":
+        from werkzeug.serving import make_server
+        from backend import HttpBackend
+        from client import BackendClient
+        from tidal_api.app import app
+
+        http_server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=http_server.serve_forever, daemon=True).start()
+        server.backend = HttpBackend(BackendClient(base_url=f"http://127.0.0.1:{http_server.server_port}"))
+
+    server.auth_state.mark_authenticated()
+    return server
+
+
+def clear_caches() -> None:
+    from tidal_api.cache import radio_cache
+    from tidal_api.tracks import track_cache
+
+    radio_cache.clear()
+    track_cache.clear()
+
+
+def measure(fn: Callable, iterations: int) -> dict:
+    """Time `fn` once from cold caches, then `iterations` more times."""
+    clear_caches()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    result = fn()
+    first = time.perf_counter() - started
+    if isinstance(result, dict) and result.get("status") == "error":
+        raise RuntimeError(result.get("message"))
+
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+
+    return {
+        "first_ms": first * 1000,
+        "median_ms": statistics.median(timings) * 1000 if timings else first * 1000,
+        "p95_ms": timings[max(int(len(timings) * 0.95) - 1, 0)] * 1000 if timings else first * 1000,
+        "peak_alloc_kb": tracemalloc.get_traced_memory()[1] / 1024,
+    }
+
+
+def tool_benchmarks(server, tidal: FakeTidal, iterations: int) -> Dict[str, dict]:
+    playlist_id = next(iter(tidal.playlists))
+    seeds = [str(track_id) for track_id in tidal.favorites[:10]]
+    new_tracks = [str(track_id) for track_id in tidal.favorites[:250]]
+
+    def recommend():
+        return anyio.run(lambda: server.recommend_tracks(track_ids=seeds, limit_per_track=20))
+
+    created = []
+
+    def create():
+        result = server.create_tidal_playlist("Benchmark", new_tracks)
+        created.append(result["playlist"]["id"])
+        return result
+
+    def delete():
+        return server.delete_tidal_playlist(created.pop())
+
+    cases = {
+        "tidal_login": lambda: server.tidal_login(),
+        "get_favorite_tracks": lambda: server.get_favorite_tracks(limit=50),
+        "get_favorite_tracks(refresh)": lambda: server.get_favorite_tracks(limit=50, refresh=True),
+        "get_user_playlists": lambda: server.get_user_playlists(),
+        "get_playlist_tracks": lambda: server.get_playlist_tracks(playlist_id, limit=200),
+        "recommend_tracks": recommend,
+        "create_tidal_playlist": create,
+        "delete_tidal_playlist": delete,
+    }
+    results = {}
+    for name, fn in cases.items():
+        # Every delete needs a playlist created before it
+        count = iterations if name != "delete_tidal_playlist" else len(created) - 1
+        results[name] = measure(fn, count)
+    return results
+
+
+def fanout_benchmarks(tidal: FakeTidal, seed_counts: List[int]) -> Dict[str, dict]:
+    from tidal_api import service
+
+    session = tidal.session()
+    rng = random.Random(0)
+    results = {}
+    for count in seed_counts:
+        seeds = [str(track_id) for track_id in rng.sample(range(1, tidal.catalog_size + 1), count)]
+        clear_caches()
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stderr):
+            _, status = service.get_batch_recommendations(session, {"track_ids": seeds, "limit_per_track": 20})
+        elapsed = time.perf_counter() - started
+        if status != 200:
+            raise RuntimeError(f"Batch recommendations failed with status {status}")
+        results[f"fanout_{count}"] = {
+            "elapsed_ms": elapsed * 1000,
+            "seeds_per_s": count / elapsed,
+            "peak_alloc_kb": tracemalloc.get_traced_memory()[1] / 1024,
+        }
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Metrics that got worse than the baseline by more than `tolerance` (a fraction)."""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            before = baseline.get(name, {}).get(metric)
+            if not before:
+                continue
+            # Throughput should go up, everything else down
+            change = (before - value) / before if metric.endswith("_per_s") else (value - before) / before
+            if change > tolerance:
+                regressions.append(f"{name}.{metric}: {before:.1f} -> {value:.1f} ({change:+.0%})")
+    return regressions
+
+
+def print_table(results: dict) -> None:
+    for name, metrics in results.items():
+        values = "  ".join(f"{metric} {value:9.1f}" for metric, value in metrics.items())
+        print(f"{name:<30} {values}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", default="lognormal:0.08,0.4", help="upstream latency distribution, see LatencyModel")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls that fail")
+    parser.add_argument("--fixture", help="replay a recorded fixture instead of synthetic data")
+    parser.add_argument("--mode", choices=["embedded", "http"], default="embedded")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--seeds", default="1,5,10,20,50", help="seed counts for the fan-out benchmark")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression against the baseline")
+    args = parser.parse_args()
+
+    options = {"latency": args.latency, "error_rate": args.error_rate}
+    tidal = FakeTidal.from_fixture(args.fixture, **options) if args.fixture else FakeTidal(**options)
+    install(tidal.session())
+    server = load_tools(args.mode)
+
+    tracemalloc.start()
+    results = tool_benchmarks(server, tidal, args.iterations)
+    results.update(fanout_benchmarks(tidal, [int(n) for n in args.seeds.split(",")]))
+    tracemalloc.stop()
+
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results["process"] = {"max_rss_kb": max_rss / 1024 if sys.platform == "darwin" else max_rss}
+
+    print_table(results)
+    print(f"upstream calls: {dict(tidal.calls)}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
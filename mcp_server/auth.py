@@ -0,0 +1,52 @@
+import os
+import threading
+import time
+
+from typing import Callable
+
+# How long (in seconds) a successful authentication status is trusted before asking the backend again
+AUTH_STATUS_TTL = float(os.environ.get("TIDAL_MCP_AUTH_TTL", 300))
+
+
+class AuthState:
+    """
+    Caches the backend's authentication status so that tool calls don't have to
+    hit /api/auth/status before every request.
+
+    Only a successful status is cached: it expires after `ttl` seconds, and callers
+    invalidate it as soon as any endpoint answers with 401. A negative status is
+    asked again on every call, so a login made elsewhere (another client of the
+    same backend, a shared session file) is picked up right away.
+    """
+
+    def __init__(self, fetch_status: Callable[[], dict], ttl: float = AUTH_STATUS_TTL):
+        self._fetch_status = fetch_status
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._authenticated = False
+        self._expires_at = 0.0
+
+    def is_authenticated(self) -> bool:
+        """Return the cached authentication state, refreshing it from the backend when stale."""
+        with self._lock:
+            if time.monotonic() < self._expires_at:
+                return self._authenticated
+
+            auth_data = self._fetch_status()
+            self._set(auth_data.get("authenticated", False))
+            return self._authenticated
+
+    def mark_authenticated(self) -> None:
+        """Record a successful login without another round trip."""
+        with self._lock:
+            self._set(True)
+
+    def invalidate(self) -> None:
+        """Forget the cached state, e.g. after the backend returned 401."""
+        with self._lock:
+            self._authenticated = False
+            self._expires_at = 0.0
+
+    def _set(self, authenticated: bool) -> None:
+        self._authenticated = authenticated
+        self._expires_at = time.monotonic() + self.ttl if authenticated else 0.0
@@ -0,0 +1,340 @@
+import sys
+import time
+import logging
+import threading
+import contextlib
+
+import requests
+
+from client import BackendClient
+from tidal_api.encoding import apply_view, loads, parse_view
+from utils import (
+    start_flask_app,
+    shutdown_flask_app,
+    wait_for_backend,
+    BACKEND_MODE,
+    BACKEND_SERVICE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_LOGIN_TIMEOUT,
+)
+
+logger = logging.getLogger("mcp_server.backend")
+
+
+class DecodedResponse:
+    """
+    Minimal stand-in for `requests.Response` holding the decoded JSON body,
+    so tools can handle both backends the same way.
+    """
+
+    def __init__(self, data: dict, status_code: int):
+        self._data = data
+        self.status_code = status_code
+
+    def json(self) -> dict:
+        return self._data
+
+
+class StreamedResponse:
+    """
+    Response whose body is a sequence of JSON objects (NDJSON over HTTP),
+    consumed incrementally with `iter_chunks()`. For non-200 responses the
+    error body is available from `json()`.
+    """
+
+    def __init__(self, status_code: int, chunks=None, error: dict = None):
+        self.status_code = status_code
+        self._chunks = chunks if chunks is not None else iter(())
+        self._error = error
+
+    def json(self) -> dict:
+        return self._error
+
+    def iter_chunks(self):
+        return self._chunks
+
+
+def _fields_param(fields):
+    """The `fields` query parameter for a list of fields (None leaves it out)."""
+    return ",".join(fields) if fields else None
+
+
+def _project(response: DecodedResponse, fields) -> DecodedResponse:
+    """Keep only `fields` of the tracks in an embedded response, like the routes' `fields` parameter."""
+    if not fields:
+        return response
+    view, error = parse_view(fields)
+    if error:
+        return DecodedResponse(*error)
+    return DecodedResponse(*apply_view((response.json(), response.status_code), view))
+
+
+def _iter_ndjson(response):
+    """Decode a streamed NDJSON HTTP response one line at a time."""
+    with response:
+        for line in response.iter_lines():
+            if line:
+                yield loads(line)
+
+
+class HttpBackend:
+    """
+    Talks to the tidal_api Flask app running as a separate process over HTTP,
+    through a pooled keep-alive client (optionally over a Unix domain socket).
+
+    The app is started on the first request, unless one is already answering
+    /health on the configured port, in which case that one is reused.
+    """
+
+    def __init__(self, client: BackendClient = None):
+        self.client = client or BackendClient()
+        self._start_lock = threading.Lock()
+        self._started = False
+        # Seconds from the first request until the backend answered
+        self.startup_seconds = None
+
+    def start(self):
+        """Make sure a backend is serving, starting one if needed. Safe to call repeatedly."""
+        with self._start_lock:
+            if self._started:
+                return
+            started = time.perf_counter()
+
+            health = self.client.health()
+            if health is not None and health.get("service") != BACKEND_SERVICE:
+                raise RuntimeError(
+                    f"Another service is listening at {self.client.base_url}, set TIDAL_MCP_PORT to a free port"
+                )
+            if health:
+                logger.info("Reusing the TIDAL backend already running at %s", self.client.base_url)
+            else:
+                start_flask_app()
+                try:
+                    wait_for_backend(self.client)
+                except Exception:
+                    shutdown_flask_app()
+                    raise
+
+            self.startup_seconds = time.perf_counter() - started
+            logger.info("TIDAL backend ready in %.2fs", self.startup_seconds)
+            self._started = True
+
+    def shutdown(self):
+        self.client.close()
+        shutdown_flask_app()
+
+    def _request(self, method: str, path: str, **kwargs):
+        """
+        Send a request to the backend. Streamed requests return the `requests.Response`,
+        the others a DecodedResponse (decoded with the backend's fast JSON codec).
+        """
+        self.start()
+        try:
+            response = self.client.request(method, path, **kwargs)
+        except requests.ConnectionError:
+            if self.client.health() is not None:
+                raise
+            # The backend is gone (e.g. the reused one belonged to another MCP server
+            # that exited): start a new one, and resend the request if that is safe
+            with self._start_lock:
+                self._started = False
+            self.start()
+            if method == "POST":
+                raise
+            response = self.client.request(method, path, **kwargs)
+
+        if kwargs.get("stream"):
+            return response
+        try:
+            data = loads(response.content)
+        except ValueError:
+            data = {"error": f"Invalid response from the TIDAL backend (HTTP {response.status_code})"}
+        return DecodedResponse(data, response.status_code)
+
+    def auth_login(self):
+        return self._request("GET", "/api/auth/login", timeout=(HTTP_CONNECT_TIMEOUT, HTTP_LOGIN_TIMEOUT))
+
+    def auth_status(self):
+        return self._request("GET", "/api/auth/status")
+
+    def get_tracks(self, limit: int, cursor: str = None, max_age: float = None, fields: list = None):
+        return self._request(
+            "GET",
+            "/api/tracks",
+            params={"limit": limit, "cursor": cursor, "max_age": max_age, "fields": _fields_param(fields)},
+        )
+
+    def stream_batch_recommendations(self, payload: dict, fields: list = None):
+        response = self._request(
+            "POST",
+            "/api/recommendations/batch/stream",
+            params={"fields": _fields_param(fields)},
+            json=payload,
+            stream=True,
+        )
+        if response.status_code != 200:
+            with response:
+                return StreamedResponse(response.status_code, error=response.json())
+        return StreamedResponse(200, chunks=_iter_ndjson(response))
+
+    def expand_recommendations(self, payload: dict):
+        return self._request("POST", "/api/recommendations/expand", json=payload)
+
+    def create_playlist(self, payload: dict):
+        return self._request("POST", "/api/playlists", json=payload)
+
+    def get_user_playlists(
+        self, limit: int, cursor: str = None, sort: str = "last_updated", order: str = None,
+        fields: list = None, max_age: float = None,
+    ):
+        return self._request(
+            "GET",
+            "/api/playlists",
+            params={
+                "limit": limit, "cursor": cursor, "sort": sort, "order": order,
+                "fields": _fields_param(fields), "max_age": max_age,
+            },
+        )
+
+    def get_playlist_tracks(
+        self, playlist_id: str, limit: int, cursor: str = None, max_age: float = None, fields: list = None
+    ):
+        return self._request(
+            "GET",
+            f"/api/playlists/{playlist_id}/tracks",
+            params={"limit": limit, "cursor": cursor, "max_age": max_age, "fields": _fields_param(fields)},
+        )
+
+    def update_playlist(self, playlist_id: str, payload: dict):
+        return self._request("PATCH", f"/api/playlists/{playlist_id}", json=payload)
+
+    def delete_playlist(self, playlist_id: str):
+        return self._request("DELETE", f"/api/playlists/{playlist_id}")
+
+    def metrics_summary(self):
+        return self._request("GET", "/api/metrics/summary")
+
+
+class EmbeddedBackend:
+    """
+    Calls the tidal_api operations directly in this process.
+    No subprocess, no socket and no JSON round trip: results are plain dicts.
+    """
+
+    def __init__(self):
+        self._start_lock = threading.Lock()
+        self._service = None
+        # Seconds spent importing tidal_api on the first call
+        self.startup_seconds = None
+
+    def start(self):
+        """Import tidal_api (and tidalapi with it), which is deferred to the first call."""
+        with self._start_lock:
+            if self._service is not None:
+                return
+            started = time.perf_counter()
+
+            from tidal_api import service
+            from tidal_api.metrics import request_duration
+            from tidal_api.session_manager import session_manager
+
+            self._session_manager = session_manager
+            self._request_duration = request_duration
+            self._service = service
+
+            self.startup_seconds = time.perf_counter() - started
+            logger.info("TIDAL backend loaded in %.2fs", self.startup_seconds)
+
+            # Warm up the caches in the background if a stored session is still valid
+            service.prefetcher.start()
+
+    def shutdown(self):
+        pass
+
+    @property
+    def service(self):
+        self.start()
+        return self._service
+
+    def _call(self, operation, *args) -> DecodedResponse:
+        started = time.perf_counter()
+        # The background prefetch stays out of the way of calls in flight
+        self._service.prefetcher.request_started()
+        try:
+            data, status_code = operation(*args)
+        finally:
+            self._service.prefetcher.request_finished()
+        # There are no routes in this mode, time the operations instead
+        self._request_duration.observe(
+            time.perf_counter() - started,
+            route=f"embedded:{operation.__name__}",
+            method="CALL",
+            status=status_code,
+        )
+        return DecodedResponse(data, status_code)
+
+    def _call_authenticated(self, operation, *args) -> DecodedResponse:
+        session = self._session_manager.get_session()
+        if session is None:
+            return DecodedResponse({"error": "Not authenticated"}, 401)
+        return self._call(operation, session, *args)
+
+    def auth_login(self):
+        # stdout carries the MCP protocol, keep anything tidalapi prints during the login flow off it
+        with contextlib.redirect_stdout(sys.stderr):
+            return self._call(self.service.login)
+
+    def auth_status(self):
+        return self._call(self.service.auth_status)
+
+    def get_tracks(self, limit: int, cursor: str = None, max_age: float = None, fields: list = None):
+        return _project(self._call_authenticated(self.service.get_tracks, limit, 0, cursor, max_age), fields)
+
+    def stream_batch_recommendations(self, payload: dict, fields: list = None):
+        view, error = parse_view(fields)
+        if error:
+            return StreamedResponse(error[1], error=error[0])
+        response = self._call_authenticated(self.service.stream_batch_recommendations, payload)
+        if response.status_code != 200:
+            return StreamedResponse(response.status_code, error=response.json())
+        return StreamedResponse(200, chunks=(view.apply(chunk) for chunk in response.json()))
+
+    def expand_recommendations(self, payload: dict):
+        return self._call_authenticated(self.service.expand_recommendations, payload)
+
+    def create_playlist(self, payload: dict):
+        return self._call_authenticated(self.service.create_playlist, payload)
+
+    def get_user_playlists(
+        self, limit: int, cursor: str = None, sort: str = "last_updated", order: str = None,
+        fields: list = None, max_age: float = None,
+    ):
+        return self._call_authenticated(
+            self.service.get_user_playlists, limit, 0, cursor, sort, order, fields, max_age
+        )
+
+    def get_playlist_tracks(
+        self, playlist_id: str, limit: int, cursor: str = None, max_age: float = None, fields: list = None
+    ):
+        return _project(
+            self._call_authenticated(self.service.get_playlist_tracks, playlist_id, limit, 0, cursor, max_age),
+            fields,
+        )
+
+    def update_playlist(self, playlist_id: str, payload: dict):
+        return self._call_authenticated(self.service.update_playlist, playlist_id, payload)
+
+    def delete_playlist(self, playlist_id: str):
+        return self._call_authenticated(self.service.delete_playlist, playlist_id)
+
+    def metrics_summary(self):
+        return self._call(self.service.metrics_summary)
+
+
+def create_backend():
+    """Create the backend selected by TIDAL_MCP_MODE ("http" or "embedded")."""
+    if BACKEND_MODE == "embedded":
+        return EmbeddedBackend()
+    if BACKEND_MODE != "http":
+        logger.warning("Unknown TIDAL_MCP_MODE '%s', falling back to http", BACKEND_MODE)
+    return HttpBackend()
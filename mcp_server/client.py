@@ -0,0 +1,142 @@
+import socket
+import functools
+
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.util.retry import Retry
+
+from utils import (
+    FLASK_APP_URL,
+    FLASK_SOCKET_PATH,
+    HTTP_POOL_SIZE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_RETRIES,
+    HTTP_RETRY_BACKOFF,
+)
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """HTTP connection over a Unix domain socket instead of TCP."""
+
+    def __init__(self, *args, socket_path: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if isinstance(self.timeout, (int, float)):
+            sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+
+class UnixHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = UnixHTTPConnection
+
+
+class UnixSocketAdapter(HTTPAdapter):
+    """
+    Transport adapter that sends every request to the Unix domain socket at
+    `socket_path`, whatever the host in the URL.
+    """
+
+    def __init__(self, socket_path: str, **kwargs):
+        # Must be set before HTTPAdapter.__init__ builds the pool manager
+        self.socket_path = socket_path
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": functools.partial(UnixHTTPConnectionPool, socket_path=self.socket_path),
+        }
+
+
+class BackendClient:
+    """
+    Pooled keep-alive HTTP client for the tidal_api Flask app.
+
+    All requests share one `requests.Session`, so connections to the backend are
+    reused instead of opening a new one per call. Every request has a timeout,
+    and connection errors (and 502/503/504 on idempotent requests) are retried
+    with exponential backoff. If `socket_path` is given, requests go over that
+    Unix domain socket instead of TCP.
+    """
+
+    def __init__(
+        self,
+        base_url: str = FLASK_APP_URL,
+        socket_path: str = FLASK_SOCKET_PATH,
+        pool_size: int = HTTP_POOL_SIZE,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+        retries: int = HTTP_RETRIES,
+        retry_backoff: float = HTTP_RETRY_BACKOFF,
+    ):
+        # The host is ignored when talking over a Unix socket
+        self.base_url = "http://localhost" if socket_path else base_url
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=retry_backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self._adapter(socket_path, pool_size, retry))
+
+        # Health probes must answer "nothing there" at once instead of retrying
+        self._probe_session = requests.Session()
+        self._probe_session.mount("http://", self._adapter(socket_path, 1, 0))
+
+    @staticmethod
+    def _adapter(socket_path: str, pool_size: int, retry) -> HTTPAdapter:
+        adapter_kwargs = {
+            "pool_connections": 1,
+            "pool_maxsize": pool_size,
+            "max_retries": retry,
+        }
+        if socket_path:
+            return UnixSocketAdapter(socket_path, **adapter_kwargs)
+        return HTTPAdapter(**adapter_kwargs)
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, f"{self.base_url}{path}", **kwargs)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", path, **kwargs)
+
+    def health(self, timeout: float = 1.0) -> Optional[dict]:
+        """
+        The backend's /health payload: None if nothing is listening, an empty
+        dict if something answered that isn't a healthy JSON endpoint.
+        """
+        try:
+            response = self._probe_session.get(f"{self.base_url}/health", timeout=timeout)
+        except requests.RequestException:
+            return None
+        try:
+            return response.json() if response.status_code == 200 else {}
+        except ValueError:
+            return {}
+
+    def close(self):
+        self.session.close()
+        self._probe_session.close()
@@ -1,23 +1,45 @@
-from mcp.server.fastmcp import FastMCP
-import requests
+from mcp.server.fastmcp import FastMCP, Context
+import anyio
 import atexit
+import logging
+import functools
 
-from typing import Optional, List
+from typing import Callable, Optional, List
 
-from utils import start_flask_app, shutdown_flask_app, FLASK_APP_URL, FLASK_PORT
+from auth import AuthState
+from backend import create_backend
+from utils import BACKEND_MODE, BACKEND_START, FLASK_PORT
+from tidal_api.logs import configure_logging
 
-# Print the port being used for debugging
-print(f"TIDAL MCP starting on port {FLASK_PORT}")
+# Before FastMCP sets up its own logging: ours goes through a queue, to stderr or a file
+configure_logging()
+logger = logging.getLogger("mcp_server.server")
+
+# Log the backend mode and port being used for debugging
+logger.info("TIDAL MCP starting in %s mode on port %d", BACKEND_MODE, FLASK_PORT)
 
 # Create an MCP server
 mcp = FastMCP("TIDAL MCP")
 
-# Start the Flask app when this script is loaded
-print("MCP server module is being loaded. Starting Flask app...")
-start_flask_app()
+# The backend (the Flask app in http mode) starts on the first tool call,
+# so the MCP client gets its tool list without waiting for it
+backend = create_backend()
+if BACKEND_START == "eager":
+    try:
+        backend.start()
+    except Exception as e:
+        # The first tool call tries again
+        logger.warning("Failed to start TIDAL backend: %s", e)
 
 # Register the shutdown function to be called when the MCP server exits
-atexit.register(shutdown_flask_app)
+atexit.register(backend.shutdown)
+
+def _fetch_auth_status() -> dict:
+    """Ask the backend whether there is an authenticated TIDAL session."""
+    return backend.auth_status().json()
+
+# Shared authentication state, so tool calls don't re-check /api/auth/status every time
+auth_state = AuthState(_fetch_auth_status)
 
 @mcp.tool()
 def tidal_login() -> dict:
@@ -29,13 +51,15 @@ def tidal_login() -> dict:
         A dictionary containing authentication status and user information if successful
     """
     try:
-        # Call your Flask endpoint for TIDAL authentication
-        response = requests.get(f"{FLASK_APP_URL}/api/auth/login")
+        # Call the backend for TIDAL authentication
+        response = backend.auth_login()
         
         # Check if the request was successful
         if response.status_code == 200:
+            auth_state.mark_authenticated()
             return response.json()
         else:
+            auth_state.invalidate()
             error_data = response.json()
             return {
                 "status": "error",
@@ -48,7 +72,7 @@ def tidal_login() -> dict:
         }
     
 @mcp.tool()
-def get_favorite_tracks(limit: int = 20) -> dict:
+def get_favorite_tracks(limit: int = 20, cursor: Optional[str] = None, refresh: bool = False, fields: Optional[List[str]] = None) -> dict:
     """
     Retrieves tracks from the user's TIDAL account favorites.
     
@@ -63,29 +87,33 @@ def get_favorite_tracks(limit: int = 20) -> dict:
     
     Args:
         limit: Maximum number of tracks to retrieve (default: 20, note it should be large enough by default unless specified otherwise).
+        cursor: Optional `next_cursor` from a previous call, to continue with the next tracks
+        refresh: Set to True to sync with TIDAL first instead of using the local library copy
+                 (only needed if the user just changed their library outside of this conversation)
+        fields: Optional list of track fields to return, to keep large results small (e.g. ["id", "title", "artist"];
+                available: id, title, artist, album, duration, url, plus the recommendation fields; the ID is always included)
     
     Returns:
-        A dictionary containing track information including track ID, title, artist, album, and duration.
+        A dictionary containing track information including track ID, title, artist, album, and duration,
+        the total number of favorites and a `next_cursor` (None once all favorites have been returned).
         Returns an error message if not authenticated or if retrieval fails.
     """
     try:
         # First, check if the user is authenticated
-        auth_check = requests.get(f"{FLASK_APP_URL}/api/auth/status")
-        auth_data = auth_check.json()
-        
-        if not auth_data.get("authenticated", False):
+        if not auth_state.is_authenticated():
             return {
                 "status": "error",
                 "message": "You need to login to TIDAL first before I can fetch your favorite tracks. Please use the tidal_login() function."
             }
             
-        # Call your Flask endpoint to retrieve tracks with the specified limit
-        response = requests.get(f"{FLASK_APP_URL}/api/tracks", params={"limit": limit})
+        # Call the backend to retrieve tracks with the specified limit
+        response = backend.get_tracks(limit=limit, cursor=cursor, max_age=0 if refresh else None, fields=fields)
         
         # Check if the request was successful
         if response.status_code == 200:
             return response.json()
         elif response.status_code == 401:
+            auth_state.invalidate()
             return {
                 "status": "error",
                 "message": "Not authenticated with TIDAL. Please login first using tidal_login()."
@@ -102,17 +130,25 @@ def get_favorite_tracks(limit: int = 20) -> dict:
             "message": f"Failed to connect to TIDAL tracks service: {str(e)}"
         }
     
-def _get_tidal_recommendations(track_ids: list = None, limit_per_track: int = 20, filter_criteria: str = None) -> dict:
+def _get_tidal_recommendations(track_ids: list = None, limit_per_track: int = 20, filter_criteria: str = None, limit: int = 50, max_per_artist: int = 3, fields: Optional[List[str]] = None, on_progress: Optional[Callable[[int, int], None]] = None) -> dict:
     """
     [INTERNAL USE] Gets raw recommendation data from TIDAL API.
     This is a lower-level function primarily used by higher-level recommendation functions.
     For end-user recommendations, use recommend_tracks instead.
     
+    Recommendations are streamed from the backend one seed at a time, so progress can be
+    reported as soon as the first seeds are done instead of after the slowest one. The backend
+    merges the seeds' radios into one ranked list, sent with its final summary.
+    
     Args:
         track_ids: List of TIDAL track IDs to use as seeds for recommendations.
         limit_per_track: Maximum number of recommendations to get per track (default: 20)
         filter_criteria: Optional string describing criteria to filter recommendations
                          (e.g., "relaxing", "new releases", "upbeat")
+        limit: Maximum number of ranked recommendations to return (default: 50)
+        max_per_artist: Maximum number of recommendations by the same artist, 0 for no cap (default: 3)
+        fields: Optional list of track fields to return (the ID is always included)
+        on_progress: Optional callback called with (seeds done, total seeds) after each seed
     
     Returns:
         A dictionary containing recommended tracks based on seed tracks and filtering criteria.
@@ -129,10 +165,14 @@ def _get_tidal_recommendations(track_ids: list = None, limit_per_track: int = 20
         payload = {
             "track_ids": track_ids,
             "limit_per_track": limit_per_track,
-            "remove_duplicates": True
+            "top_k": limit,
+            "max_per_artist": max_per_artist,
         }
         
-        response = requests.post(f"{FLASK_APP_URL}/api/recommendations/batch", json=payload)
+        response = backend.stream_batch_recommendations(payload, fields=fields)
+        
+        if response.status_code == 401:
+            auth_state.invalidate()
         
         if response.status_code != 200:
             error_data = response.json()
@@ -141,14 +181,63 @@ def _get_tidal_recommendations(track_ids: list = None, limit_per_track: int = 20
                 "message": f"Failed to get recommendations: {error_data.get('error', 'Unknown error')}"
             }
         
-        recommendations = response.json().get("recommendations", [])
+        recommendations = []
+        seeds = {}
+        failed_seeds = []
+        seeds_done = 0
+        done = False
+        
+        # Consume the per-seed chunks as they arrive
+        for chunk in response.iter_chunks():
+            # A chunk with an error but no seed means the whole stream failed
+            if "error" in chunk and "seed_track_id" not in chunk:
+                return {
+                    "status": "error",
+                    "message": f"Failed to get recommendations: {chunk['error']}"
+                }
+            if chunk.get("done"):
+                recommendations.extend(chunk.get("recommendations", []))
+                done = True
+                break
+            
+            recommendations.extend(chunk.get("recommendations", []))
+            seeds[str(chunk.get("seed_track_id"))] = chunk.get("seed_track")
+            if chunk.get("status", "ok") != "ok":
+                failed_seeds.append({
+                    "seed_track_id": chunk.get("seed_track_id"),
+                    "status": chunk["status"],
+                    "error": chunk.get("error"),
+                })
+            seeds_done += 1
+            
+            if on_progress:
+                on_progress(seeds_done, len(track_ids))
+        
+        # The ranked recommendations only arrive in the final summary line
+        if not done:
+            return {
+                "status": "error",
+                "message": "Failed to get recommendations: the stream ended before all seeds were processed"
+            }
+        
+        # Seed metadata in the order the seeds were given
+        seed_tracks = [
+            seeds[str(track_id)]
+            for track_id in dict.fromkeys(track_ids)
+            if seeds.get(str(track_id))
+        ]
         
         # If filter criteria is provided, include it in the response for LLM processing
         result = {
             "recommendations": recommendations,
+            "seed_tracks": seed_tracks,
             "total_count": len(recommendations)
         }
         
+        # Seeds whose radio could not be fetched, so partial results are not mistaken for complete ones
+        if failed_seeds:
+            result["failed_seeds"] = failed_seeds
+        
         if filter_criteria:
             result["filter_criteria"] = filter_criteria
             
@@ -161,7 +250,7 @@ def _get_tidal_recommendations(track_ids: list = None, limit_per_track: int = 20
         }
     
 @mcp.tool()
-def recommend_tracks(track_ids: Optional[List[str]] = None, filter_criteria: Optional[str] = None, limit_per_track: int = 20, limit_from_favorite: int = 20) -> dict:
+async def recommend_tracks(track_ids: Optional[List[str]] = None, filter_criteria: Optional[str] = None, limit_per_track: int = 20, limit_from_favorite: int = 20, limit: int = 50, max_per_artist: int = 3, fields: Optional[List[str]] = None, ctx: Context = None) -> dict:
     """
     Recommends music tracks based on specified track IDs or can use the user's TIDAL favorites if no IDs are provided.
     
@@ -175,9 +264,14 @@ def recommend_tracks(track_ids: Optional[List[str]] = None, filter_criteria: Opt
     This function gets recommendations based on provided track IDs or retrieves the user's 
     favorite tracks as seeds if no IDs are specified.
     
+    The recommended tracks come ranked: tracks recommended by several seed tracks, and near the top
+    of their radios, have a higher `score` and `seed_count` and come first. Seeds whose radio could
+    not be fetched (e.g. TIDAL kept rate limiting) are listed in `failed_seeds`; mention them to the
+    user if the results look thin.
+    
     When processing the results of this tool:
     1. Analyze the seed tracks to understand the music taste or direction
-    2. Review the recommended tracks from TIDAL
+    2. Review the recommended tracks from TIDAL, favoring the higher ranked ones
     3. IMPORTANT: Do NOT include any tracks from the seed tracks in your recommendations
     4. Ensure there are NO DUPLICATES in your recommended tracks list
     5. Select and rank the most appropriate tracks based on the seed tracks and filter criteria
@@ -200,20 +294,53 @@ def recommend_tracks(track_ids: Optional[List[str]] = None, filter_criteria: Opt
                          "recent releases," "upbeat," "jazz influences")
         limit_per_track: Maximum number of recommendations to get per track (NOTE: default: 20, unless specified otherwise, we'd like to keep the default large enough to have enough candidates to work with)
         limit_from_favorite: Maximum number of favorite tracks to use as seeds (NOTE: default: 20, unless specified otherwise, we'd like to keep the default large enough to have enough candidates to work with)
+        limit: Maximum number of ranked tracks returned (default: 50; raise it when strict filter criteria will discard many of them)
+        max_per_artist: Maximum number of tracks by the same artist (default: 3, 0 for no cap)
+        fields: Optional list of track fields to return, to keep large results small (e.g. ["id", "title", "artist"];
+                available: id, title, artist, album, duration, url, plus the recommendation fields; the ID is always included)
         
     Returns:
         A dictionary containing both the seed tracks and recommended tracks
     """
-    # First, check if the user is authenticated
-    auth_check = requests.get(f"{FLASK_APP_URL}/api/auth/status")
-    auth_data = auth_check.json()
-    
-    if not auth_data.get("authenticated", False):
+    def report_progress(seeds_done: int, seed_count: int):
+        # Called from the worker thread, hand the notification back to the event loop
+        if ctx is not None:
+            anyio.from_thread.run(ctx.report_progress, seeds_done, seed_count)
+    
+    # The backend calls block, so run them off the event loop
+    return await anyio.to_thread.run_sync(
+        functools.partial(
+            _recommend_tracks,
+            track_ids=track_ids,
+            filter_criteria=filter_criteria,
+            limit_per_track=limit_per_track,
+            limit_from_favorite=limit_from_favorite,
+            limit=limit,
+            max_per_artist=max_per_artist,
+            fields=fields,
+            on_progress=report_progress,
+        )
+    )
+
+
+def _recommend_tracks(track_ids: Optional[List[str]] = None, filter_criteria: Optional[str] = None, limit_per_track: int = 20, limit_from_favorite: int = 20, limit: int = 50, max_per_artist: int = 3, fields: Optional[List[str]] = None, on_progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    Implementation of recommend_tracks, reporting per-seed progress through `on_progress`.
+    """
+    # First, check if the user is authenticated (this may start the backend, which can fail)
+    try:
+        authenticated = auth_state.is_authenticated()
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to connect to TIDAL recommendations service: {str(e)}"
+        }
+    if not authenticated:
         return {
             "status": "error",
             "message": "You need to login to TIDAL first before I can recommend music. Please use the tidal_login() function."
         }
-    
+
     # Initialize variables to store our seed tracks and their info
     seed_track_ids = []
     seed_tracks_info = []
@@ -222,7 +349,7 @@ def recommend_tracks(track_ids: Optional[List[str]] = None, filter_criteria: Opt
     if track_ids and isinstance(track_ids, list) and len(track_ids) > 0:
         seed_track_ids = track_ids
         # Note: We don't have detailed info about these tracks, just IDs
-        # This is fine as the recommendation API only needs IDs
+        # The recommendation API returns their details along with the recommendations
     else:
         # If no track_ids provided, get the user's favorite tracks
         tracks_response = get_favorite_tracks(limit=limit_from_favorite)
@@ -251,7 +378,11 @@ def recommend_tracks(track_ids: Optional[List[str]] = None, filter_criteria: Opt
     recommendations_response = _get_tidal_recommendations(
         track_ids=seed_track_ids,
         limit_per_track=limit_per_track,
-        filter_criteria=filter_criteria
+        filter_criteria=filter_criteria,
+        limit=limit,
+        max_per_artist=max_per_artist,
+        fields=fields,
+        on_progress=on_progress
     )
     
     # Check if we successfully retrieved recommendations
@@ -264,6 +395,10 @@ def recommend_tracks(track_ids: Optional[List[str]] = None, filter_criteria: Opt
     # Get the recommendations
     recommendations = recommendations_response.get("recommendations", [])
     
+    # Fill in the seed track details if we only had their IDs
+    if not seed_tracks_info:
+        seed_tracks_info = recommendations_response.get("seed_tracks", [])
+    
     if not recommendations:
         return {
             "status": "error",
@@ -273,16 +408,102 @@ def recommend_tracks(track_ids: Optional[List[str]] = None, filter_criteria: Opt
     # Return the structured data to process
     return {
         "status": "success",
-        "seed_tracks": seed_tracks_info,  # This might be empty if direct track_ids were provided
+        "seed_tracks": seed_tracks_info,
         "seed_track_ids": seed_track_ids,
         "recommendations": recommendations,
         "filter_criteria": filter_criteria,
         "seed_count": len(seed_track_ids),
+        "failed_seeds": recommendations_response.get("failed_seeds", []),
     }
 
 
 @mcp.tool()
-def create_tidal_playlist(title: str, track_ids: list, description: str = "") -> dict:
+async def discover_tracks(track_ids: Optional[List[str]] = None, from_favorites: int = 20, hops: int = 2, limit: int = 50, limit_per_track: int = 10) -> dict:
+    """
+    Discovers tracks further away from the user's taste than direct recommendations, by following
+    TIDAL track radios for several hops ("recommendations of recommendations").
+
+    USE THIS TOOL WHENEVER A USER ASKS FOR:
+    - Deeper or more adventurous discovery ("dig deeper", "something I wouldn't find myself")
+    - Tracks connected to many of their favorites or of the given tracks
+    - A large, varied pool of candidates for a playlist
+
+    Use recommend_tracks for plain recommendations; this tool is for going beyond the first hop.
+    Tracks are ranked by how strongly they are connected to the seeds: a track recommended by many
+    seeds, and near the top of their radios, scores higher. Tracks found at later hops count less.
+
+    When processing the results of this tool, present the tracks like recommend_tracks results
+    (name, artist, album and URL) and do not include the seed tracks.
+
+    Args:
+        track_ids: Optional list of TIDAL track IDs to start from. If not provided, the user's
+                   newest favorite tracks are used.
+        from_favorites: Number of newest favorite tracks to use as seeds when no track_ids are given (default: 20)
+        hops: How many radios deep to go (default: 2, at most 3)
+        limit: Maximum number of tracks to return (default: 50)
+        limit_per_track: Number of radio tracks followed from each track (default: 10)
+
+    Returns:
+        A dictionary with the ranked `recommendations` (each with its `score`, `in_degree` and
+        the `hop` it was first found at) and how many radios were read from storage or fetched
+    """
+    # An expansion can take many radio calls, run it off the event loop
+    return await anyio.to_thread.run_sync(
+        functools.partial(
+            _discover_tracks,
+            track_ids=track_ids,
+            from_favorites=from_favorites,
+            hops=hops,
+            limit=limit,
+            limit_per_track=limit_per_track,
+        )
+    )
+
+
+def _discover_tracks(track_ids: Optional[List[str]] = None, from_favorites: int = 20, hops: int = 2, limit: int = 50, limit_per_track: int = 10) -> dict:
+    """
+    Implementation of discover_tracks, run on a worker thread.
+    """
+    try:
+        # First, check if the user is authenticated
+        if not auth_state.is_authenticated():
+            return {
+                "status": "error",
+                "message": "You need to login to TIDAL first before I can discover music. Please use the tidal_login() function."
+            }
+
+        payload = {
+            "track_ids": track_ids or [],
+            "from_favorites": 0 if track_ids else from_favorites,
+            "hops": hops,
+            "limit": limit,
+            "limit_per_track": limit_per_track,
+        }
+        response = backend.expand_recommendations(payload)
+
+        if response.status_code == 200:
+            return response.json()
+        elif response.status_code == 401:
+            auth_state.invalidate()
+            return {
+                "status": "error",
+                "message": "Not authenticated with TIDAL. Please login first using tidal_login()."
+            }
+        else:
+            error_data = response.json()
+            return {
+                "status": "error",
+                "message": f"Failed to discover tracks: {error_data.get('error', 'Unknown error')}"
+            }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to connect to TIDAL recommendations service: {str(e)}"
+        }
+
+
+@mcp.tool()
+def create_tidal_playlist(title: str, track_ids: list, description: str = "", job_id: Optional[str] = None) -> dict:
     """
     Creates a new TIDAL playlist with the specified tracks.
     
@@ -313,21 +534,21 @@ def create_tidal_playlist(title: str, track_ids: list, description: str = "") ->
     2. Provide the playlist title, number of tracks added, and URL
     3. Always include the direct TIDAL URL (https://tidal.com/playlist/{playlist_id})
     4. Suggest that the user can now access this playlist in their TIDAL account
+    5. If the result has status "error" and includes a `job_id`, the playlist was created but only
+       partly filled: call this tool again with that `job_id` (same title and track_ids) to add the rest
     
     Args:
         title: The name of the playlist to create
         track_ids: List of TIDAL track IDs to add to the playlist
         description: Optional description for the playlist (default: "")
+        job_id: Optional job ID returned by a failed call, to resume adding tracks to that playlist
         
     Returns:
         A dictionary containing the status of the playlist creation and details about the created playlist
     """
     try:
         # First, check if the user is authenticated
-        auth_check = requests.get(f"{FLASK_APP_URL}/api/auth/status")
-        auth_data = auth_check.json()
-        
-        if not auth_data.get("authenticated", False):
+        if not auth_state.is_authenticated():
             return {
                 "status": "error",
                 "message": "You need to login to TIDAL first before creating a playlist. Please use the tidal_login() function."
@@ -346,22 +567,34 @@ def create_tidal_playlist(title: str, track_ids: list, description: str = "") ->
                 "message": "You must provide at least one track ID to add to the playlist."
             }
         
-        # Create the playlist through the Flask API
+        # Create the playlist through the backend
         payload = {
             "title": title,
             "description": description,
             "track_ids": track_ids
         }
+        if job_id:
+            payload["job_id"] = job_id
         
-        response = requests.post(f"{FLASK_APP_URL}/api/playlists", json=payload)
+        response = backend.create_playlist(payload)
         
         # Check response
+        if response.status_code == 401:
+            auth_state.invalidate()
+        
         if response.status_code != 200:
             error_data = response.json()
-            return {
+            result = {
                 "status": "error",
                 "message": f"Failed to create playlist: {error_data.get('error', 'Unknown error')}"
             }
+            # A partly populated playlist can be resumed
+            job = error_data.get("job")
+            if job and job.get("playlist_id"):
+                result["job_id"] = job["job_id"]
+                result["playlist_id"] = job["playlist_id"]
+                result["tracks_added"] = job["committed"]
+            return result
             
         # Parse the response
         result = response.json()
@@ -385,10 +618,99 @@ def create_tidal_playlist(title: str, track_ids: list, description: str = "") ->
             "status": "error",
             "message": f"Failed to create playlist: {str(e)}"
         }
+
+
+@mcp.tool()
+def update_tidal_playlist(playlist_id: str, track_ids: list, title: Optional[str] = None, description: Optional[str] = None, dry_run: bool = False) -> dict:
+    """
+    Updates an existing TIDAL playlist so it contains exactly the given tracks, in the given order.
+    
+    USE THIS TOOL WHENEVER A USER ASKS FOR:
+    - "Refresh my playlist with new recommendations"
+    - "Add these songs to my playlist" / "Remove these songs from my playlist"
+    - "Reorder my playlist"
+    - "Rename my playlist"
+    - Any request to change a playlist that already exists
+    
+    Prefer this tool over deleting and re-creating a playlist: only the differences are sent to
+    TIDAL (tracks removed, moved and inserted), and the playlist keeps its ID, URL and followers.
+    
+    To add or remove a few tracks, first get the current tracks with get_playlist_tracks(), then
+    pass the full list as it should be afterwards. Tracks missing from `track_ids` are REMOVED.
+    
+    When processing the results of this tool:
+    1. Confirm the playlist was updated, with the numbers of tracks added, removed and moved
+    2. Mention any tracks TIDAL didn't find (`not_found`)
+    3. Always include the direct TIDAL URL (https://tidal.com/playlist/{playlist_id})
+    
+    Args:
+        playlist_id: The TIDAL ID of the playlist to update (one of the user's playlists)
+        track_ids: The complete list of TIDAL track IDs the playlist should contain, in order
+        title: Optional new name for the playlist
+        description: Optional new description for the playlist
+        dry_run: If true, only report the changes that would be made (default: false)
+        
+    Returns:
+        A dictionary with the status, the updated playlist and the changes made
+    """
+    try:
+        if not auth_state.is_authenticated():
+            return {
+                "status": "error",
+                "message": "You need to login to TIDAL first before updating a playlist. Please use the tidal_login() function."
+            }
+        
+        if not playlist_id:
+            return {
+                "status": "error",
+                "message": "A playlist ID is required. You can get playlist IDs by using the get_user_playlists() function."
+            }
+        
+        if not isinstance(track_ids, list) or len(track_ids) == 0:
+            return {
+                "status": "error",
+                "message": "You must provide the full list of tracks the playlist should contain. To remove the playlist, use delete_tidal_playlist()."
+            }
+        
+        payload = {"track_ids": track_ids, "dry_run": dry_run}
+        if title:
+            payload["title"] = title
+        if description:
+            payload["description"] = description
+        
+        response = backend.update_playlist(playlist_id, payload)
+        
+        if response.status_code == 401:
+            auth_state.invalidate()
+        
+        if response.status_code != 200:
+            error_data = response.json()
+            return {
+                "status": "error",
+                "message": f"Failed to update playlist: {error_data.get('error', 'Unknown error')}"
+            }
+        
+        result = response.json()
+        playlist_data = result.get("playlist", {})
+        playlist_data["playlist_url"] = f"https://tidal.com/playlist/{playlist_id}"
+        return dict(result, playlist=playlist_data)
+        
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to update playlist: {str(e)}"
+        }
     
 
 @mcp.tool()
-def get_user_playlists() -> dict:
+def get_user_playlists(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    sort: str = "last_updated",
+    order: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    refresh: bool = False,
+) -> dict:
     """
     Fetches the user's playlists from their TIDAL account.
     
@@ -400,39 +722,53 @@ def get_user_playlists() -> dict:
     - Any request to view or list their TIDAL playlists
     
     This function retrieves the user's playlists from TIDAL and returns them sorted
-    by last updated date (most recent first).
+    by last updated date (most recent first), or by another `sort` key.
     
     When processing the results of this tool:
     1. Present the playlists in a clear, organized format
     2. Include key information like title, track count, and the TIDAL URL for each playlist
     3. Mention when each playlist was last updated if available
     4. If the user has many playlists, focus on the most recently updated ones unless specified otherwise
+    5. If `next_cursor` is not None and the user wants every playlist, call again with that cursor
+    
+    Args:
+        limit: Maximum number of playlists to retrieve (default: 50)
+        cursor: Optional `next_cursor` from a previous call, to continue with the next playlists
+        sort: Sort key: "last_updated" (default), "created", "title", "track_count" or "duration"
+        order: "asc" or "desc" (default: "asc" for title, "desc" otherwise)
+        fields: Optional list of playlist fields to return, e.g. ["id", "title"] to look up a playlist by name
+                (available: id, title, description, created, last_updated, track_count, duration, url;
+                the ID is always included)
+        refresh: Set to True to sync with TIDAL first instead of using the local library copy
+                 (only needed if the user just changed their library outside of this conversation)
     
     Returns:
-        A dictionary containing the user's playlists sorted by last updated date
+        A dictionary containing one page of the user's playlists and the total number of playlists
     """
-    # First, check if the user is authenticated
-    auth_check = requests.get(f"{FLASK_APP_URL}/api/auth/status")
-    auth_data = auth_check.json()
-    
-    if not auth_data.get("authenticated", False):
-        return {
-            "status": "error",
-            "message": "You need to login to TIDAL first before I can fetch your playlists. Please use the tidal_login() function."
-        }
-    
     try:
-        # Call the Flask endpoint to retrieve playlists with the specified limit
-        response = requests.get(f"{FLASK_APP_URL}/api/playlists")
+        # First, check if the user is authenticated
+        if not auth_state.is_authenticated():
+            return {
+                "status": "error",
+                "message": "You need to login to TIDAL first before I can fetch your playlists. Please use the tidal_login() function."
+            }
+        
+        # Call the backend to retrieve playlists with the specified limit
+        response = backend.get_user_playlists(
+            limit, cursor=cursor, sort=sort, order=order, fields=fields, max_age=0 if refresh else None
+        )
         
         # Check if the request was successful
         if response.status_code == 200:
+            data = response.json()
             return {
                 "status": "success",
-                "playlists": response.json().get("playlists", []),
-                "playlist_count": len(response.json().get("playlists", []))
+                "playlists": data.get("playlists", []),
+                "playlist_count": data.get("total_playlists", 0),
+                "next_cursor": data.get("next_cursor")
             }
         elif response.status_code == 401:
+            auth_state.invalidate()
             return {
                 "status": "error",
                 "message": "Not authenticated with TIDAL. Please login first using tidal_login()."
@@ -451,7 +787,7 @@ def get_user_playlists() -> dict:
     
 
 @mcp.tool()
-def get_playlist_tracks(playlist_id: str, limit: int = 100) -> dict:
+def get_playlist_tracks(playlist_id: str, limit: int = 100, cursor: Optional[str] = None, refresh: bool = False, fields: Optional[List[str]] = None) -> dict:
     """
     Retrieves all tracks from a specified TIDAL playlist.
     
@@ -472,37 +808,37 @@ def get_playlist_tracks(playlist_id: str, limit: int = 100) -> dict:
     3. Include track durations where available
     4. Mention the total number of tracks in the playlist
     5. If there are many tracks, focus on highlighting interesting patterns or variety
+    6. If `next_cursor` is not None and the user wants the whole playlist, call again with that cursor
     
     Args:
         playlist_id: The TIDAL ID of the playlist to retrieve (required)
         limit: Maximum number of tracks to retrieve (default: 100)
+        cursor: Optional `next_cursor` from a previous call, to continue with the next tracks
+        refresh: Set to True to sync with TIDAL first instead of using the local library copy
+                 (only needed if the user just changed their library outside of this conversation)
+        fields: Optional list of track fields to return, to keep large playlists small (e.g. ["id", "title", "artist"];
+                available: id, title, artist, album, duration, url; the ID is always included)
         
     Returns:
-        A dictionary containing the playlist information and all tracks in the playlist
+        A dictionary containing the playlist information and the requested tracks of the playlist
     """
-    # First, check if the user is authenticated
-    auth_check = requests.get(f"{FLASK_APP_URL}/api/auth/status")
-    auth_data = auth_check.json()
-    
-    if not auth_data.get("authenticated", False):
-        return {
-            "status": "error",
-            "message": "You need to login to TIDAL first before I can fetch playlist tracks. Please use the tidal_login() function."
-        }
-    
-    # Validate playlist_id
-    if not playlist_id:
-        return {
-            "status": "error", 
-            "message": "A playlist ID is required. You can get playlist IDs by using the get_user_playlists() function."
-        }
-    
     try:
-        # Call the Flask endpoint to retrieve tracks from the playlist
-        response = requests.get(
-            f"{FLASK_APP_URL}/api/playlists/{playlist_id}/tracks", 
-            params={"limit": limit}
-        )
+        # First, check if the user is authenticated
+        if not auth_state.is_authenticated():
+            return {
+                "status": "error",
+                "message": "You need to login to TIDAL first before I can fetch playlist tracks. Please use the tidal_login() function."
+            }
+        
+        # Validate playlist_id
+        if not playlist_id:
+            return {
+                "status": "error", 
+                "message": "A playlist ID is required. You can get playlist IDs by using the get_user_playlists() function."
+            }
+        
+        # Call the backend to retrieve tracks from the playlist
+        response = backend.get_playlist_tracks(playlist_id, limit=limit, cursor=cursor, max_age=0 if refresh else None, fields=fields)
         
         # Check if the request was successful
         if response.status_code == 200:
@@ -510,7 +846,8 @@ def get_playlist_tracks(playlist_id: str, limit: int = 100) -> dict:
             return {
                 "status": "success",                
                 "tracks": data.get("tracks", []),
-                "track_count": data.get("total_tracks", 0)
+                "track_count": data.get("total_tracks", 0),
+                "next_cursor": data.get("next_cursor")
             }
         elif response.status_code == 404:
             return {
@@ -518,6 +855,7 @@ def get_playlist_tracks(playlist_id: str, limit: int = 100) -> dict:
                 "message": f"Playlist with ID {playlist_id} not found. Please check the playlist ID and try again."
             }
         elif response.status_code == 401:
+            auth_state.invalidate()
             return {
                 "status": "error",
                 "message": "Not authenticated with TIDAL. Please login first using tidal_login()."
@@ -560,26 +898,23 @@ def delete_tidal_playlist(playlist_id: str) -> dict:
     Returns:
         A dictionary containing the status of the playlist deletion
     """
-    # First, check if the user is authenticated
-    auth_check = requests.get(f"{FLASK_APP_URL}/api/auth/status")
-    auth_data = auth_check.json()
-    
-    if not auth_data.get("authenticated", False):
-        return {
-            "status": "error",
-            "message": "You need to login to TIDAL first before deleting a playlist. Please use the tidal_login() function."
-        }
-    
-    # Validate playlist_id
-    if not playlist_id:
-        return {
-            "status": "error", 
-            "message": "A playlist ID is required. You can get playlist IDs by using the get_user_playlists() function."
-        }
-    
     try:
-        # Call the Flask endpoint to delete the playlist
-        response = requests.delete(f"{FLASK_APP_URL}/api/playlists/{playlist_id}")
+        # First, check if the user is authenticated
+        if not auth_state.is_authenticated():
+            return {
+                "status": "error",
+                "message": "You need to login to TIDAL first before deleting a playlist. Please use the tidal_login() function."
+            }
+        
+        # Validate playlist_id
+        if not playlist_id:
+            return {
+                "status": "error", 
+                "message": "A playlist ID is required. You can get playlist IDs by using the get_user_playlists() function."
+            }
+        
+        # Call the backend to delete the playlist
+        response = backend.delete_playlist(playlist_id)
         
         # Check if the request was successful
         if response.status_code == 200:
@@ -590,6 +925,7 @@ def delete_tidal_playlist(playlist_id: str) -> dict:
                 "message": f"Playlist with ID {playlist_id} not found. Please check the playlist ID and try again."
             }
         elif response.status_code == 401:
+            auth_state.invalidate()
             return {
                 "status": "error",
                 "message": "Not authenticated with TIDAL. Please login first using tidal_login()."
@@ -604,4 +940,41 @@ def delete_tidal_playlist(playlist_id: str) -> dict:
         return {
             "status": "error",
             "message": f"Failed to connect to TIDAL playlist service: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+@mcp.tool()
+def get_server_metrics() -> dict:
+    """
+    Shows where the TIDAL backend spends its time: per-route (or per-operation)
+    request latency, latency of the requests to the TIDAL API, rate limiter waits,
+    thread count, upstream queue depth and cache hit ratios.
+
+    USE THIS TOOL WHEN:
+    - The user asks why a tool call (e.g. recommend_tracks) was slow
+    - The user wants to see cache effectiveness or upstream API usage
+
+    Returns:
+        A dictionary with "requests", "upstream" and "rate_limit_wait" latency summaries
+        (count, total, mean and approximate p50/p95 in seconds), "runtime" gauges and
+        "backend_startup_seconds", how long the backend took to start
+    """
+    try:
+        response = backend.metrics_summary()
+        if response.status_code == 200:
+            result = response.json()
+            # Time the MCP server waited for the backend to start (or load, in embedded mode)
+            result["backend_startup_seconds"] = backend.startup_seconds
+            return result
+        return {
+            "status": "error",
+            "message": f"Failed to fetch metrics: {response.json().get('error', 'Unknown error')}"
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to connect to TIDAL backend: {str(e)}"
+        }
+
+
+if __name__ == "__main__":
+    mcp.run()
@@ -1,7 +1,12 @@
 import subprocess
 import os
+import sys
+import time
+import logging
 import pathlib
 import shutil
+import threading
+import importlib.util
 
 # Define a configurable port with a default that's less likely to conflict
 DEFAULT_PORT = 5050
@@ -10,10 +15,52 @@ FLASK_PORT = int(os.environ.get("TIDAL_MCP_PORT", DEFAULT_PORT))
 # Define the base URL for your Flask app using the configurable port
 FLASK_APP_URL = f"http://127.0.0.1:{FLASK_PORT}"
 
-# Define the path to the Flask app dynamically
+# Optional Unix domain socket for the Flask app; when set, local traffic skips the TCP stack
+FLASK_SOCKET_PATH = os.environ.get("TIDAL_MCP_SOCKET") or None
+
+# HTTP client settings for talking to the Flask app
+HTTP_POOL_SIZE = int(os.environ.get("TIDAL_MCP_POOL_SIZE", 10))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("TIDAL_MCP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.environ.get("TIDAL_MCP_READ_TIMEOUT", 120))
+HTTP_RETRIES = int(os.environ.get("TIDAL_MCP_RETRIES", 3))
+HTTP_RETRY_BACKOFF = float(os.environ.get("TIDAL_MCP_RETRY_BACKOFF", 0.3))
+# The login call waits for the user to finish the browser flow
+HTTP_LOGIN_TIMEOUT = float(os.environ.get("TIDAL_MCP_LOGIN_TIMEOUT", 600))
+
+# How the MCP server talks to TIDAL: "http" runs tidal_api as a separate Flask app,
+# "embedded" calls the tidal_api operations in-process
+BACKEND_MODE = os.environ.get("TIDAL_MCP_MODE", "http").lower()
+
+# Define the project root dynamically, tidal_api is imported/run as a package from there
 CURRENT_DIR = pathlib.Path(__file__).parent.absolute()
-FLASK_APP_PATH = os.path.join(CURRENT_DIR, "..", "tidal_api", "app.py")
-FLASK_APP_PATH = os.path.normpath(FLASK_APP_PATH)  # Normalize the path
+PROJECT_ROOT = os.path.normpath(os.path.join(CURRENT_DIR, ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+FLASK_APP_MODULE = "tidal_api.app"
+ASGI_APP_MODULE = "tidal_api.asgi"
+WSGI_APP_MODULE = "tidal_api.wsgi"
+
+# How the tidal_api app is served in "http" mode: "flask" (Flask's development server),
+# "waitress" (production multi-threaded WSGI server, needs waitress) or "asgi"
+# (single event loop with bounded thread offload, needs starlette and uvicorn)
+SERVER_ENGINE = os.environ.get("TIDAL_MCP_ENGINE", "flask").lower()
+
+# How the backend process is launched: "python" (this interpreter, nothing to resolve),
+# "uv" (`uv run --with ...`, resolves an environment first) or "auto" (python if this
+# interpreter has the backend's dependencies, uv otherwise)
+BACKEND_LAUNCHER = os.environ.get("TIDAL_MCP_LAUNCHER", "auto").lower()
+
+# When the backend is started: "lazy" (on the first tool call) or "eager" (when the MCP server loads)
+BACKEND_START = os.environ.get("TIDAL_MCP_START", "lazy").lower()
+
+# How long to wait for a started backend to answer /health, in seconds
+STARTUP_TIMEOUT = float(os.environ.get("TIDAL_MCP_STARTUP_TIMEOUT", 30))
+
+# How long the backend gets to finish in-flight requests when shut down, in seconds
+SHUTDOWN_TIMEOUT = float(os.environ.get("TIDAL_MCP_SHUTDOWN_TIMEOUT", 10))
+
+# The `service` a tidal_api backend reports in /health
+BACKEND_SERVICE = "tidal_api"
 
 # Find the path to uv executable
 def find_uv_executable():
@@ -45,48 +92,94 @@ def find_uv_executable():
     # If we can't find it, just return "uv" and let the system try to resolve it
     return "uv"
 
+def backend_command() -> list:
+    """Command line running the tidal_api app selected by TIDAL_MCP_ENGINE and TIDAL_MCP_LAUNCHER."""
+    packages = ["tidalapi", "flask", "requests"]
+    if SERVER_ENGINE == "asgi":
+        packages += ["starlette", "uvicorn"]
+        app_module = ASGI_APP_MODULE
+    elif SERVER_ENGINE == "waitress":
+        packages += ["waitress"]
+        app_module = WSGI_APP_MODULE
+    else:
+        app_module = FLASK_APP_MODULE
+
+    launcher = BACKEND_LAUNCHER
+    if launcher == "auto":
+        launcher = "python" if all(importlib.util.find_spec(package) for package in packages) else "uv"
+
+    if launcher == "python":
+        return [sys.executable, "-m", app_module]
+
+    dependencies = [arg for package in packages for arg in ("--with", package)]
+    return [find_uv_executable(), "run", *dependencies, "python", "-m", app_module]
+
+logger = logging.getLogger("mcp_server.utils")
+# The backend's log records are logged here under their own logger names, other output under this one
+backend_logger = logging.getLogger("tidal_api.backend")
+
 # Global variable to hold the Flask app process
 flask_process = None
 
 def start_flask_app():
-    """Start the Flask app as a subprocess"""
+    """Start the Flask app as a subprocess, without waiting for it to serve requests"""
     global flask_process
     
-    print("Starting TIDAL Flask app...")
-    
-    # Find uv executable
-    uv_executable = find_uv_executable()
-    print(f"Using uv executable: {uv_executable}")
+    command = backend_command()
+    logger.info("Starting TIDAL backend: %s", " ".join(command))
     
-    # Start the Flask app using uv
-    flask_process = subprocess.Popen([
-        uv_executable, "run",
-        "--with", "tidalapi",
-        "--with", "flask",
-        "--with", "requests",
-        "python", FLASK_APP_PATH
-    ], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    # Make the tidal_api package importable for the subprocess
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [PROJECT_ROOT, env.get("PYTHONPATH")]))
+    # The backend logs JSON lines to its stderr and we write them out with our own
+    # logging, so there is a single writer to TIDAL_MCP_LOG_FILE
+    env["TIDAL_MCP_LOG_FORMAT"] = "json"
+    env.pop("TIDAL_MCP_LOG_FILE", None)
     
-    # Optional: Read a few lines to ensure the app starts properly
-    for _ in range(5):  # Read first 5 lines of output
-        line = flask_process.stdout.readline()
-        if line:
-            print(f"Flask app: {line.decode().strip()}")
-    
-    print("TIDAL Flask app started")
+    flask_process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+    threading.Thread(
+        target=_drain_output, args=(flask_process.stdout,), name="tidal-backend-output", daemon=True
+    ).start()
+
+def _drain_output(stream):
+    """Log the backend's output as it arrives, so the pipe never fills up and blocks the backend."""
+    from tidal_api.logs import replay
+
+    with stream:
+        for line in iter(stream.readline, b""):
+            replay(line.decode(errors="replace").rstrip(), backend_logger)
+
+def wait_for_backend(client, timeout: float = STARTUP_TIMEOUT) -> dict:
+    """
+    Poll the started backend's /health until it answers, and return its payload.
+    Raises RuntimeError if the process exits or doesn't answer within `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.02
+    while True:
+        health = client.health()
+        if health and health.get("service") == BACKEND_SERVICE:
+            return health
+        if flask_process is not None and flask_process.poll() is not None:
+            raise RuntimeError(f"TIDAL backend exited with code {flask_process.returncode} during startup")
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"TIDAL backend did not answer /health within {timeout:.0f}s")
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
 
 def shutdown_flask_app():
     """Shutdown the Flask app subprocess when the MCP server exits"""
     global flask_process
     
     if flask_process:
-        print("Shutting down TIDAL Flask app...")
-        # Try to terminate gracefully first
+        logger.info("Shutting down TIDAL Flask app...")
+        # Try to terminate gracefully first: the backend finishes in-flight requests
         flask_process.terminate()
         try:
-            # Wait up to 5 seconds for process to terminate
-            flask_process.wait(timeout=5)
+            # Wait for that, plus a little for the process to exit
+            flask_process.wait(timeout=SHUTDOWN_TIMEOUT + 2)
         except subprocess.TimeoutExpired:
             # If it doesn't terminate in time, force kill it
             flask_process.kill()
-        print("TIDAL Flask app shutdown complete")
\ No newline at end of file
+        logger.info("TIDAL Flask app shutdown complete")
+        flask_process = None
\ No newline at end of file
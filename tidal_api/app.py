@@ -1,16 +1,102 @@
-import os
-import tempfile
+import gzip
+import time
 import functools
 
-from flask import Flask, request, jsonify
-from pathlib import Path
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+from tidal_api import service
+from tidal_api.browser_session import BrowserSession
+from tidal_api.encoding import GZIP_LEVEL, GZIP_MIN_BYTES, apply_view, dumps, loads, parse_view
+from tidal_api.metrics import registry, request_duration
+from tidal_api.session_manager import session_manager, SESSION_FILE
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider on top of the codec in encoding.py (orjson when installed)."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return dumps(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
 
-from browser_session import BrowserSession
-from utils import format_track_data, bound_limit
 
 app = Flask(__name__)
-token_path = os.path.join(tempfile.gettempdir(), 'tidal-session-oauth.json')
-SESSION_FILE = Path(token_path)
+app.json = FastJSONProvider(app)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.before_request
+def track_request_started():
+    # The background prefetch stays out of the way of requests in flight
+    service.prefetcher.request_started()
+
+
+@app.teardown_request
+def track_request_finished(exc):
+    # Runs after streamed responses are fully sent
+    service.prefetcher.request_finished()
+
+
+@app.after_request
+def record_request_duration(response):
+    # Streamed responses are timed until their first byte
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    request_duration.observe(
+        time.perf_counter() - g.request_started,
+        route=route,
+        method=request.method,
+        status=response.status_code,
+    )
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    # Streamed responses are sent as they are, compressing them would hold chunks back
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or "gzip" not in request.headers.get("Accept-Encoding", "")
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    body = response.get_data()
+    if len(body) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(body, GZIP_LEVEL))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def request_view():
+    """The track view (`fields` and `format` query parameters) of the current request."""
+    return parse_view(request.args.get('fields'), request.args.get('format'))
+
+
+def with_track_view(f):
+    """
+    Decorator for routes returning tracks: applies the request's `fields`
+    projection and `format` to the result, or returns 400 if they are invalid.
+    """
+    @functools.wraps(f)
+    def decorated_function(*args, **kwargs):
+        view, error = request_view()
+        if error:
+            return error
+        return apply_view(f(*args, **kwargs), view)
+    return decorated_function
+
 
 def requires_tidal_auth(f):
     """
@@ -22,14 +108,13 @@ def requires_tidal_auth(f):
     def decorated_function(*args, **kwargs):
         if not SESSION_FILE.exists():
             return jsonify({"error": "Not authenticated"}), 401
-        
-        # Create session and load from file
-        session = BrowserSession()
-        login_success = session.login_session_file_auto(SESSION_FILE)
-        
-        if not login_success:
+
+        # Reuse the process-wide session, only reloading it if the file changed
+        session = session_manager.get_session()
+
+        if session is None:
             return jsonify({"error": "Authentication failed"}), 401
-            
+
         # Add the authenticated session to kwargs
         kwargs['session'] = session
         return f(*args, **kwargs)
@@ -42,188 +127,114 @@ def login():
     Initiates the TIDAL authentication process.
     Automatically opens a browser for the user to login to their TIDAL account.
     """
-    # Create our custom session object
-    session = BrowserSession()
-    
-    def log_message(msg):
-        print(f"TIDAL AUTH: {msg}")
-    
-    # Try to authenticate (will open browser if needed)
-    try:
-        login_success = session.login_session_file_auto(SESSION_FILE, fn_print=log_message)
-        
-        if login_success:
-            return jsonify({
-                "status": "success", 
-                "message": "Successfully authenticated with TIDAL",
-                "user_id": session.user.id
-            })
-        else:
-            return jsonify({
-                "status": "error",
-                "message": "Authentication failed"
-            }), 401
-    
-    except TimeoutError:
-        return jsonify({
-            "status": "error",
-            "message": "Authentication timed out"
-        }), 408
-    
-    except Exception as e:
-        return jsonify({
-            "status": "error",
-            "message": str(e)
-        }), 500
+    return service.login()
 
 @app.route('/api/auth/status', methods=['GET'])
 def auth_status():
     """
     Check if there's an active authenticated session.
     """
-    if not SESSION_FILE.exists():
-        return jsonify({
-            "authenticated": False,
-            "message": "No session file found"
-        })
-    
-    # Create session and try to load from file
-    session = BrowserSession()
-    login_success = session.login_session_file_auto(SESSION_FILE)
-    
-    if login_success:
-        # Get basic user info
-        user_info = {
-            "id": session.user.id,
-            "username": session.user.username if hasattr(session.user, 'username') else "N/A",
-            "email": session.user.email if hasattr(session.user, 'email') else "N/A"            
-        }
-        
-        return jsonify({
-            "authenticated": True,
-            "message": "Valid TIDAL session",
-            "user": user_info
-        })
-    else:
-        return jsonify({
-            "authenticated": False,
-            "message": "Invalid or expired session"
-        })
+    return service.auth_status()
+
+@app.route('/health', methods=['GET'])
+def health():
+    """
+    Readiness probe used by the MCP server before it sends requests.
+    """
+    return service.health("flask")
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Get hit/miss counters and sizes of the in-memory caches.
+    """
+    return service.cache_stats()
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """
+    Request and upstream latency histograms, runtime gauges and cache stats
+    in the Prometheus text format.
+    """
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/api/metrics/summary', methods=['GET'])
+def metrics_summary():
+    """
+    The metrics as a JSON summary.
+    """
+    return service.metrics_summary()
 
 @app.route('/api/tracks', methods=['GET'])
+@with_track_view
 @requires_tidal_auth
 def get_tracks(session: BrowserSession):
     """
     Get tracks from the user's history.
+    Large collections are paged with `offset`, or with the `next_cursor` of the previous response.
+    `max_age` is the accepted age in seconds of the local library mirror (0 syncs with TIDAL first).
     """
-    try:        
-        # TODO: Add streaminig history support if TIDAL API allows it
-        # Get user favorites or history (for now limiting to user favorites only)
-        favorites = session.user.favorites
-        
-        # Get limit from query parameter, default to 10 if not specified
-        limit = bound_limit(request.args.get('limit', default=10, type=int))
-        
-        tracks = favorites.tracks(limit=limit, order="DATE", order_direction="DESC")        
-        track_list = [format_track_data(track) for track in tracks]
-
-        return jsonify({"tracks": track_list})
-    except Exception as e:
-        return jsonify({"error": f"Error fetching tracks: {str(e)}"}), 500
-    
-    
+    # Get limit from query parameter, default to 10 if not specified
+    limit = request.args.get('limit', default=10, type=int)
+    offset = request.args.get('offset', default=0, type=int)
+    cursor = request.args.get('cursor')
+    max_age = request.args.get('max_age', type=float)
+    return service.get_tracks(session, limit, offset, cursor, max_age)
+
+
 @app.route('/api/recommendations/track/<track_id>', methods=['GET'])
+@with_track_view
 @requires_tidal_auth
 def get_track_recommendations(track_id: str, session: BrowserSession):
     """
     Get recommended tracks based on a specific track using TIDAL's track radio feature.
     """
-    try:
-        # Get limit from query parameter, default to 10 if not specified
-        limit = bound_limit(request.args.get('limit', default=10, type=int))
-                
-        # Get recommendations using track radio
-        track = session.track(track_id)
-        if not track:
-            return jsonify({"error": f"Track with ID {track_id} not found"}), 404
-            
-        recommendations = track.get_track_radio(limit=limit)
-        
-        # Format track data
-        track_list = [format_track_data(track) for track in recommendations]        
-        return jsonify({"recommendations": track_list})
-    except Exception as e:
-        return jsonify({"error": f"Error fetching recommendations: {str(e)}"}), 500    
+    # Get limit from query parameter, default to 10 if not specified
+    limit = request.args.get('limit', default=10, type=int)
+    return service.get_track_recommendations(session, track_id, limit)
 
 
 @app.route('/api/recommendations/batch', methods=['POST'])
+@with_track_view
 @requires_tidal_auth
 def get_batch_recommendations(session: BrowserSession):
     """
     Get recommended tracks based on a list of track IDs using concurrent requests.
     """
-    import concurrent.futures
-    
-    try:
-        # Get request data
-        request_data = request.get_json()
-        if not request_data or 'track_ids' not in request_data:
-            return jsonify({"error": "Missing track_ids in request body"}), 400
-            
-        track_ids = request_data['track_ids']
-        if not isinstance(track_ids, list):
-            return jsonify({"error": "track_ids must be a list"}), 400
-            
-        # Get limit per track from query parameter
-        limit_per_track = bound_limit(request_data.get('limit_per_track', 20))
-                    
-        # Optional parameter to remove duplicates across recommendations
-        remove_duplicates = request_data.get('remove_duplicates', True)
-        
-        def get_track_recommendations(track_id):
-            """Function to get recommendations for a single track"""
-            try:
-                track = session.track(track_id)
-                recommendations = track.get_track_radio(limit=limit_per_track)
-                # Format track data immediately
-                formatted_recommendations = [
-                    format_track_data(rec, source_track_id=track_id) 
-                    for rec in recommendations
-                ]
-                return formatted_recommendations
-            except Exception as e:
-                print(f"Error getting recommendations for track {track_id}: {str(e)}")
-                return []
-        
-        all_recommendations = []
-        seen_track_ids = set()
-        
-        # Use ThreadPoolExecutor to process tracks concurrently
-        with concurrent.futures.ThreadPoolExecutor(max_workers=len(track_ids)) as executor:
-            # Submit all tasks and map them to their track_ids
-            future_to_track_id = {
-                executor.submit(get_track_recommendations, track_id): track_id 
-                for track_id in track_ids
-            }
-            
-            # Process results as they complete
-            for future in concurrent.futures.as_completed(future_to_track_id):
-                track_recommendations = future.result()
-                
-                # Add recommendations to the result list
-                for track_data in track_recommendations:
-                    track_id = track_data.get('id')
-                    
-                    # Skip if we've already seen this track and want to remove duplicates
-                    if remove_duplicates and track_id in seen_track_ids:
-                        continue
-                        
-                    all_recommendations.append(track_data)
-                    seen_track_ids.add(track_id)
-        
-        return jsonify({"recommendations": all_recommendations})
-    except Exception as e:
-        return jsonify({"error": f"Error fetching batch recommendations: {str(e)}"}), 500
+    return service.get_batch_recommendations(session, request.get_json(silent=True))
+
+
+@app.route('/api/recommendations/expand', methods=['POST'])
+@with_track_view
+@requires_tidal_auth
+def expand_recommendations(session: BrowserSession):
+    """
+    Multi-hop recommendations from a list of track IDs (or the newest favorites),
+    ranked by how strongly they are connected to the seeds.
+
+    Body: {"track_ids": [...], "from_favorites": 20, "hops": 2, "limit_per_track": 10,
+           "max_nodes": 200, "limit": 50}
+    """
+    return service.expand_recommendations(session, request.get_json(silent=True))
+
+
+@app.route('/api/recommendations/batch/stream', methods=['POST'])
+@requires_tidal_auth
+def stream_batch_recommendations(session: BrowserSession):
+    """
+    Streaming variant of /api/recommendations/batch.
+    Sends each seed's recommendations as one NDJSON line as soon as they are ready,
+    followed by a {"done": true} summary line.
+    """
+    view, error = request_view()
+    if error:
+        return error
+    result, status = service.stream_batch_recommendations(session, request.get_json(silent=True))
+    if status != 200:
+        return result, status
+
+    lines = (dumps(view.apply(chunk)) + b"\n" for chunk in result)
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson")
 
 
 @app.route('/api/playlists', methods=['POST'])
@@ -231,63 +242,32 @@ def get_batch_recommendations(session: BrowserSession):
 def create_playlist(session: BrowserSession):
     """
     Creates a new TIDAL playlist and adds tracks to it.
-    
+
     Expected JSON payload:
     {
         "title": "Playlist title",
         "description": "Playlist description",
-        "track_ids": [123456789, 987654321, ...]
+        "track_ids": [123456789, 987654321, ...],
+        "chunk_size": 100  (optional, tracks per add request)
+    }
+
+    or, to resume a job that failed partway:
+    {
+        "job_id": "..."
     }
-    
-    Returns the created playlist information.
-    """
-    try:
-        # Get request data
-        request_data = request.get_json()
-        if not request_data:
-            return jsonify({"error": "Missing request body"}), 400
-            
-        # Validate required fields
-        if 'title' not in request_data:
-            return jsonify({"error": "Missing 'title' in request body"}), 400
-            
-        if 'track_ids' not in request_data or not request_data['track_ids']:
-            return jsonify({"error": "Missing 'track_ids' in request body or empty track list"}), 400
-            
-        # Get parameters from request
-        title = request_data['title']
-        description = request_data.get('description', '')  # Optional
-        track_ids = request_data['track_ids']
-        
-        # Validate track_ids is a list
-        if not isinstance(track_ids, list):
-            return jsonify({"error": "'track_ids' must be a list"}), 400
-        
-        # Create the playlist
-        playlist = session.user.create_playlist(title, description)
-        
-        # Add tracks to the playlist
-        playlist.add(track_ids)
-        
-        # Return playlist information
-        playlist_info = {
-            "id": playlist.id,
-            "title": playlist.name,
-            "description": playlist.description,
-            "created": playlist.created,
-            "last_updated": playlist.last_updated,
-            "track_count": playlist.num_tracks,
-            "duration": playlist.duration,
-        }
-        
-        return jsonify({
-            "status": "success",
-            "message": f"Playlist '{title}' created successfully with {len(track_ids)} tracks",
-            "playlist": playlist_info
-        })
-        
-    except Exception as e:
-        return jsonify({"error": f"Error creating playlist: {str(e)}"}), 500
+
+    Returns the created playlist information and the job's progress.
+    """
+    return service.create_playlist(session, request.get_json(silent=True))
+
+
+@app.route('/api/playlists/jobs/<job_id>', methods=['GET'])
+@requires_tidal_auth
+def get_playlist_job(job_id: str, session: BrowserSession):
+    """
+    Get the progress of a playlist creation job.
+    """
+    return service.get_playlist_job(session, job_id)
 
 
 @app.route('/api/playlists', methods=['GET'])
@@ -295,68 +275,57 @@ def create_playlist(session: BrowserSession):
 def get_user_playlists(session: BrowserSession):
     """
     Get the user's playlists from TIDAL.
+    Sorted by `sort` (last_updated, created, title, track_count or duration) and `order`
+    (asc or desc), paged with `limit` and `offset` or the `next_cursor` of the previous
+    response. `fields` (e.g. `id,title,track_count`) keeps only some playlist fields.
+    `max_age` is the accepted age in seconds of the local library mirror (0 syncs with TIDAL first).
     """
-    try:        
-        # Get user playlists
-        playlists = session.user.playlists()
-        
-        # Format playlist data
-        playlist_list = []
-        for playlist in playlists:
-            playlist_info = {
-                "id": playlist.id,
-                "title": playlist.name,
-                "description": playlist.description if hasattr(playlist, 'description') else "",
-                "created": playlist.created if hasattr(playlist, 'created') else None,
-                "last_updated": playlist.last_updated if hasattr(playlist, 'last_updated') else None,
-                "track_count": playlist.num_tracks if hasattr(playlist, 'num_tracks') else 0,
-                "duration": playlist.duration if hasattr(playlist, 'duration') else 0,
-                "url": f"https://tidal.com/playlist/{playlist.id}"
-            }
-            playlist_list.append(playlist_info)
-        
-        # Sort playlists by last_updated in descending order
-        sorted_playlists = sorted(
-            playlist_list, 
-            key=lambda x: x.get('last_updated', ''), 
-            reverse=True
-        )
-
-        return jsonify({"playlists": sorted_playlists})
-    except Exception as e:
-        return jsonify({"error": f"Error fetching playlists: {str(e)}"}), 500
-    
+    limit = request.args.get('limit', default=100, type=int)
+    offset = request.args.get('offset', default=0, type=int)
+    cursor = request.args.get('cursor')
+    sort = request.args.get('sort', default='last_updated')
+    order = request.args.get('order')
+    fields = request.args.get('fields')
+    max_age = request.args.get('max_age', type=float)
+    return service.get_user_playlists(session, limit, offset, cursor, sort, order, fields, max_age)
+
 
 @app.route('/api/playlists/<playlist_id>/tracks', methods=['GET'])
+@with_track_view
 @requires_tidal_auth
 def get_playlist_tracks(playlist_id: str, session: BrowserSession):
     """
     Get tracks from a specific TIDAL playlist.
+    Large playlists are paged with `offset`, or with the `next_cursor` of the previous response.
+    `max_age` is the accepted age in seconds of the local library mirror (0 syncs with TIDAL first).
+    """
+    # Get limit from query parameter, default to 100 if not specified
+    limit = request.args.get('limit', default=100, type=int)
+    offset = request.args.get('offset', default=0, type=int)
+    cursor = request.args.get('cursor')
+    max_age = request.args.get('max_age', type=float)
+    return service.get_playlist_tracks(session, playlist_id, limit, offset, cursor, max_age)
+
+
+@app.route('/api/playlists/<playlist_id>', methods=['PATCH'])
+@requires_tidal_auth
+def update_playlist(playlist_id: str, session: BrowserSession):
+    """
+    Makes a playlist's tracks match the given list with the fewest edits
+    (removes, moves and inserts), keeping the playlist and its ID.
+
+    Expected JSON payload:
+    {
+        "track_ids": [123456789, 987654321, ...],  (the desired tracks, in order)
+        "title": "New title",  (optional)
+        "description": "New description",  (optional)
+        "dry_run": false  (optional, only plan the edits)
+    }
+
+    Returns the playlist information and the number of tracks added, removed and moved.
     """
-    try:
-        # Get limit from query parameter, default to 100 if not specified
-        limit = bound_limit(request.args.get('limit', default=100, type=int))
-        
-        # Get the playlist object
-        playlist = session.playlist(playlist_id)
-        if not playlist:
-            return jsonify({"error": f"Playlist with ID {playlist_id} not found"}), 404
-            
-        # Get tracks from the playlist with pagination if needed
-        tracks = playlist.items(limit=limit)
-        
-        # Format track data
-        track_list = [format_track_data(track) for track in tracks]
-        
-        return jsonify({
-            "playlist_id": playlist.id,
-            "tracks": track_list,
-            "total_tracks": len(track_list)
-        })
-        
-    except Exception as e:
-        return jsonify({"error": f"Error fetching playlist tracks: {str(e)}"}), 500
-    
+    return service.update_playlist(session, playlist_id, request.get_json(silent=True))
+
 
 @app.route('/api/playlists/<playlist_id>', methods=['DELETE'])
 @requires_tidal_auth
@@ -364,29 +333,34 @@ def delete_playlist(playlist_id: str, session: BrowserSession):
     """
     Delete a TIDAL playlist by its ID.
     """
-    try:
-        # Get the playlist object
-        playlist = session.playlist(playlist_id)
-        if not playlist:
-            return jsonify({"error": f"Playlist with ID {playlist_id} not found"}), 404
-            
-        # Delete the playlist
-        playlist.delete()
-        
-        return jsonify({
-            "status": "success",
-            "message": f"Playlist with ID {playlist_id} was successfully deleted"
-        })
-        
-    except Exception as e:
-        return jsonify({"error": f"Error deleting playlist: {str(e)}"}), 500
-    
-    
+    return service.delete_playlist(session, playlist_id)
+
+
 if __name__ == '__main__':
     import os
-    
+    import logging
+
+    from tidal_api.logs import configure_logging
+
+    configure_logging()
+    logger = logging.getLogger("tidal_api.app")
+
     # Get port from environment variable or use default
     port = int(os.environ.get("TIDAL_MCP_PORT", 5050))
-    
-    print(f"Starting Flask app on port {port}")
-    app.run(debug=True, port=port)
\ No newline at end of file
+
+    # Flask's debugger and reloader, for development only (the reloader runs the app in a second process)
+    debug = os.environ.get("TIDAL_MCP_DEBUG", "0").lower() in ("1", "true", "yes")
+
+    # Warm up the caches in the background if a stored session is still valid
+    # (in the process that serves requests, not in the reloader's watcher)
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        service.prefetcher.start()
+
+    # Optionally listen on a Unix domain socket instead of TCP
+    socket_path = os.environ.get("TIDAL_MCP_SOCKET")
+    if socket_path:
+        logger.info("Starting Flask app on unix socket %s", socket_path)
+        app.run(debug=debug, host=f"unix://{socket_path}", port=port)
+    else:
+        logger.info("Starting Flask app on port %d", port)
+        app.run(debug=debug, port=port)
@@ -0,0 +1,354 @@
+"""
+ASGI serving mode for the TIDAL API: the same routes as the Flask app in app.py,
+served from a single event loop.
+
+The tidalapi calls are blocking, so every operation is offloaded to a bounded
+pool of worker threads (`TIDAL_MCP_ASGI_THREADS`). Requests waiting for a
+worker, or for a slow streamed batch, wait on the event loop instead of each
+holding an OS thread. Upstream fan-out still goes through the shared executor
+and rate limiter in upstream.py.
+
+Run with `python -m tidal_api.asgi` (requires starlette and uvicorn).
+"""
+import os
+import time
+import functools
+
+import anyio
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from tidal_api import service
+from tidal_api.encoding import GZIP_LEVEL, GZIP_MIN_BYTES, apply_view, dumps, parse_view
+from tidal_api.metrics import registry, request_duration
+from tidal_api.session_manager import session_manager, SESSION_FILE
+
+# Maximum number of worker threads running blocking TIDAL operations at once
+ASGI_THREADS = int(os.environ.get("TIDAL_MCP_ASGI_THREADS", 32))
+# How long in-flight requests get to finish on shutdown, in seconds
+SHUTDOWN_TIMEOUT = float(os.environ.get("TIDAL_MCP_SHUTDOWN_TIMEOUT", 10))
+
+limiter = anyio.CapacityLimiter(ASGI_THREADS)
+
+
+class TidalJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+async def run_blocking(fn, *args):
+    """Run a blocking call on the bounded worker pool."""
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args), limiter=limiter)
+
+
+def respond(result) -> TidalJSONResponse:
+    payload, status = result
+    return TidalJSONResponse(payload, status_code=status)
+
+
+def query_arg(request: Request, name: str, default=None, type=str):
+    """Typed query parameter, falling back to `default` if missing or invalid (like Flask's request.args.get)."""
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        return type(value)
+    except ValueError:
+        return default
+
+
+def request_view(request: Request):
+    """The track view (`fields` and `format` query parameters) of the request."""
+    return parse_view(request.query_params.get('fields'), request.query_params.get('format'))
+
+
+def with_track_view(handler):
+    """
+    Decorator for handlers returning tracks as a `(payload, status_code)` result:
+    applies the request's `fields` projection and `format` and sends it, or
+    returns 400 if they are invalid. Responses from the handler are passed through.
+    """
+    @functools.wraps(handler)
+    async def decorated_handler(request: Request):
+        view, error = request_view(request)
+        if error:
+            return respond(error)
+        result = await handler(request)
+        if isinstance(result, tuple):
+            return respond(apply_view(result, view))
+        return result
+    return decorated_handler
+
+
+async def json_body(request: Request):
+    """The request's JSON body, or None if it is missing or invalid (like Flask's get_json(silent=True))."""
+    try:
+        return await request.json()
+    except Exception:
+        return None
+
+
+def requires_tidal_auth(handler):
+    """
+    Decorator to ensure routes have an authenticated TIDAL session.
+    The session is passed to the handler after the request.
+    """
+    @functools.wraps(handler)
+    async def decorated_handler(request: Request):
+        if not SESSION_FILE.exists():
+            return TidalJSONResponse({"error": "Not authenticated"}, status_code=401)
+
+        # Reuse the process-wide session, only reloading it if the file changed
+        session = await run_blocking(session_manager.get_session)
+
+        if session is None:
+            return TidalJSONResponse({"error": "Authentication failed"}, status_code=401)
+
+        return await handler(request, session)
+    return decorated_handler
+
+
+async def login(request: Request):
+    return respond(await run_blocking(service.login))
+
+
+async def auth_status(request: Request):
+    return respond(await run_blocking(service.auth_status))
+
+
+async def health(request: Request):
+    return respond(service.health("asgi"))
+
+
+async def cache_stats(request: Request):
+    return respond(service.cache_stats())
+
+
+async def metrics(request: Request):
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+async def metrics_summary(request: Request):
+    return respond(service.metrics_summary())
+
+
+@with_track_view
+@requires_tidal_auth
+async def get_tracks(request: Request, session):
+    limit = query_arg(request, 'limit', 10, int)
+    offset = query_arg(request, 'offset', 0, int)
+    cursor = query_arg(request, 'cursor')
+    max_age = query_arg(request, 'max_age', type=float)
+    return await run_blocking(service.get_tracks, session, limit, offset, cursor, max_age)
+
+
+@with_track_view
+@requires_tidal_auth
+async def get_track_recommendations(request: Request, session):
+    track_id = request.path_params['track_id']
+    limit = query_arg(request, 'limit', 10, int)
+    return await run_blocking(service.get_track_recommendations, session, track_id, limit)
+
+
+@with_track_view
+@requires_tidal_auth
+async def get_batch_recommendations(request: Request, session):
+    request_data = await json_body(request)
+    return await run_blocking(service.get_batch_recommendations, session, request_data)
+
+
+@with_track_view
+@requires_tidal_auth
+async def expand_recommendations(request: Request, session):
+    request_data = await json_body(request)
+    return await run_blocking(service.expand_recommendations, session, request_data)
+
+
+@requires_tidal_auth
+async def stream_batch_recommendations(request: Request, session):
+    view, error = request_view(request)
+    if error:
+        return respond(error)
+    request_data = await json_body(request)
+    result, status = await run_blocking(service.stream_batch_recommendations, session, request_data)
+    if status != 200:
+        return respond((result, status))
+
+    async def lines():
+        # Pull each chunk on a worker thread, the event loop only waits for it
+        chunks = iter(result)
+        while True:
+            chunk = await run_blocking(next, chunks, None)
+            if chunk is None:
+                break
+            yield dumps(view.apply(chunk)) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@requires_tidal_auth
+async def create_playlist(request: Request, session):
+    request_data = await json_body(request)
+    return respond(await run_blocking(service.create_playlist, session, request_data))
+
+
+@requires_tidal_auth
+async def get_playlist_job(request: Request, session):
+    job_id = request.path_params['job_id']
+    return respond(await run_blocking(service.get_playlist_job, session, job_id))
+
+
+@requires_tidal_auth
+async def get_user_playlists(request: Request, session):
+    limit = query_arg(request, 'limit', 100, int)
+    offset = query_arg(request, 'offset', 0, int)
+    cursor = query_arg(request, 'cursor')
+    sort = query_arg(request, 'sort', 'last_updated')
+    order = query_arg(request, 'order')
+    fields = query_arg(request, 'fields')
+    max_age = query_arg(request, 'max_age', type=float)
+    result = await run_blocking(
+        service.get_user_playlists, session, limit, offset, cursor, sort, order, fields, max_age
+    )
+    return respond(result)
+
+
+@with_track_view
+@requires_tidal_auth
+async def get_playlist_tracks(request: Request, session):
+    playlist_id = request.path_params['playlist_id']
+    limit = query_arg(request, 'limit', 100, int)
+    offset = query_arg(request, 'offset', 0, int)
+    cursor = query_arg(request, 'cursor')
+    max_age = query_arg(request, 'max_age', type=float)
+    return await run_blocking(
+        service.get_playlist_tracks, session, playlist_id, limit, offset, cursor, max_age
+    )
+
+
+@requires_tidal_auth
+async def update_playlist(request: Request, session):
+    playlist_id = request.path_params['playlist_id']
+    request_data = await json_body(request)
+    return respond(await run_blocking(service.update_playlist, session, playlist_id, request_data))
+
+
+@requires_tidal_auth
+async def delete_playlist(request: Request, session):
+    playlist_id = request.path_params['playlist_id']
+    return respond(await run_blocking(service.delete_playlist, session, playlist_id))
+
+
+routes = [
+    Route('/health', health, methods=['GET']),
+    Route('/api/auth/login', login, methods=['GET']),
+    Route('/api/auth/status', auth_status, methods=['GET']),
+    Route('/api/cache/stats', cache_stats, methods=['GET']),
+    Route('/api/metrics', metrics, methods=['GET']),
+    Route('/api/metrics/summary', metrics_summary, methods=['GET']),
+    Route('/api/tracks', get_tracks, methods=['GET']),
+    Route('/api/recommendations/track/{track_id}', get_track_recommendations, methods=['GET']),
+    Route('/api/recommendations/batch', get_batch_recommendations, methods=['POST']),
+    Route('/api/recommendations/batch/stream', stream_batch_recommendations, methods=['POST']),
+    Route('/api/recommendations/expand', expand_recommendations, methods=['POST']),
+    Route('/api/playlists', create_playlist, methods=['POST']),
+    Route('/api/playlists', get_user_playlists, methods=['GET']),
+    Route('/api/playlists/jobs/{job_id}', get_playlist_job, methods=['GET']),
+    Route('/api/playlists/{playlist_id}/tracks', get_playlist_tracks, methods=['GET']),
+    Route('/api/playlists/{playlist_id}', update_playlist, methods=['PATCH']),
+    Route('/api/playlists/{playlist_id}', delete_playlist, methods=['DELETE']),
+]
+
+
+class RequestActivityMiddleware:
+    """Tells the background prefetch which requests are in flight, so it stays out of their way."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        service.prefetcher.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            service.prefetcher.request_finished()
+
+
+class RequestMetricsMiddleware:
+    """Records the duration of every request by route template (streamed responses until their first byte)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start":
+                route = getattr(scope.get("route"), "path", "unmatched")
+                request_duration.observe(
+                    time.perf_counter() - started,
+                    route=route,
+                    method=scope["method"],
+                    status=message["status"],
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_and_record)
+
+
+app = Starlette(routes=routes, middleware=[
+    Middleware(RequestActivityMiddleware),
+    Middleware(RequestMetricsMiddleware),
+    # Streamed batches are sent uncompressed, compressing them would hold chunks back
+    Middleware(
+        GZipMiddleware,
+        minimum_size=GZIP_MIN_BYTES,
+        compresslevel=GZIP_LEVEL,
+        exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/x-ndjson",),
+    ),
+])
+
+
+if __name__ == '__main__':
+    import logging
+
+    import uvicorn
+
+    from tidal_api.logs import ACCESS_LOG, configure_logging
+
+    configure_logging()
+    logger = logging.getLogger("tidal_api.asgi")
+
+    # Get port from environment variable or use default
+    port = int(os.environ.get("TIDAL_MCP_PORT", 5050))
+
+    # Warm up the caches in the background if a stored session is still valid
+    service.prefetcher.start()
+
+    # Optionally listen on a Unix domain socket instead of TCP
+    socket_path = os.environ.get("TIDAL_MCP_SOCKET")
+    if socket_path:
+        logger.info("Starting ASGI app on unix socket %s", socket_path)
+        # log_config=None keeps the logging set up above
+        uvicorn.run(
+            app, uds=socket_path,
+            log_config=None, access_log=ACCESS_LOG, timeout_graceful_shutdown=SHUTDOWN_TIMEOUT,
+        )
+    else:
+        logger.info("Starting ASGI app on port %d", port)
+        uvicorn.run(
+            app, host="127.0.0.1", port=port,
+            log_config=None, access_log=ACCESS_LOG, timeout_graceful_shutdown=SHUTDOWN_TIMEOUT,
+        )
@@ -3,11 +3,18 @@ import tidalapi
 from typing import Callable, Optional
 from pathlib import Path
 
+from tidal_api.upstream import install_rate_limiter
+
 class BrowserSession(tidalapi.Session):
     """
     Extended tidalapi.Session that automatically opens the login URL in a browser
+    and shares the process-wide upstream rate limit
     """
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        install_rate_limiter(self.request_session)
+    
     def login_oauth_simple(self, fn_print: Callable[[str], None] = print) -> None:
         """
         Login to TIDAL with a remote link, automatically opening the URL in a browser.
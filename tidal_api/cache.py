@@ -0,0 +1,193 @@
+"""
+In-memory caches for upstream TIDAL results.
+"""
+import os
+import sys
+import time
+import threading
+
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+# Track radio results: time to live (seconds), max number of seeds and approximate max bytes (0 = no limit)
+RADIO_CACHE_TTL = float(os.environ.get("TIDAL_MCP_RADIO_CACHE_TTL", 900))
+RADIO_CACHE_MAX_ENTRIES = int(os.environ.get("TIDAL_MCP_RADIO_CACHE_ENTRIES", 2000))
+RADIO_CACHE_MAX_BYTES = int(os.environ.get("TIDAL_MCP_RADIO_CACHE_BYTES", 32 * 1024 * 1024))
+
+
+def approximate_size(value: Any) -> int:
+    """Rough memory footprint of a value built from dicts, lists, tuples, slotted records and scalars."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(approximate_size(item) for item in value)
+    elif hasattr(type(value), '__slots__'):
+        size += sum(approximate_size(getattr(value, name, None)) for name in type(value).__slots__)
+    return size
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after `ttl` seconds.
+
+    The least recently used entries are evicted once there are more than
+    `max_entries` entries or their approximate size exceeds `max_bytes`
+    (a limit of 0 disables it). Hits, misses and evictions are counted.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int = 0,
+        max_bytes: int = 0,
+        sizeof: Callable[[Any], int] = approximate_size,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        # key -> (expires_at, size, value), ordered from least to most recently used
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(
+        self,
+        key: Hashable,
+        default: Any = None,
+        accept: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Return the cached value for `key`, or `default` if it is missing or expired.
+        If `accept` is given, a cached value it rejects is also treated as a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, _, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+
+            if accept is not None and not accept(value):
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def expires_in(self, key: Hashable, accept: Optional[Callable[[Any], bool]] = None) -> float:
+        """
+        Seconds until the entry for `key` expires, 0 if it is missing, expired or
+        rejected by `accept`. Unlike `get()` this is not counted as a hit or a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return 0.0
+            expires_at, _, value = entry
+            if accept is not None and not accept(value):
+                return 0.0
+            return max(expires_at - time.monotonic(), 0.0)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = self._sizeof(value) if self.max_bytes else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            self._evict()
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self) -> None:
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+
+class RadioCache:
+    """
+    Cache of track radio results keyed by (track_id, limit).
+
+    Only the largest result fetched for a track is kept, and a request for a
+    smaller limit is served by slicing it. If a radio returned fewer tracks than
+    the limit it was fetched with, it is complete and serves any limit.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 0, max_bytes: int = 0):
+        self._cache = TTLCache(ttl, max_entries=max_entries, max_bytes=max_bytes)
+
+    @staticmethod
+    def _covers(limit: int) -> Callable[[tuple], bool]:
+        def covers(entry) -> bool:
+            cached_limit, tracks = entry
+            return limit <= cached_limit or len(tracks) < cached_limit
+        return covers
+
+    def get(self, track_id, limit: int) -> Optional[list]:
+        entry = self._cache.get(str(track_id), accept=self._covers(limit))
+        if entry is None:
+            return None
+        return entry[1][:limit]
+
+    def expires_in(self, track_id, limit: int) -> float:
+        """Seconds until the cached radio that serves `limit` expires (0 if there is none)."""
+        return self._cache.expires_in(str(track_id), accept=self._covers(limit))
+
+    def set(self, track_id, limit: int, tracks: list) -> None:
+        self._cache.set(str(track_id), (limit, tracks))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+radio_cache = RadioCache(
+    RADIO_CACHE_TTL,
+    max_entries=RADIO_CACHE_MAX_ENTRIES,
+    max_bytes=RADIO_CACHE_MAX_BYTES,
+)
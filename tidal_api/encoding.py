@@ -0,0 +1,177 @@
+"""
+Encoding of API responses: the JSON codec, field projection of tracks and
+playlists and the columnar track format.
+
+Responses that list tracks can be trimmed by the caller with `fields`
+(e.g. `id,title,artist`) and encoded with `format=columnar`, which sends every
+track list as parallel arrays, with artist and album names stored once and
+referenced by index:
+
+    {"format": "columnar", "count": 2, "fields": ["id", "title", "artist"],
+     "columns": {"id": [1, 2], "title": ["A", "B"], "artist": [0, 0]},
+     "artists": ["Artist"], "url_template": "https://tidal.com/browse/track/{id}?u"}
+
+JSON is encoded with orjson when it is installed, with the json module otherwise.
+"""
+import os
+import json
+import datetime
+
+from typing import Iterable, List, Optional
+
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Responses at least this large are gzip-compressed for clients that accept it
+GZIP_MIN_BYTES = int(os.environ.get("TIDAL_MCP_GZIP_MIN_BYTES", 1024))
+GZIP_LEVEL = 6
+
+JSON_CODEC = "orjson" if orjson is not None else "json"
+
+TRACK_URL = "https://tidal.com/browse/track/{id}?u"
+
+# Fields of the track dicts in responses (see utils.format_track_data)
+TRACK_FIELDS = (
+    "id", "title", "artist", "album", "duration", "url",
+    "source_track_id", "score", "seed_count", "in_degree", "hop",
+)
+# Fields of the playlist dicts in playlist listings
+PLAYLIST_FIELDS = ("id", "title", "description", "created", "last_updated", "track_count", "duration", "url")
+# Payload keys holding a list of tracks, and holding a single track
+TRACK_LIST_KEYS = ("tracks", "recommendations", "seed_tracks")
+TRACK_KEYS = ("seed_track",)
+# Columns stored as indexes into a list of distinct values
+DICTIONARY_FIELDS = {"artist": "artists", "album": "albums"}
+
+
+def json_default(value):
+    # Same date format as Flask's JSON provider, so every mode returns identical payloads
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return http_date(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(payload) -> bytes:
+        return orjson.dumps(payload, default=json_default, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+else:
+    def dumps(payload) -> bytes:
+        return json.dumps(payload, default=json_default, separators=(",", ":")).encode("utf-8")
+
+    loads = json.loads
+
+
+class View:
+    """Which track fields a response keeps, and whether track lists are sent as columns."""
+
+    __slots__ = ("fields", "columnar")
+
+    def __init__(self, fields: Optional[List[str]] = None, columnar: bool = False):
+        self.fields = fields
+        self.columnar = columnar
+
+    @property
+    def is_default(self) -> bool:
+        return self.fields is None and not self.columnar
+
+    def project(self, track: dict) -> dict:
+        if self.fields is None:
+            return track
+        return {field: track[field] for field in self.fields if field in track}
+
+    def apply(self, payload):
+        """The payload with its track lists (and single tracks) projected and encoded."""
+        if self.is_default or not isinstance(payload, dict):
+            return payload
+        shaped = dict(payload)
+        for key in TRACK_LIST_KEYS:
+            tracks = shaped.get(key)
+            if isinstance(tracks, list):
+                shaped[key] = to_columns(tracks, self.fields) if self.columnar else [self.project(t) for t in tracks]
+        for key in TRACK_KEYS:
+            if isinstance(shaped.get(key), dict):
+                shaped[key] = self.project(shaped[key])
+        return shaped
+
+
+DEFAULT_VIEW = View()
+
+
+def parse_fields(fields, available=TRACK_FIELDS):
+    """
+    Validate a `fields` option (a comma separated string or a list) against the
+    `available` field names. Returns `(projection, None)`, the projection being
+    None when no fields were given, or `(None, (error, status_code))`.
+    """
+    if not fields:
+        return None, None
+    names = fields.split(",") if isinstance(fields, str) else fields
+    if not isinstance(names, list):
+        return None, ({"error": "fields must be a list or a comma separated string"}, 400)
+    names = [str(name).strip() for name in names if str(name).strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        return None, ({"error": f"Unknown fields: {', '.join(unknown)} (available: {', '.join(available)})"}, 400)
+    # The ID is always kept, items can't be used without it
+    return list(dict.fromkeys(["id", *names])), None
+
+
+def parse_view(fields=None, fmt: Optional[str] = None):
+    """
+    Validate the `fields` (a comma separated string or a list) and `format`
+    (`rows` or `columnar`) options of a request.
+    Returns `(view, None)` on success or `(None, (error, status_code))`.
+    """
+    if fmt not in (None, "", "rows", "columnar"):
+        return None, ({"error": "format must be 'rows' or 'columnar'"}, 400)
+
+    projection, error = parse_fields(fields)
+    if error:
+        return None, error
+
+    if projection is None and fmt != "columnar":
+        return DEFAULT_VIEW, None
+    return View(projection, columnar=fmt == "columnar"), None
+
+
+def apply_view(result, view: View):
+    """Apply `view` to a successful `(payload, status_code)` service result."""
+    payload, status = result
+    if status != 200:
+        return result
+    return view.apply(payload), status
+
+
+def to_columns(tracks: Iterable[dict], fields: Optional[List[str]] = None) -> dict:
+    """
+    Encode track dicts as parallel arrays (see the module docstring). Without
+    `fields`, every field any track has is included, missing values as None.
+    URLs are left out in favor of `url_template`, they only depend on the ID.
+    """
+    tracks = list(tracks)
+    if fields is None:
+        fields = list(dict.fromkeys(field for track in tracks for field in track))
+    with_url = "url" in fields
+    fields = [field for field in fields if field != "url"]
+
+    columns = {field: [track.get(field) for track in tracks] for field in fields}
+    encoded = {"format": "columnar", "count": len(tracks), "fields": fields, "columns": columns}
+
+    for field, values_key in DICTIONARY_FIELDS.items():
+        if field not in columns:
+            continue
+        index = {}
+        columns[field] = [index.setdefault(value, len(index)) for value in columns[field]]
+        encoded[values_key] = list(index)
+
+    if with_url:
+        encoded["url_template"] = TRACK_URL
+    return encoded
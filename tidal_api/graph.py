@@ -0,0 +1,249 @@
+"""
+Persistent graph of track recommendations.
+
+Every track radio fetched from TIDAL is an edge list: the seed track points at
+each recommended track, in radio order. The edges are stored in SQLite along
+with the recommended tracks' metadata, so they outlive the radio cache and
+restarts. Multi-hop discovery then mostly walks the stored graph, and only
+calls TIDAL for frontier tracks whose radio was never fetched or is older than
+`GRAPH_MAX_AGE`.
+"""
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from tidal_api.ranking import rank_points
+from tidal_api.tracks import TrackRecord
+
+GRAPH_DB = os.environ.get(
+    "TIDAL_MCP_GRAPH_DB",
+    os.path.join(tempfile.gettempdir(), 'tidal-mcp-graph.sqlite3'),
+)
+# How long a stored radio is used before it is fetched again (seconds)
+GRAPH_MAX_AGE = float(os.environ.get("TIDAL_MCP_GRAPH_MAX_AGE", 7 * 24 * 60 * 60))
+# Upper bounds on an expansion's depth and on the tracks it expands (each may cost a radio fetch)
+GRAPH_MAX_HOPS = int(os.environ.get("TIDAL_MCP_GRAPH_MAX_HOPS", 3))
+GRAPH_MAX_NODES = int(os.environ.get("TIDAL_MCP_GRAPH_MAX_NODES", 500))
+
+# Node IDs per query, below SQLite's limit on bound parameters
+_QUERY_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    duration INTEGER
+);
+CREATE TABLE IF NOT EXISTS radios (
+    track_id INTEGER PRIMARY KEY,
+    radio_limit INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS edges (
+    source_id INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    target_id INTEGER NOT NULL,
+    PRIMARY KEY (source_id, rank)
+);
+CREATE INDEX IF NOT EXISTS edges_by_target ON edges (target_id);
+"""
+
+
+def _batches(items: Sequence, size: int = _QUERY_BATCH) -> Iterable[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class RecommendationGraph:
+    """
+    Thread-safe SQLite store of track radios as graph edges.
+
+    Like the library mirror, the connection is opened on first use and shared
+    by all threads behind a lock.
+    """
+
+    def __init__(self, path: str, max_age: float = GRAPH_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def add_radio(self, track_id, limit: int, records: Sequence[TrackRecord]) -> None:
+        """Store the radio of `track_id`, fetched with `limit`, replacing the stored one."""
+        source_id = int(track_id)
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO tracks (id, title, artist, album, duration) VALUES (?, ?, ?, ?, ?)",
+                    [(r.id, r.title, r.artist, r.album, r.duration) for r in records],
+                )
+                conn.execute("DELETE FROM edges WHERE source_id = ?", (source_id,))
+                conn.executemany(
+                    "INSERT INTO edges (source_id, rank, target_id) VALUES (?, ?, ?)",
+                    [(source_id, rank, int(r.id)) for rank, r in enumerate(records)],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO radios (track_id, radio_limit, size, fetched_at) VALUES (?, ?, ?, ?)",
+                    (source_id, limit, len(records), time.time()),
+                )
+
+    def neighbors(self, track_ids: Sequence, limit: int, max_age: Optional[float] = None) -> Dict[int, List[int]]:
+        """
+        The stored radios (recommended track IDs in radio order, at most `limit`)
+        of those `track_ids` whose radio is younger than `max_age` seconds and was
+        fetched with at least `limit` tracks (or had fewer tracks than it was
+        fetched with, so is complete). Tracks missing from the result need a fetch.
+        """
+        if max_age is None:
+            max_age = self.max_age
+        ids = [int(track_id) for track_id in track_ids]
+        oldest = time.time() - max_age
+
+        result: Dict[int, List[int]] = {}
+        with self._lock:
+            conn = self._connect()
+            for batch in _batches(ids):
+                placeholders = ",".join("?" * len(batch))
+                usable = [
+                    row[0] for row in conn.execute(
+                        f"""
+                        SELECT track_id FROM radios
+                        WHERE track_id IN ({placeholders})
+                          AND fetched_at >= ? AND (radio_limit >= ? OR size < radio_limit)
+                        """,
+                        (*batch, oldest, limit),
+                    )
+                ]
+                for track_id in usable:
+                    result[track_id] = []
+                if not usable:
+                    continue
+                placeholders = ",".join("?" * len(usable))
+                for source_id, target_id in conn.execute(
+                    f"""
+                    SELECT source_id, target_id FROM edges
+                    WHERE source_id IN ({placeholders}) AND rank < ?
+                    ORDER BY source_id, rank
+                    """,
+                    (*usable, limit),
+                ):
+                    result[source_id].append(target_id)
+        return result
+
+    def tracks(self, track_ids: Sequence) -> Dict[int, TrackRecord]:
+        """Stored metadata of the given tracks, by ID."""
+        ids = [int(track_id) for track_id in track_ids]
+        result = {}
+        with self._lock:
+            conn = self._connect()
+            for batch in _batches(ids):
+                placeholders = ",".join("?" * len(batch))
+                for row in conn.execute(
+                    f"SELECT id, title, artist, album, duration FROM tracks WHERE id IN ({placeholders})",
+                    batch,
+                ):
+                    result[row[0]] = TrackRecord(*row)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            radios = conn.execute("SELECT COUNT(*) FROM radios").fetchone()[0]
+            edges = conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+        return {"radios": radios, "edges": edges}
+
+
+def expand(
+    graph: RecommendationGraph,
+    seeds: Sequence,
+    hops: int,
+    limit_per_track: int,
+    max_nodes: int,
+    fetch_radios,
+    hop_decay: float = 0.5,
+) -> Tuple[Dict[int, dict], dict]:
+    """
+    Breadth-first expansion from `seeds` for up to `hops` hops, expanding at
+    most `max_nodes` tracks in total (highest scored first within a hop).
+
+    Radios come from the graph when stored and fresh; the others are fetched
+    with `fetch_radios(track_ids)`, which stores them in the graph and returns
+    `{track_id: [recommended track IDs]}` for the ones it could fetch.
+
+    Every reached track is scored by its weighted in-degree: each edge pointing
+    at it adds `rank_points(rank, limit_per_track) / limit_per_track`, times
+    `hop_decay ** (hop - 1)` for edges found at later hops. The points are
+    summed as integers per hop, so the score does not depend on the order the
+    radios arrive in. Returns `({track_id: {"score", "in_degree", "hop"}}, stats)`,
+    seeds excluded.
+    """
+    seed_ids = list(dict.fromkeys(int(track_id) for track_id in seeds))
+    seed_set = set(seed_ids)
+    visited = set(seed_ids)
+    reached: Dict[int, dict] = {}
+    frontier = seed_ids
+    stats = {"expanded": 0, "from_graph": 0, "fetched": 0}
+
+    for hop in range(1, hops + 1):
+        budget = max_nodes - stats["expanded"]
+        if not frontier or budget <= 0:
+            break
+        # Spend what is left of the budget on the best connected tracks
+        frontier = sorted(
+            frontier,
+            key=lambda node: -_score(reached[node], limit_per_track, hop_decay) if node in reached else 0,
+        )[:budget]
+        stats["expanded"] += len(frontier)
+
+        radios = graph.neighbors(frontier, limit_per_track)
+        stats["from_graph"] += len(radios)
+        missing = [node for node in frontier if node not in radios]
+        if missing:
+            fetched = fetch_radios(missing)
+            stats["fetched"] += len(fetched)
+            radios.update({int(node): targets for node, targets in fetched.items()})
+
+        next_frontier = []
+        for node in frontier:
+            for rank, target in enumerate(radios.get(node, ())[:limit_per_track]):
+                if target in seed_set:
+                    continue
+                entry = reached.get(target)
+                if entry is None:
+                    entry = reached[target] = {"points": {}, "in_degree": 0, "hop": hop}
+                entry["points"][hop] = entry["points"].get(hop, 0) + rank_points(rank, limit_per_track)
+                entry["in_degree"] += 1
+                if target not in visited:
+                    visited.add(target)
+                    next_frontier.append(target)
+        frontier = next_frontier
+
+    for entry in reached.values():
+        entry["score"] = _score(entry, limit_per_track, hop_decay)
+        del entry["points"]
+    return reached, stats
+
+
+def _score(entry: dict, limit_per_track: int, hop_decay: float) -> float:
+    """Score of a reached track from its integer points per hop, always added up in hop order."""
+    points = entry["points"]
+    return sum(hop_decay ** (hop - 1) * points[hop] for hop in sorted(points)) / limit_per_track
+
+
+graph = RecommendationGraph(GRAPH_DB)
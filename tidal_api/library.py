@@ -0,0 +1,568 @@
+"""
+Local SQLite mirror of the user's library: favorite tracks, playlists and playlist items.
+
+Listings are read from the mirror and only synced with TIDAL once the mirrored
+data is older than the requested freshness. Syncs are incremental: favorites are
+fetched newest first and stop at the first track that is already mirrored, and a
+playlist's items are only fetched again when its `last_updated` time changed.
+
+Playlist listings are sorted and paged in SQL. Metadata a listing left out (e.g. a
+missing `last_updated`) is only fetched for the playlists of the requested page,
+and only for the requested fields.
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from tidal_api.pagination import PAGE_SIZE, fetch_range
+from tidal_api.tracks import TrackRecord, remember_tracks
+from tidal_api.upstream import bound_concurrency, call_with_retries, map_unordered, single_flight
+
+LIBRARY_DB = os.environ.get(
+    "TIDAL_MCP_LIBRARY_DB",
+    os.path.join(tempfile.gettempdir(), 'tidal-mcp-library.sqlite3'),
+)
+# Default freshness of mirrored data (seconds) before a listing syncs with TIDAL
+LIBRARY_MAX_AGE = float(os.environ.get("TIDAL_MCP_LIBRARY_MAX_AGE", 300))
+# Favorites are fully re-synced this often (seconds), to catch tracks removed from favorites
+LIBRARY_FULL_SYNC_INTERVAL = float(os.environ.get("TIDAL_MCP_LIBRARY_FULL_SYNC", 24 * 60 * 60))
+# Playlists per upstream request when listing the user's playlists
+PLAYLIST_PAGE_SIZE = 50
+
+# Sort keys of playlist listings: SQL expression and default direction.
+# Playlists never updated sort by their creation time, missing values sort last.
+PLAYLIST_SORTS = {
+    "last_updated": ("COALESCE(last_updated, created)", "desc"),
+    "created": ("created", "desc"),
+    "title": ("title COLLATE NOCASE", "asc"),
+    "track_count": ("num_tracks", "desc"),
+    "duration": ("duration", "desc"),
+}
+# Playlist fields that can be missing from TIDAL's playlist listing
+PLAYLIST_METADATA = ("created", "last_updated", "track_count", "duration")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    duration INTEGER
+);
+CREATE TABLE IF NOT EXISTS favorites (
+    user_id TEXT NOT NULL,
+    track_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (user_id, track_id)
+);
+CREATE INDEX IF NOT EXISTS favorites_by_seq ON favorites (user_id, seq);
+CREATE TABLE IF NOT EXISTS playlists (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    title TEXT,
+    description TEXT,
+    created TEXT,
+    last_updated TEXT,
+    num_tracks INTEGER,
+    duration INTEGER,
+    items_last_updated TEXT
+);
+CREATE TABLE IF NOT EXISTS playlist_items (
+    playlist_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    track_id INTEGER NOT NULL,
+    PRIMARY KEY (playlist_id, position)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def _to_text(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _from_text(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def playlist_item_count(playlist) -> Optional[int]:
+    """
+    Number of items (tracks and videos, as returned by `playlist.items()`) in a
+    tidalapi playlist, or None if TIDAL didn't report both counts.
+    """
+    counts = (playlist.num_tracks, playlist.num_videos)
+    if any(count is None or count < 0 for count in counts):
+        return None
+    return sum(counts)
+
+
+def favorite_tracks_page(session, offset: int, limit: int):
+    """
+    One page of the user's favorite tracks, newest first, and the total number of favorites.
+    """
+    favorites = session.user.favorites
+    params = {
+        "limit": limit,
+        "offset": offset,
+        "order": "DATE",
+        "orderDirection": "DESC",
+    }
+    # Request the page directly (rather than favorites.tracks()) to also get the total count
+    json_obj = session.request.request("GET", f"{favorites.base_url}/tracks", params=params).json()
+    tracks = session.request.map_json(json_obj, parse=session.parse_track)
+    return tracks, json_obj.get("totalNumberOfItems")
+
+
+def user_playlists_page(session, offset: int, limit: int):
+    """One page of the playlists created by the user, and the total number of playlists."""
+    params = {"limit": limit, "offset": offset}
+    # user.playlists() makes a single request, which doesn't return every playlist of large libraries
+    json_obj = session.request.request("GET", f"users/{session.user.id}/playlists", params=params).json()
+    playlists = session.request.map_json(json_obj, parse=session.parse_playlist)
+    return playlists, json_obj.get("totalNumberOfItems")
+
+
+class LibraryMirror:
+    """
+    Thread-safe SQLite mirror of favorites, playlists and playlist items.
+
+    The database connection is opened on first use and shared by all threads;
+    network calls are made outside the lock, which only guards database access.
+    """
+
+    def __init__(self, path: str, max_age: float = LIBRARY_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _is_fresh(self, key: str, max_age: Optional[float]) -> bool:
+        if max_age is None:
+            max_age = self.max_age
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT synced_at FROM sync_state WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None and time.time() - row[0] < max_age
+
+    @staticmethod
+    def _mark_synced(conn: sqlite3.Connection, key: str) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO sync_state (key, synced_at) VALUES (?, ?)",
+            (key, time.time()),
+        )
+
+    @staticmethod
+    def _store_tracks(conn: sqlite3.Connection, records: List[TrackRecord]) -> None:
+        conn.executemany(
+            "INSERT OR REPLACE INTO tracks (id, title, artist, album, duration) VALUES (?, ?, ?, ?, ?)",
+            [(r.id, r.title, r.artist, r.album, r.duration) for r in records],
+        )
+
+    @staticmethod
+    def _store_playlist(conn: sqlite3.Connection, playlist, user_id: Optional[str] = None) -> None:
+        # Metadata missing from a listing doesn't overwrite what a full read of the playlist stored
+        conn.execute(
+            """
+            INSERT INTO playlists (id, user_id, title, description, created, last_updated, num_tracks, duration)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                user_id = COALESCE(excluded.user_id, playlists.user_id),
+                title = excluded.title,
+                description = excluded.description,
+                created = COALESCE(excluded.created, playlists.created),
+                last_updated = COALESCE(excluded.last_updated, playlists.last_updated),
+                num_tracks = COALESCE(excluded.num_tracks, playlists.num_tracks),
+                duration = COALESCE(excluded.duration, playlists.duration)
+            """,
+            (
+                str(playlist.id),
+                user_id,
+                playlist.name,
+                playlist.description or "",
+                _to_text(playlist.created),
+                _to_text(playlist.last_updated),
+                playlist.num_tracks if playlist.num_tracks is not None and playlist.num_tracks >= 0 else None,
+                playlist.duration,
+            ),
+        )
+
+    # Favorites
+
+    def sync_favorites(self, session, max_concurrency: Optional[int] = None) -> None:
+        """
+        Bring the mirrored favorites up to date. Only tracks added since the last
+        sync are fetched, unless the favorite count no longer adds up (tracks were
+        removed) or the last full sync is too old. A full sync fetches up to
+        `max_concurrency` pages at once.
+        """
+        user_id = str(session.user.id)
+
+        with self._lock:
+            known = {
+                row[0] for row in self._connect().execute(
+                    "SELECT track_id FROM favorites WHERE user_id = ?", (user_id,)
+                )
+            }
+
+        if known and self._is_fresh(f"favorites_full:{user_id}", LIBRARY_FULL_SYNC_INTERVAL):
+            new_tracks = []
+            offset = 0
+            total = None
+            while True:
+                page, total = favorite_tracks_page(session, offset, PAGE_SIZE)
+                for track in page:
+                    if track.id in known:
+                        break
+                    new_tracks.append(track)
+                else:
+                    if len(page) == PAGE_SIZE:
+                        offset += len(page)
+                        continue
+                break
+
+            if total is not None and len(known) + len(new_tracks) == total:
+                records = remember_tracks(new_tracks)
+                with self._lock:
+                    conn = self._connect()
+                    with conn:
+                        max_seq = conn.execute(
+                            "SELECT COALESCE(MAX(seq), 0) FROM favorites WHERE user_id = ?", (user_id,)
+                        ).fetchone()[0]
+                        self._store_tracks(conn, records)
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO favorites (user_id, track_id, seq) VALUES (?, ?, ?)",
+                            [
+                                (user_id, record.id, max_seq + len(records) - i)
+                                for i, record in enumerate(records)
+                            ],
+                        )
+                        self._mark_synced(conn, f"favorites:{user_id}")
+                return
+
+        # First sync, or the incremental sync doesn't add up: mirror the whole list again
+        tracks, _ = fetch_range(
+            lambda page_offset, page_limit: favorite_tracks_page(session, page_offset, page_limit),
+            0,
+            sys.maxsize,
+            max_concurrency,
+        )
+        records = remember_tracks(tracks)
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM favorites WHERE user_id = ?", (user_id,))
+                self._store_tracks(conn, records)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO favorites (user_id, track_id, seq) VALUES (?, ?, ?)",
+                    [(user_id, record.id, len(records) - i) for i, record in enumerate(records)],
+                )
+                self._mark_synced(conn, f"favorites:{user_id}")
+                self._mark_synced(conn, f"favorites_full:{user_id}")
+
+    def favorites(
+        self,
+        session,
+        offset: int,
+        limit: int,
+        max_age: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> Tuple[List[TrackRecord], int]:
+        """
+        Favorite tracks (newest first) from `offset`, and the total number of favorites.
+        Syncs first if the mirrored favorites are older than `max_age` seconds.
+        """
+        user_id = str(session.user.id)
+        if not self._is_fresh(f"favorites:{user_id}", max_age):
+            # Concurrent listings share one sync
+            single_flight.do("sync_favorites", user_id, lambda: self.sync_favorites(session, max_concurrency))
+
+        with self._lock:
+            conn = self._connect()
+            total = conn.execute(
+                "SELECT COUNT(*) FROM favorites WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+            rows = conn.execute(
+                """
+                SELECT t.id, t.title, t.artist, t.album, t.duration
+                FROM favorites f JOIN tracks t ON t.id = f.track_id
+                WHERE f.user_id = ?
+                ORDER BY f.seq DESC
+                LIMIT ? OFFSET ?
+                """,
+                (user_id, limit, offset),
+            ).fetchall()
+        return [TrackRecord(*row) for row in rows], total
+
+    # Playlists
+
+    def sync_playlists(self, session, max_concurrency: Optional[int] = None) -> None:
+        """
+        Mirror the metadata of the user's playlists, dropping playlists that no
+        longer exist. Fetches up to `max_concurrency` pages at once.
+        """
+        user_id = str(session.user.id)
+        playlists, _ = fetch_range(
+            lambda page_offset, page_limit: user_playlists_page(session, page_offset, page_limit),
+            0,
+            sys.maxsize,
+            max_concurrency,
+            page_size=PLAYLIST_PAGE_SIZE,
+        )
+
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                current = {str(playlist.id) for playlist in playlists}
+                stale = [
+                    row[0] for row in conn.execute(
+                        "SELECT id FROM playlists WHERE user_id = ?", (user_id,)
+                    )
+                    if row[0] not in current
+                ]
+                for playlist_id in stale:
+                    self._delete_playlist(conn, playlist_id)
+                for playlist in playlists:
+                    self._store_playlist(conn, playlist, user_id)
+                self._mark_synced(conn, f"playlists:{user_id}")
+
+    def ensure_playlists(
+        self, session, max_age: Optional[float] = None, max_concurrency: Optional[int] = None
+    ) -> None:
+        """Sync the user's playlists if the mirrored ones are older than `max_age` seconds."""
+        user_id = str(session.user.id)
+        if not self._is_fresh(f"playlists:{user_id}", max_age):
+            single_flight.do("sync_playlists", user_id, lambda: self.sync_playlists(session, max_concurrency))
+
+    def hydrate_playlists(self, session, playlist_ids: List[str], max_concurrency: Optional[int] = None) -> None:
+        """
+        Read playlists from TIDAL one by one (concurrently) to fill in metadata
+        their listing left out. A playlist that can't be read keeps its missing
+        metadata, the next listing tries again.
+        """
+        def read(playlist_id):
+            return call_with_retries(lambda: session.playlist(playlist_id))
+
+        for playlist_id, future in map_unordered(read, playlist_ids, bound_concurrency(max_concurrency)):
+            try:
+                playlist = future.result()
+            except Exception:
+                continue
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    self._store_playlist(conn, playlist)
+                    self._mark_synced(conn, f"playlist_meta:{playlist_id}")
+
+    def _playlist_page(self, user_id: str, offset: int, limit: int, order_by: str) -> Tuple[List[dict], int]:
+        with self._lock:
+            conn = self._connect()
+            total = conn.execute(
+                "SELECT COUNT(*) FROM playlists WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+            rows = conn.execute(
+                f"""
+                SELECT id, title, description, created, last_updated, num_tracks, duration
+                FROM playlists WHERE user_id = ?
+                ORDER BY {order_by}
+                LIMIT ? OFFSET ?
+                """,
+                (user_id, limit, offset),
+            ).fetchall()
+
+        return [
+            {
+                "id": playlist_id,
+                "title": title,
+                "description": description,
+                "created": _from_text(created),
+                "last_updated": _from_text(last_updated),
+                "track_count": num_tracks,
+                "duration": duration,
+            }
+            for playlist_id, title, description, created, last_updated, num_tracks, duration in rows
+        ], total
+
+    def playlists(
+        self,
+        session,
+        offset: int,
+        limit: int,
+        sort: str = "last_updated",
+        order: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        max_age: Optional[float] = None,
+    ) -> Tuple[List[dict], int]:
+        """
+        Metadata of the user's playlists from `offset`, sorted by `sort` (a key of
+        PLAYLIST_SORTS) in `order` (`asc` or `desc`, by default the key's usual
+        direction), and the total number of playlists. Ties are broken by ID, so
+        pages don't overlap.
+
+        Syncs first if the mirrored playlists are older than `max_age` seconds. Of
+        `fields` (all by default), metadata missing from the listing is read from
+        TIDAL for the playlists of the page, at most once every `max_age` seconds.
+        """
+        expression, default_order = PLAYLIST_SORTS[sort]
+        order = order or default_order
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'")
+        order_by = f"{expression} IS NULL, {expression} {order.upper()}, id"
+
+        user_id = str(session.user.id)
+        self.ensure_playlists(session, max_age)
+        playlists, total = self._playlist_page(user_id, offset, limit, order_by)
+
+        wanted = [field for field in PLAYLIST_METADATA if fields is None or field in fields]
+        missing = [
+            playlist["id"] for playlist in playlists
+            if any(playlist[field] is None for field in wanted)
+            and not self._is_fresh(f"playlist_meta:{playlist['id']}", max_age)
+        ]
+        if missing:
+            self.hydrate_playlists(session, missing)
+            playlists, total = self._playlist_page(user_id, offset, limit, order_by)
+        return playlists, total
+
+    def sync_playlist_items(self, session, playlist_id: str) -> bool:
+        """
+        Bring a playlist's mirrored items up to date, fetching them only if the
+        playlist changed since they were last mirrored. Returns False if the
+        playlist does not exist.
+        """
+        playlist = session.playlist(playlist_id)
+        if not playlist:
+            return False
+
+        last_updated = _to_text(getattr(playlist, 'last_updated', None))
+        total = playlist_item_count(playlist)
+
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT items_last_updated FROM playlists WHERE id = ?", (playlist_id,)
+            ).fetchone()
+            mirrored = conn.execute(
+                "SELECT COUNT(*) FROM playlist_items WHERE playlist_id = ?", (playlist_id,)
+            ).fetchone()[0]
+            with conn:
+                self._store_playlist(conn, playlist)
+
+        unchanged = (
+            last_updated is not None
+            and row is not None
+            and row[0] == last_updated
+            and mirrored == total
+        )
+        if not unchanged:
+            tracks, _ = fetch_range(
+                lambda page_offset, page_limit: (playlist.items(limit=page_limit, offset=page_offset), total),
+                0,
+                sys.maxsize,
+            )
+            records = remember_tracks(tracks)
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute("DELETE FROM playlist_items WHERE playlist_id = ?", (playlist_id,))
+                    self._store_tracks(conn, records)
+                    conn.executemany(
+                        "INSERT INTO playlist_items (playlist_id, position, track_id) VALUES (?, ?, ?)",
+                        [(playlist_id, position, record.id) for position, record in enumerate(records)],
+                    )
+                    conn.execute(
+                        "UPDATE playlists SET items_last_updated = ? WHERE id = ?",
+                        (last_updated, playlist_id),
+                    )
+
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                self._mark_synced(conn, f"playlist:{playlist_id}")
+        return True
+
+    def playlist_items(
+        self,
+        session,
+        playlist_id: str,
+        offset: int,
+        limit: int,
+        max_age: Optional[float] = None,
+    ) -> Optional[Tuple[List[TrackRecord], int]]:
+        """
+        A playlist's tracks from `offset` and its total number of tracks, or None
+        if the playlist does not exist. Syncs first if the mirrored items are older
+        than `max_age` seconds.
+        """
+        if not self._is_fresh(f"playlist:{playlist_id}", max_age):
+            synced = single_flight.do(
+                "sync_playlist_items", playlist_id, lambda: self.sync_playlist_items(session, playlist_id)
+            )
+            if not synced:
+                return None
+
+        with self._lock:
+            conn = self._connect()
+            total = conn.execute(
+                "SELECT COUNT(*) FROM playlist_items WHERE playlist_id = ?", (playlist_id,)
+            ).fetchone()[0]
+            rows = conn.execute(
+                """
+                SELECT t.id, t.title, t.artist, t.album, t.duration
+                FROM playlist_items i JOIN tracks t ON t.id = i.track_id
+                WHERE i.playlist_id = ?
+                ORDER BY i.position
+                LIMIT ? OFFSET ?
+                """,
+                (playlist_id, limit, offset),
+            ).fetchall()
+        return [TrackRecord(*row) for row in rows], total
+
+    # Invalidation after changes made through this server
+
+    def invalidate_playlists(self, user_id) -> None:
+        """Make the next playlist listing sync with TIDAL (e.g. after a playlist was created)."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM sync_state WHERE key = ?", (f"playlists:{user_id}",))
+
+    def invalidate_playlist(self, playlist_id: str) -> None:
+        """Make the next read of a playlist's items sync with TIDAL (e.g. after it was modified)."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM sync_state WHERE key = ?", (f"playlist:{playlist_id}",))
+
+    def forget_playlist(self, playlist_id: str) -> None:
+        """Drop a deleted playlist and its items from the mirror."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                self._delete_playlist(conn, playlist_id)
+
+    @staticmethod
+    def _delete_playlist(conn: sqlite3.Connection, playlist_id: str) -> None:
+        conn.execute("DELETE FROM playlist_items WHERE playlist_id = ?", (playlist_id,))
+        conn.execute("DELETE FROM playlists WHERE id = ?", (playlist_id,))
+        conn.execute("DELETE FROM sync_state WHERE key IN (?, ?)", (f"playlist:{playlist_id}", f"playlist_meta:{playlist_id}"))
+
+
+library = LibraryMirror(LIBRARY_DB)
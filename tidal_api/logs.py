@@ -0,0 +1,120 @@
+"""
+Logging setup shared by the tidal_api app and the MCP server.
+
+Records are handed to a queue and written by a background thread, so a
+request thread never blocks on a slow or full stderr pipe or on disk I/O.
+They are written to stderr (stdout is the MCP protocol when embedded), as
+text or as one JSON object per line, or to a size-rotated file.
+"""
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+
+# Minimum level logged: DEBUG, INFO, WARNING or ERROR
+LOG_LEVEL = os.environ.get("TIDAL_MCP_LOG_LEVEL", "INFO").upper()
+# "text" or "json" (one object per line, with any `extra` fields)
+LOG_FORMAT = os.environ.get("TIDAL_MCP_LOG_FORMAT", "text").lower()
+# Write to this file instead of stderr, rotated at LOG_MAX_BYTES, keeping LOG_BACKUPS old files
+LOG_FILE = os.environ.get("TIDAL_MCP_LOG_FILE") or None
+LOG_MAX_BYTES = int(os.environ.get("TIDAL_MCP_LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUPS = int(os.environ.get("TIDAL_MCP_LOG_BACKUPS", 3))
+# Log every HTTP request the app serves (the metrics cover request timings without it)
+ACCESS_LOG = os.environ.get("TIDAL_MCP_ACCESS_LOG", "0").lower() in ("1", "true", "yes")
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Attributes every LogRecord has, anything else was passed in `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, extra fields and the exception."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _output_handler() -> logging.Handler:
+    if LOG_FILE:
+        handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+        )
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def configure_logging() -> None:
+    """
+    Route all logging through a queue to the configured output. Idempotent;
+    call it before anything else installs handlers on the root logger.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, _output_handler(), respect_handler_level=True)
+    _listener.start()
+    # Flush what is still queued on exit
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(records)]
+    root.setLevel(LOG_LEVEL)
+
+    access_level = logging.INFO if ACCESS_LOG else logging.WARNING
+    logging.getLogger("werkzeug").setLevel(access_level)
+    logging.getLogger("uvicorn.access").setLevel(access_level)
+
+
+def replay(line: str, default_logger: logging.Logger) -> None:
+    """
+    Log a line of another process's output in this process: JSON lines
+    (see JsonFormatter) keep their logger, level, time and fields, anything
+    else is logged as is at INFO on `default_logger`.
+    """
+    try:
+        entry = json.loads(line)
+        levelname = entry.pop("level")
+        name = entry.pop("logger")
+        message = entry.pop("message")
+        created = entry.pop("time")
+    except (ValueError, KeyError, TypeError, AttributeError):
+        default_logger.info(line)
+        return
+
+    levelno = logging.getLevelName(levelname)
+    exception = entry.pop("exception", None)
+    if exception:
+        message = f"{message}\n{exception}"
+    record = logging.makeLogRecord({
+        **entry,
+        "name": name,
+        "levelname": levelname,
+        "levelno": levelno if isinstance(levelno, int) else logging.INFO,
+        "msg": message,
+        "created": created,
+        "msecs": (created % 1) * 1000,
+    })
+    logger = logging.getLogger(name)
+    if logger.isEnabledFor(record.levelno):
+        logger.handle(record)
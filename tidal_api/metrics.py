@@ -0,0 +1,239 @@
+"""
+In-process metrics, exposed in the Prometheus text format at /api/metrics and
+as a JSON summary for the MCP server. Dependency-free: only the histograms
+and gauges the API needs.
+"""
+import re
+import time
+import bisect
+import threading
+import contextlib
+
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+from urllib.parse import urlsplit
+
+# Latency buckets (seconds), from a fast cache hit to a slow batch
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Histogram:
+    """Latency histogram with labels and fixed buckets."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts..., +Inf count], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _snapshot(self) -> Dict[LabelValues, Tuple[List[int], float]]:
+        with self._lock:
+            return {key: (list(counts), total[0]) for key, (counts, total) in self._series.items()}
+
+    def samples(self) -> Iterable[str]:
+        for key, (counts, total) in sorted(self._snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labels + ("le",), key + (_format_value(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}"
+
+    def _quantile(self, counts: List[int], q: float):
+        """Upper bound of the bucket the q-quantile falls in (None if above the largest bucket)."""
+        rank = q * sum(counts)
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return None
+
+    def summary(self) -> Dict[str, dict]:
+        """Count, total and mean time and approximate p50/p95 per label combination."""
+        result = {}
+        for key, (counts, total) in self._snapshot().items():
+            count = sum(counts)
+            result[" ".join(key) or "all"] = {
+                "count": count,
+                "total_seconds": round(total, 4),
+                "mean_seconds": round(total / count, 4) if count else 0.0,
+                "p50_seconds_le": self._quantile(counts, 0.5),
+                "p95_seconds_le": self._quantile(counts, 0.95),
+            }
+        return result
+
+
+class Registry:
+    """
+    The metrics of this process. Besides histograms it renders
+    gauges read at collection time from `collectors`, functions returning
+    `(name, help, [(labels dict, value), ...])`.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Callable[[], Iterable[tuple]]] = []
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[tuple]]) -> None:
+        self._collectors.append(collector)
+
+    def gauges(self) -> Iterable[tuple]:
+        for collector in self._collectors:
+            yield from collector()
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        for name, help, values in self.gauges():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in values:
+                lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_duration = registry.histogram(
+    "tidal_mcp_request_duration_seconds",
+    "Time spent handling API requests (embedded mode: operation calls)",
+    ["route", "method", "status"],
+)
+upstream_duration = registry.histogram(
+    "tidal_mcp_upstream_request_duration_seconds",
+    "Time spent in HTTP requests to the TIDAL API",
+    ["operation", "status"],
+)
+rate_limit_wait = registry.histogram(
+    "tidal_mcp_rate_limit_wait_seconds",
+    "Time upstream requests waited for the rate limiter",
+)
+upstream_retry_delay = registry.histogram(
+    "tidal_mcp_upstream_retry_delay_seconds",
+    "Backoff before retrying a rate limited or transient upstream error",
+    ["kind"],
+)
+
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F-]{32,36})$")
+
+
+def upstream_operation(method: str, url: str) -> str:
+    """Name of an upstream request with IDs removed, e.g. "GET /v1/tracks/{id}/radio"."""
+    segments = ["{id}" if _ID_SEGMENT.match(segment) else segment for segment in urlsplit(url).path.split("/")]
+    return f"{method} {'/'.join(segments)}"
+
+
+def _runtime_gauges() -> Iterable[tuple]:
+    # Imported here, these modules record into this one
+    from tidal_api.cache import radio_cache
+    from tidal_api.tracks import track_cache
+    from tidal_api.service import prefetcher
+    from tidal_api.upstream import adaptive_limit, executor_stats, single_flight
+
+    yield "tidal_mcp_threads", "Threads in this process", [({}, threading.active_count())]
+
+    upstream = executor_stats()
+    yield "tidal_mcp_upstream_queue_depth", "Upstream calls waiting for an executor worker", [({}, upstream["queued"])]
+    yield "tidal_mcp_upstream_active", "Upstream calls running on the executor", [({}, upstream["active"])]
+    yield (
+        "tidal_mcp_upstream_concurrency_limit",
+        "Fan-out calls currently allowed at once (adapted to rate limits)",
+        [({}, adaptive_limit.stats()["limit"])],
+    )
+
+    caches = {"radio": radio_cache.stats(), "tracks": track_cache.stats()}
+    for stat in ("hit_ratio", "entries", "bytes", "hits", "misses", "evictions"):
+        yield (
+            f"tidal_mcp_cache_{stat}",
+            f"Cache {stat.replace('_', ' ')}",
+            [({"cache": name}, stats[stat]) for name, stats in caches.items()],
+        )
+
+    flights = single_flight.stats()
+    yield (
+        "tidal_mcp_single_flight_calls",
+        "Upstream calls made through single-flight coalescing",
+        [({"operation": operation}, stats["calls"]) for operation, stats in flights.items()],
+    )
+    yield (
+        "tidal_mcp_single_flight_coalesced",
+        "Calls that joined an identical call already in flight",
+        [({"operation": operation}, stats["coalesced"]) for operation, stats in flights.items()],
+    )
+
+    prefetch = prefetcher.stats()
+    yield (
+        "tidal_mcp_prefetch_runs",
+        "Background prefetch runs by outcome",
+        [({"outcome": outcome}, count) for outcome, count in prefetch["runs"].items()],
+    )
+    yield "tidal_mcp_prefetch_radios", "Track radios fetched by the background prefetch", [({}, prefetch["radios_fetched"])]
+
+
+registry.add_collector(_runtime_gauges)
+
+
+def summary() -> dict:
+    """Metrics as a JSON-friendly summary, for the MCP server."""
+    gauges = {}
+    for name, _, values in registry.gauges():
+        key = name.replace("tidal_mcp_", "")
+        if len(values) == 1 and not values[0][0]:
+            gauges[key] = values[0][1]
+        else:
+            gauges[key] = {" ".join(labels.values()): value for labels, value in values}
+
+    return {
+        "requests": request_duration.summary(),
+        "upstream": upstream_duration.summary(),
+        "rate_limit_wait": rate_limit_wait.summary(),
+        "retry_delay": upstream_retry_delay.summary(),
+        "runtime": gauges,
+    }
@@ -0,0 +1,105 @@
+"""
+Offset-based pagination over TIDAL collections (favorites, playlist items).
+
+TIDAL serves at most `PAGE_SIZE` items per request. A range larger than that is
+split into pages; once the first page has told us the collection's total size,
+the remaining pages are fetched concurrently on the shared upstream executor.
+"""
+import os
+import json
+import base64
+
+from typing import Callable, Optional, Tuple
+
+from tidal_api.upstream import bound_concurrency, call_with_retries, map_unordered
+
+# Items per upstream request (TIDAL's maximum for playlist items)
+PAGE_SIZE = 100
+# Maximum number of items returned by a single API response, larger collections are walked with a cursor
+MAX_LISTING_ITEMS = int(os.environ.get("TIDAL_MCP_MAX_LISTING_ITEMS", 5000))
+
+# fetch_page(offset, limit) -> (items, total number of items in the collection or None if unknown)
+PageFetcher = Callable[[int, int], Tuple[list, Optional[int]]]
+
+
+def encode_cursor(offset: int) -> str:
+    """Opaque cursor pointing at `offset` in a collection."""
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """Offset a cursor from `encode_cursor` points at. Raises ValueError if the cursor is invalid."""
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))["offset"]
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return offset
+
+
+def resolve_offset(offset: int = 0, cursor: Optional[str] = None) -> int:
+    """The start offset of a listing request, a cursor takes precedence over an explicit offset."""
+    if cursor:
+        return decode_cursor(cursor)
+    return max(int(offset or 0), 0)
+
+
+def fetch_range(
+    fetch_page: PageFetcher,
+    offset: int,
+    limit: int,
+    max_concurrency: Optional[int] = None,
+    page_size: int = PAGE_SIZE,
+) -> Tuple[list, Optional[int]]:
+    """
+    Fetch `limit` items starting at `offset` and return `(items, total)`, at most
+    `page_size` items per upstream request.
+
+    The first page is fetched on its own to learn the total. The rest of the range
+    is then fetched in parallel if the total is known, or page by page until a
+    short page otherwise. Pages failing with rate limits or transient errors are retried.
+    """
+    def fetch(page_offset: int, page_limit: int):
+        return call_with_retries(lambda: fetch_page(page_offset, page_limit))
+
+    first_limit = min(limit, page_size)
+    items, total = fetch(offset, first_limit)
+    items = list(items)
+
+    if len(items) < first_limit or len(items) >= limit:
+        return items[:limit], total
+
+    start = offset + len(items)
+    end = offset + limit if total is None else min(offset + limit, total)
+
+    if total is None:
+        while start < end:
+            page, _ = fetch(start, min(page_size, end - start))
+            items.extend(page)
+            if len(page) < min(page_size, end - start):
+                break
+            start += len(page)
+        return items, total
+
+    pages = [(page_offset, min(page_size, end - page_offset)) for page_offset in range(start, end, page_size)]
+    results = {}
+    for (page_offset, page_limit), future in map_unordered(
+        lambda page: fetch(*page)[0],
+        pages,
+        bound_concurrency(max_concurrency),
+    ):
+        results[page_offset] = future.result()
+
+    # Reassemble in collection order
+    for page_offset, _ in pages:
+        items.extend(results[page_offset])
+    return items, total
+
+
+def next_cursor(offset: int, count: int, limit: int, total: Optional[int]) -> Optional[str]:
+    """Cursor for the page after `count` items read at `offset`, or None if the collection is exhausted."""
+    next_offset = offset + count
+    if count < limit or (total is not None and next_offset >= total):
+        return None
+    return encode_cursor(next_offset)
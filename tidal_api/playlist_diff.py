@@ -0,0 +1,225 @@
+"""
+Minimal edits turning a playlist's current tracks into a desired track list.
+
+Instead of deleting and re-creating a playlist, `plan_edits` compares the two
+lists through an index map (track ID -> desired position) and produces three
+kinds of batched edits, applied in this order:
+
+- remove: tracks that are not wanted (or are duplicates), highest indices first
+  so the indices of later batches stay valid
+- move: the kept tracks that are out of order. The longest run of kept tracks
+  already in desired order (a longest increasing subsequence) stays put, so only
+  the fewest tracks move; consecutive tracks moving to the same place move together
+- add: new tracks, one insert per run of consecutive new tracks
+
+If that takes more requests than emptying the playlist and adding every track
+again (e.g. for a reversed playlist), the rewrite is planned instead, which
+still keeps the playlist and its ID.
+
+Positions follow TIDAL's playlist item API as used by tidalapi: a move inserts
+the items (in playlist order) before the item at `position` in the playlist as
+it is before the move, an add inserts before the item at `position`, and a
+position equal to the track count appends.
+"""
+import bisect
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# Indices or track IDs per edit request
+EDIT_BATCH_SIZE = 100
+
+REMOVE = "remove"
+MOVE = "move"
+ADD = "add"
+
+
+class Edit:
+    """
+    One batched playlist edit: the indices to remove or move, or the track IDs to
+    add. Once an add is applied, `skipped` is the number of its tracks TIDAL skipped.
+    """
+
+    __slots__ = ("kind", "items", "position", "skipped")
+
+    def __init__(self, kind: str, items: List, position: Optional[int] = None):
+        self.kind = kind
+        self.items = items
+        self.position = position
+        self.skipped = 0
+
+    def to_dict(self) -> dict:
+        key = "track_ids" if self.kind == ADD else "indices"
+        edit = {"kind": self.kind, key: self.items}
+        if self.position is not None:
+            edit["position"] = self.position
+        return edit
+
+    def __repr__(self) -> str:
+        return f"Edit({self.kind!r}, {self.items!r}, position={self.position!r})"
+
+
+def _batches(items: Sequence, size: int = EDIT_BATCH_SIZE) -> Iterable[list]:
+    for start in range(0, len(items), size):
+        yield list(items[start:start + size])
+
+
+def _stable(ranks: Sequence[int]) -> List[bool]:
+    """Which elements of `ranks` (distinct) are part of one longest increasing subsequence."""
+    # tails[k]: element ending the increasing subsequence of length k + 1 with the smallest rank
+    tails: List[int] = []
+    tail_ranks: List[int] = []
+    previous = [-1] * len(ranks)
+    for i, rank in enumerate(ranks):
+        k = bisect.bisect_left(tail_ranks, rank)
+        if k > 0:
+            previous[i] = tails[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_ranks.append(rank)
+        else:
+            tails[k] = i
+            tail_ranks[k] = rank
+
+    stable = [False] * len(ranks)
+    i = tails[-1] if tails else -1
+    while i >= 0:
+        stable[i] = True
+        i = previous[i]
+    return stable
+
+
+def _index(tracks: Sequence[str]) -> Dict[str, int]:
+    return {track_id: index for index, track_id in enumerate(tracks)}
+
+
+def _ascending_runs(tracks: List[str], positions: Dict[str, int]) -> List[List[str]]:
+    """Split `tracks` into runs at increasing positions, each keeps its order when moved at once."""
+    runs: List[List[str]] = []
+    for track_id in tracks:
+        if runs and positions[track_id] > positions[runs[-1][-1]]:
+            runs[-1].append(track_id)
+        else:
+            runs.append([track_id])
+    return runs
+
+
+def _moved(tracks: List[str], moving: List[str], anchor: Optional[str]) -> List[str]:
+    """`tracks` with `moving` taken out and inserted before `anchor` (at the end if None)."""
+    moving_set = set(moving)
+    rest = [track_id for track_id in tracks if track_id not in moving_set]
+    at = rest.index(anchor) if anchor is not None else len(rest)
+    return rest[:at] + moving + rest[at:]
+
+
+def _additions(desired: List[str], present) -> List[Edit]:
+    """Inserts of the tracks of `desired` not in `present`, front to back, once the others are in order."""
+    edits = []
+    start = None
+    for position, track_id in enumerate(desired + [None]):
+        if track_id is not None and track_id not in present:
+            if start is None:
+                start = position
+            continue
+        if start is not None:
+            for offset, batch in enumerate(_batches(desired[start:position])):
+                edits.append(Edit(ADD, batch, start + offset * EDIT_BATCH_SIZE))
+            start = None
+    return edits
+
+
+def _incremental_edits(current: List[str], desired: List[str]) -> List[Edit]:
+    """Removes, moves and adds (see the module docstring), for deduplicated `desired`."""
+    target: Dict[str, int] = {track_id: position for position, track_id in enumerate(desired)}
+
+    edits: List[Edit] = []
+
+    # Keep the first occurrence of every wanted track
+    removed = []
+    kept = []
+    seen = set()
+    for index, track_id in enumerate(current):
+        if track_id in target and track_id not in seen:
+            seen.add(track_id)
+            kept.append(track_id)
+        else:
+            removed.append(index)
+    for batch in _batches(removed[::-1]):
+        edits.append(Edit(REMOVE, sorted(batch)))
+
+    # Move the kept tracks that are not part of the longest run already in order
+    stable = dict(zip(kept, _stable([target[track_id] for track_id in kept])))
+    state = kept
+
+    # Runs of consecutive moving tracks, each to be placed before the stable track after it
+    runs = []
+    run: List[str] = []
+    for track_id in desired:
+        if track_id not in stable:
+            continue
+        if stable[track_id]:
+            if run:
+                runs.append((run, track_id))
+                run = []
+        else:
+            run.append(track_id)
+    if run:
+        runs.append((run, None))
+
+    for run, anchor in runs:
+        batches = [
+            batch
+            for group in _ascending_runs(run, _index(state))
+            for batch in _batches(group)
+        ]
+        # Back to front, each batch goes before the track that follows it
+        for batch in reversed(batches):
+            positions = _index(state)
+            position = positions[anchor] if anchor is not None else len(state)
+            edits.append(Edit(MOVE, [positions[track_id] for track_id in batch], position))
+            state = _moved(state, batch, anchor)
+            anchor = batch[0]
+
+    # Insert the new tracks, front to back
+    edits += _additions(desired, stable)
+    return edits
+
+
+def plan_edits(current: Sequence, desired: Sequence) -> List[Edit]:
+    """
+    Edits that turn the playlist `current` (track IDs in playlist order) into
+    `desired`. Duplicates in `desired` are dropped, a track listed twice is only
+    in the playlist once.
+    """
+    current = [str(track_id) for track_id in current]
+    desired = list(dict.fromkeys(str(track_id) for track_id in desired))
+
+    edits = _incremental_edits(current, desired)
+    rewrite = [Edit(REMOVE, sorted(batch)) for batch in _batches(range(len(current) - 1, -1, -1))]
+    rewrite += _additions(desired, ())
+    return edits if len(edits) <= len(rewrite) else rewrite
+
+
+def apply_edits(playlist, edits: Sequence[Edit], applied: Optional[List[Edit]] = None) -> int:
+    """
+    Apply planned edits to a tidalapi UserPlaylist, one request per edit.
+    Returns the number of added tracks TIDAL skipped (IDs it doesn't know); the
+    inserts after a skipped track are shifted so the others still land in place.
+    Every edit that went through is appended to `applied`, so the caller knows
+    what was done when a later edit fails.
+    """
+    skipped = 0
+    for edit in edits:
+        if edit.kind == REMOVE:
+            ok = playlist.remove_by_indices(edit.items)
+        elif edit.kind == MOVE:
+            ok = playlist.move_by_indices(edit.items, edit.position)
+        else:
+            added = playlist.add(edit.items, position=edit.position - skipped, limit=len(edit.items))
+            edit.skipped = len(edit.items) - len(added)
+            skipped += edit.skipped
+            ok = True
+        if not ok:
+            raise RuntimeError(f"TIDAL rejected a playlist {edit.kind} of {len(edit.items)} items")
+        if applied is not None:
+            applied.append(edit)
+    return skipped
@@ -0,0 +1,113 @@
+"""
+Chunked, resumable population of new playlists.
+
+Tracks are added in chunks of `PLAYLIST_CHUNK_SIZE`, each retried on failure.
+Progress is kept in a job record, so if a chunk still fails the caller gets a
+job ID and a later request with that ID continues after the last committed
+chunk instead of creating the playlist again.
+
+Chunks are committed one after another: TIDAL guards playlist writes with an
+ETag and appends at the current end of the playlist, so concurrent writes to the
+same playlist would conflict or reorder tracks.
+"""
+import os
+import time
+import uuid
+import threading
+
+from typing import List, Optional
+
+from tidal_api.cache import TTLCache
+
+# Tracks per add request (TIDAL accepts at most 100)
+PLAYLIST_CHUNK_SIZE = int(os.environ.get("TIDAL_MCP_PLAYLIST_CHUNK_SIZE", 100))
+# Attempts per chunk and the base delay (seconds) of the exponential backoff between them
+PLAYLIST_CHUNK_ATTEMPTS = int(os.environ.get("TIDAL_MCP_PLAYLIST_CHUNK_ATTEMPTS", 3))
+PLAYLIST_CHUNK_BACKOFF = float(os.environ.get("TIDAL_MCP_PLAYLIST_CHUNK_BACKOFF", 0.5))
+# How long an unfinished job can be resumed (seconds)
+PLAYLIST_JOB_TTL = float(os.environ.get("TIDAL_MCP_PLAYLIST_JOB_TTL", 24 * 60 * 60))
+
+
+class JobBusyError(Exception):
+    """Raised when a job is resumed while it is still running."""
+
+
+class PlaylistJob:
+    """Progress of populating one playlist."""
+
+    def __init__(self, user_id, title: str, description: str, track_ids: List, chunk_size: int):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.title = title
+        self.description = description
+        self.track_ids = track_ids
+        self.chunk_size = max(1, min(int(chunk_size), 100))
+        self.playlist_id: Optional[str] = None
+        # Number of tracks of `track_ids` already added to the playlist
+        self.committed = 0
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "playlist_id": self.playlist_id,
+            "committed": self.committed,
+            "total": len(self.track_ids),
+            "chunk_size": self.chunk_size,
+            "error": self.error,
+        }
+
+    def run(self, session):
+        """
+        Create the playlist (unless a previous run already did) and add the
+        remaining chunks. Returns the playlist; raises the last error if a chunk
+        fails all its attempts, leaving the job resumable.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise JobBusyError(f"Playlist job {self.id} is already running")
+
+        try:
+            self.status = "running"
+            self.error = None
+
+            if self.playlist_id is None:
+                playlist = session.user.create_playlist(self.title, self.description)
+                self.playlist_id = playlist.id
+            else:
+                # Fresh ETag and track count for the resumed playlist
+                playlist = session.playlist(self.playlist_id)
+
+            while self.committed < len(self.track_ids):
+                chunk = self.track_ids[self.committed:self.committed + self.chunk_size]
+                playlist = self._add_chunk(session, playlist, chunk)
+                self.committed += len(chunk)
+
+            self.status = "completed"
+            return playlist
+
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            raise
+        finally:
+            self._lock.release()
+
+    def _add_chunk(self, session, playlist, chunk: List):
+        for attempt in range(PLAYLIST_CHUNK_ATTEMPTS):
+            try:
+                # Duplicates are skipped, so retrying a chunk that was in fact added is harmless
+                playlist.add(chunk, limit=len(chunk))
+                return playlist
+            except Exception:
+                if attempt == PLAYLIST_CHUNK_ATTEMPTS - 1:
+                    raise
+                time.sleep(PLAYLIST_CHUNK_BACKOFF * 2 ** attempt)
+                # The failed write may have left a stale ETag behind, reload the playlist
+                playlist = session.playlist(self.playlist_id)
+
+
+# Unfinished (and recently finished) jobs, by job ID
+playlist_jobs = TTLCache(PLAYLIST_JOB_TTL, max_entries=1000)
@@ -0,0 +1,199 @@
+"""
+Background warm-up of the caches, so the first recommendation of a session
+doesn't pay for every upstream call.
+
+After a login (or at startup, when the session file holds a valid session) a
+scheduler thread mirrors the favorites and playlists, puts the newest favorites
+in the track cache and fetches their radios into the radio cache. Every
+`PREFETCH_INTERVAL` seconds it runs again to refresh what is stale or about to
+expire, so the caches stay warm between conversations.
+
+Prefetching only uses spare capacity: a run waits until no API request has
+been in flight for `PREFETCH_IDLE` seconds, makes one upstream call at a time
+(library syncs included) and is cancelled as soon as a request comes in or
+fan-out work is queued on the upstream executor. Cancellation is checked
+between steps, so a library sync in progress finishes first. A cancelled run
+starts over once the API is idle again, skipping everything it already warmed.
+"""
+import os
+import time
+import logging
+import threading
+
+from typing import Callable, Optional
+
+from tidal_api.cache import radio_cache
+from tidal_api.library import library
+from tidal_api.session_manager import session_manager
+from tidal_api.tracks import remember_tracks
+from tidal_api.upstream import executor_stats
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.environ.get("TIDAL_MCP_PREFETCH", "1").lower() in ("1", "true", "yes")
+# Newest favorites whose radio is prefetched, and the radio size (as requested by recommend_tracks)
+PREFETCH_SEEDS = int(os.environ.get("TIDAL_MCP_PREFETCH_SEEDS", 20))
+PREFETCH_RADIO_LIMIT = int(os.environ.get("TIDAL_MCP_PREFETCH_RADIO_LIMIT", 20))
+# Most radios fetched by one run
+PREFETCH_BUDGET = int(os.environ.get("TIDAL_MCP_PREFETCH_BUDGET", 20))
+# Seconds between refresh runs (0 only warms up after a login or at startup)
+PREFETCH_INTERVAL = float(os.environ.get("TIDAL_MCP_PREFETCH_INTERVAL", 600))
+# Seconds without API requests before a run starts
+PREFETCH_IDLE = float(os.environ.get("TIDAL_MCP_PREFETCH_IDLE", 1))
+
+
+class Cancelled(Exception):
+    """Raised inside a run when real requests need the upstream capacity."""
+
+
+class Prefetcher:
+    """
+    Scheduler thread warming the caches for the current session (see the module docstring).
+    `fetch_radio(session, track_id, limit, refresh)` fetches a radio into the radio cache.
+
+    The API calls `request_started()` and `request_finished()` around every request,
+    which is how runs know when to start and when to get out of the way.
+    """
+
+    def __init__(
+        self,
+        fetch_radio: Callable,
+        seeds: int = PREFETCH_SEEDS,
+        radio_limit: int = PREFETCH_RADIO_LIMIT,
+        budget: int = PREFETCH_BUDGET,
+        interval: float = PREFETCH_INTERVAL,
+        idle: float = PREFETCH_IDLE,
+        enabled: bool = PREFETCH_ENABLED,
+    ):
+        self.fetch_radio = fetch_radio
+        self.seeds = seeds
+        self.radio_limit = radio_limit
+        self.budget = budget
+        self.interval = interval
+        self.idle = idle
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._in_flight = 0
+        self._last_request = float("-inf")
+        self.runs = {"completed": 0, "cancelled": 0, "failed": 0}
+        self.radios_fetched = 0
+        self.last_run_seconds: Optional[float] = None
+
+    # Request activity
+
+    def request_started(self) -> None:
+        with self._lock:
+            self._in_flight += 1
+
+    def request_finished(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._last_request = time.monotonic()
+
+    def _busy(self) -> bool:
+        with self._lock:
+            if self._in_flight > 0:
+                return True
+        upstream = executor_stats()
+        return bool(upstream["queued"] or upstream["active"])
+
+    def _check(self) -> None:
+        if self._busy():
+            raise Cancelled()
+
+    def _wait_until_idle(self) -> None:
+        while True:
+            with self._lock:
+                quiet_for = time.monotonic() - self._last_request
+            if quiet_for >= self.idle and not self._busy():
+                return
+            time.sleep(max(self.idle - quiet_for, 0.1))
+
+    # Scheduling
+
+    def start(self) -> None:
+        """Start the scheduler, which warms up right away if there is a valid session. Safe to call repeatedly."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="tidal-prefetch", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def schedule(self) -> None:
+        """Warm up as soon as the API is idle, e.g. after a login."""
+        self.start()
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.wait(self.interval or None)
+            self._wake.clear()
+            # A cancelled run starts over once the requests that got in the way are done
+            while not self._run():
+                pass
+
+    def _run(self) -> bool:
+        """One warm-up run, once the API is idle. Returns False if it was cancelled."""
+        self._wait_until_idle()
+        session = session_manager.get_session()
+        if session is None:
+            return True
+
+        started = time.perf_counter()
+        try:
+            fetched = self.warm_up(session)
+        except Cancelled:
+            self.runs["cancelled"] += 1
+            logger.debug("Prefetch cancelled, requests need the upstream capacity")
+            return False
+        except Exception as e:
+            # Retried at the next interval, the same error would likely happen again right away
+            self.runs["failed"] += 1
+            logger.warning("Error prefetching the TIDAL library: %s", e)
+            return True
+
+        self.runs["completed"] += 1
+        self.last_run_seconds = time.perf_counter() - started
+        logger.info("Prefetched %d track radios in %.2fs", fetched, self.last_run_seconds)
+        return True
+
+    def warm_up(self, session) -> int:
+        """
+        Sync the favorites and playlists if they are stale, and fetch the radios of the
+        newest favorites that are missing or expire before the next run, at most
+        `budget` of them. Returns the number of radios fetched.
+        Raises Cancelled if requests came in.
+        """
+        self._check()
+        # Syncs page through TIDAL one request at a time, like the rest of the run
+        favorites, _ = library.favorites(session, 0, self.seeds, max_concurrency=1)
+        # Seeds taken from favorites are resolved from the track cache
+        remember_tracks(favorites)
+
+        self._check()
+        library.ensure_playlists(session, max_concurrency=1)
+
+        fetched = 0
+        for record in favorites:
+            if fetched >= self.budget:
+                break
+            if radio_cache.expires_in(record.id, self.radio_limit) > self.interval:
+                continue
+            self._check()
+            self.fetch_radio(session, record.id, self.radio_limit, refresh=True)
+            fetched += 1
+            self.radios_fetched += 1
+        return fetched
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "runs": dict(self.runs),
+            "radios_fetched": self.radios_fetched,
+            "last_run_seconds": self.last_run_seconds,
+        }
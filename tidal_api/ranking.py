@@ -0,0 +1,104 @@
+"""
+Merging of several seeds' track radios into one ranked list.
+
+A track recommended by many seeds, near the top of their radios, is a stronger
+recommendation than one that shows up once near the bottom. Every radio a
+track appears in adds `rank_points(rank, limit)` to its score. Points are
+integers, so their sum (unlike a float sum) does not depend on the order the
+radios arrive in, and the same seeds always give the same list.
+"""
+import os
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from tidal_api.tracks import TrackRecord
+
+# Default number of tracks a ranked batch returns
+BATCH_TOP_K = int(os.environ.get("TIDAL_MCP_BATCH_TOP_K", 50))
+# Default cap on tracks by the same artist in a ranked batch (0 disables it)
+MAX_PER_ARTIST = int(os.environ.get("TIDAL_MCP_MAX_PER_ARTIST", 3))
+
+
+def rank_points(rank: int, limit: int) -> int:
+    """Points of the track at 0-based `rank` of a radio fetched with `limit` tracks: `limit` for the first, 1 for the last."""
+    return limit - rank
+
+
+class Candidate:
+    """A recommended track with its merged points and the seeds (and ranks) that recommended it."""
+
+    __slots__ = ("record", "limit", "points", "sources")
+
+    def __init__(self, record: TrackRecord, limit: int):
+        self.record = record
+        self.limit = limit
+        self.points = 0
+        # seed track ID -> rank of this track in that seed's radio
+        self.sources: Dict[str, int] = {}
+
+    @property
+    def score(self) -> float:
+        """The points in radios' units: 1 per radio that ranks the track first."""
+        return self.points / self.limit
+
+    @property
+    def best_rank(self) -> int:
+        return min(self.sources.values())
+
+    @property
+    def source_track_ids(self) -> List[str]:
+        """Recommending seeds, best ranked first."""
+        return sorted(self.sources, key=lambda seed_id: (self.sources[seed_id], seed_id))
+
+
+class RadioMerger:
+    """
+    Accumulates radios seed by seed and ranks the merged candidates.
+    The seeds themselves (and any `exclude`d IDs) are never candidates.
+    """
+
+    def __init__(self, limit_per_track: int, exclude: Iterable = ()):
+        self.limit_per_track = limit_per_track
+        self.exclude = {str(track_id) for track_id in exclude}
+        self.candidates: Dict[str, Candidate] = {}
+
+    def add(self, seed_id, records: Optional[Sequence[TrackRecord]]) -> None:
+        seed_id = str(seed_id)
+        self.exclude.add(seed_id)
+        for rank, record in enumerate((records or ())[:self.limit_per_track]):
+            track_id = str(record.id)
+            candidate = self.candidates.get(track_id)
+            if candidate is None:
+                candidate = self.candidates[track_id] = Candidate(record, self.limit_per_track)
+            # A seed counts once per track (at its best rank), even if given twice
+            if seed_id in candidate.sources:
+                continue
+            candidate.points += rank_points(rank, self.limit_per_track)
+            candidate.sources[seed_id] = rank
+
+    def top(self, top_k: int, max_per_artist: int = 0) -> List[Candidate]:
+        """
+        The `top_k` best candidates, highest score first (ties broken by the
+        number of seeds, the best rank and the track ID), keeping at most
+        `max_per_artist` tracks by the same artist when it is positive.
+        """
+        ranked = sorted(
+            (
+                candidate for track_id, candidate in self.candidates.items()
+                if track_id not in self.exclude
+            ),
+            key=lambda c: (-c.points, -len(c.sources), c.best_rank, str(c.record.id)),
+        )
+
+        result = []
+        per_artist: Dict[str, int] = {}
+        for candidate in ranked:
+            if len(result) >= top_k:
+                break
+            if max_per_artist > 0:
+                artist = (candidate.record.artist or "").casefold()
+                if per_artist.get(artist, 0) >= max_per_artist:
+                    continue
+                per_artist[artist] = per_artist.get(artist, 0) + 1
+            result.append(candidate)
+        return result
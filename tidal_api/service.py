@@ -0,0 +1,880 @@
+"""
+TIDAL operations shared by the Flask routes and the in-process (embedded) MCP mode.
+
+Every operation returns a `(payload, status_code)` tuple where the payload is a
+plain dict, so it can be returned from a Flask view as-is or handed straight to
+an MCP tool without any JSON round trip.
+"""
+import os
+import sys
+import time
+import logging
+
+from typing import Callable, Optional
+
+from tidalapi.exceptions import MetadataNotAvailable, ObjectNotFound
+
+from tidal_api.browser_session import BrowserSession
+from tidal_api.cache import radio_cache
+from tidal_api import metrics
+from tidal_api.graph import GRAPH_MAX_HOPS, GRAPH_MAX_NODES, expand, graph
+from tidal_api.encoding import PLAYLIST_FIELDS, parse_fields
+from tidal_api.library import PLAYLIST_SORTS, library, playlist_item_count
+from tidal_api.pagination import MAX_LISTING_ITEMS, fetch_range, next_cursor, resolve_offset
+from tidal_api.ranking import BATCH_TOP_K, MAX_PER_ARTIST, RadioMerger
+from tidal_api.playlist_diff import ADD, MOVE, REMOVE, apply_edits, plan_edits
+from tidal_api.playlist_jobs import (
+    PLAYLIST_CHUNK_ATTEMPTS,
+    PLAYLIST_CHUNK_BACKOFF,
+    PLAYLIST_CHUNK_SIZE,
+    JobBusyError,
+    PlaylistJob,
+    playlist_jobs,
+)
+from tidal_api.prefetch import Prefetcher
+from tidal_api.session_manager import session_manager, SESSION_FILE
+from tidal_api.tracks import track_cache, remember_tracks, resolve_track, radio_seed
+from tidal_api.upstream import bound_concurrency, call_with_retries, classify_error, map_unordered, single_flight
+from tidal_api.utils import format_track_data, bound_limit
+
+logger = logging.getLogger(__name__)
+
+
+def login(fn_print: Callable[[str], None] = logger.info):
+    """
+    Authenticate with TIDAL, opening a browser for the user to login if needed.
+    """
+    def log_message(msg):
+        fn_print(f"TIDAL AUTH: {msg}")
+
+    # Try to authenticate (will open browser if needed)
+    try:
+        # Reuse the current session if it is still valid
+        session = session_manager.get_session()
+        login_success = session is not None
+
+        if not login_success:
+            # Create our custom session object
+            session = BrowserSession()
+            login_success = session.login_session_file_auto(SESSION_FILE, fn_print=log_message)
+            if login_success:
+                session_manager.set_session(session)
+
+        if login_success:
+            # Warm up the caches for the first recommendations in the background
+            prefetcher.schedule()
+            return {
+                "status": "success",
+                "message": "Successfully authenticated with TIDAL",
+                "user_id": session.user.id
+            }, 200
+        else:
+            return {
+                "status": "error",
+                "message": "Authentication failed"
+            }, 401
+
+    except TimeoutError:
+        return {
+            "status": "error",
+            "message": "Authentication timed out"
+        }, 408
+
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }, 500
+
+
+# Identifies this API in /health, so a client can tell it apart from other services on the port
+SERVICE_NAME = "tidal_api"
+
+
+def health(engine: str):
+    """
+    Readiness probe: answers as soon as the app serves requests, without touching TIDAL.
+    """
+    return {
+        "status": "ok",
+        "service": SERVICE_NAME,
+        "engine": engine,
+        "pid": os.getpid(),
+    }, 200
+
+
+def auth_status():
+    """
+    Check if there's an active authenticated session.
+    """
+    if not SESSION_FILE.exists():
+        return {
+            "authenticated": False,
+            "message": "No session file found"
+        }, 200
+
+    # Reuse the process-wide session, only reloading it if the file changed
+    session = session_manager.get_session()
+
+    if session is not None:
+        # Get basic user info
+        user_info = {
+            "id": session.user.id,
+            "username": session.user.username if hasattr(session.user, 'username') else "N/A",
+            "email": session.user.email if hasattr(session.user, 'email') else "N/A"
+        }
+
+        return {
+            "authenticated": True,
+            "message": "Valid TIDAL session",
+            "user": user_info
+        }, 200
+    else:
+        return {
+            "authenticated": False,
+            "message": "Invalid or expired session"
+        }, 200
+
+
+def get_tracks(
+    session: BrowserSession,
+    limit: int = 10,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    max_age: Optional[float] = None,
+):
+    """
+    Get tracks from the user's favorites, starting at `offset` (or at `cursor`).
+    Served from the library mirror, synced first if it is older than `max_age` seconds.
+    """
+    try:
+        offset = resolve_offset(offset, cursor)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    try:
+        # TODO: Add streaminig history support if TIDAL API allows it
+        # Get user favorites or history (for now limiting to user favorites only)
+        limit = bound_limit(limit, MAX_LISTING_ITEMS)
+
+        tracks, total = library.favorites(session, offset, limit, max_age)
+        track_list = [format_track_data(track) for track in tracks]
+
+        return {
+            "tracks": track_list,
+            "offset": offset,
+            "total": total,
+            "next_cursor": next_cursor(offset, len(track_list), limit, total),
+        }, 200
+    except Exception as e:
+        return {"error": f"Error fetching tracks: {str(e)}"}, 500
+
+
+def _track_radio(session: BrowserSession, track_id, limit: int, refresh: bool = False):
+    """
+    Return the track radio for `track_id` as TrackRecords, served from the radio cache when possible
+    (unless `refresh` is set). Concurrent requests for the same radio share one upstream call.
+    Returns None if the track does not exist or has no radio.
+    """
+    if not refresh:
+        cached = radio_cache.get(track_id, limit)
+        if cached is not None:
+            return cached
+
+    def fetch():
+        # The radio only needs the seed's ID, so don't fetch its metadata
+        try:
+            recommendations = call_with_retries(lambda: radio_seed(session, track_id).get_track_radio(limit=limit))
+        except (MetadataNotAvailable, ObjectNotFound):
+            return None
+
+        records = tuple(remember_tracks(recommendations))
+        radio_cache.set(track_id, limit, records)
+        try:
+            graph.add_radio(track_id, limit, records)
+        except Exception as e:
+            # The graph only saves later calls, the radio itself is fine
+            logger.warning("Error storing the radio of track %s in the graph: %s", track_id, e)
+        return records
+
+    return single_flight.do("radio", (id(session), str(track_id), limit), fetch)
+
+
+# Background warm-up of the library mirror and the radios of the newest favorites
+prefetcher = Prefetcher(_track_radio)
+
+
+def get_track_recommendations(session: BrowserSession, track_id: str, limit: int = 10):
+    """
+    Get recommended tracks for a single track using TIDAL's track radio feature.
+    """
+    try:
+        limit = bound_limit(limit)
+
+        # Get recommendations using track radio
+        recommendations = _track_radio(session, track_id, limit)
+        if recommendations is None:
+            return {"error": f"Track with ID {track_id} not found"}, 404
+
+        # Format track data
+        track_list = [format_track_data(track) for track in recommendations]
+        return {"recommendations": track_list}, 200
+    except Exception as e:
+        return {"error": f"Error fetching recommendations: {str(e)}"}, 500
+
+
+def _parse_batch_request(request_data: dict):
+    """
+    Validate a batch recommendations request body.
+    Returns `(options, None)` on success or `(None, (error, status_code))`.
+    """
+    if not request_data or 'track_ids' not in request_data:
+        return None, ({"error": "Missing track_ids in request body"}, 400)
+
+    track_ids = request_data['track_ids']
+    if not isinstance(track_ids, list):
+        return None, ({"error": "track_ids must be a list"}, 400)
+
+    try:
+        top_k = int(request_data.get('top_k', BATCH_TOP_K))
+        max_per_artist = int(request_data.get('max_per_artist', MAX_PER_ARTIST))
+    except (TypeError, ValueError):
+        return None, ({"error": "top_k and max_per_artist must be integers"}, 400)
+
+    try:
+        limit_per_track = int(request_data.get('limit_per_track', 20))
+        # Cap on this request's share of the shared upstream executor
+        max_concurrency = bound_concurrency(request_data.get('max_concurrency'))
+    except (TypeError, ValueError):
+        return None, ({"error": "limit_per_track and max_concurrency must be integers"}, 400)
+
+    rank = request_data.get('rank', True)
+    if not isinstance(rank, bool):
+        return None, ({"error": "rank must be a boolean"}, 400)
+
+    return {
+        "track_ids": track_ids,
+        # Get limit per track from request body
+        "limit_per_track": bound_limit(limit_per_track),
+        # Optional parameter to remove duplicates across recommendations
+        "remove_duplicates": request_data.get('remove_duplicates', True),
+        # Merge all seeds into one scored top-K list instead of per-seed lists
+        "rank": rank,
+        "top_k": bound_limit(top_k, MAX_LISTING_ITEMS),
+        "max_per_artist": max(0, max_per_artist),
+        "max_concurrency": max_concurrency,
+    }, None
+
+
+def _iter_batch_recommendations(
+    session: BrowserSession,
+    track_ids: list,
+    limit_per_track: int,
+    remove_duplicates: bool,
+    max_concurrency: int,
+    merger: Optional[RadioMerger] = None,
+):
+    """
+    Fetch recommendations for every seed concurrently and yield one chunk per seed
+    as soon as its radio call completes:
+
+        {"seed_track_id": ..., "seed_track": {...} or None, "status": ..., "recommendations": [...]}
+
+    `status` is "ok", "not_found", or the class of the error the seed's radio failed
+    with after retries ("rate_limit", "transient" or "permanent", see upstream.py),
+    in which case the chunk also has the `error` message and no recommendations.
+
+    When `remove_duplicates` is set, a track only appears in the first chunk that has it.
+    With a `merger`, the radios are added to it instead, and the chunks carry the
+    number of tracks in the seed's radio (`candidate_count`) in place of `recommendations`.
+    """
+    def get_track_recommendations(track_id):
+        """Function to get recommendations, seed metadata and status for a single track"""
+        try:
+            recommendations = _track_radio(session, track_id, limit_per_track)
+            if recommendations is None:
+                return None, (), {"status": "not_found"}
+            # Seeds taken from favorites or playlists are already in the track cache
+            return resolve_track(session, track_id), recommendations, {"status": "ok"}
+        except Exception as e:
+            logger.warning("Error getting recommendations for track %s: %s", track_id, e)
+            return None, (), {"status": classify_error(e), "error": str(e) or type(e).__name__}
+
+    seen_track_ids = set()
+
+    # Fan out on the shared upstream executor, with a cap on this request's concurrency
+    for seed_id, future in map_unordered(get_track_recommendations, track_ids, max_concurrency):
+        seed, records, status = future.result()
+        seed_track = format_track_data(seed) if seed is not None else None
+
+        if merger is not None:
+            merger.add(seed_id, records)
+            yield {"seed_track_id": seed_id, "seed_track": seed_track, **status, "candidate_count": len(records)}
+            continue
+
+        chunk_recommendations = []
+        for track_data in (format_track_data(record, source_track_id=seed_id) for record in records):
+            track_id = track_data.get('id')
+
+            # Skip if we've already seen this track and want to remove duplicates
+            if remove_duplicates and track_id in seen_track_ids:
+                continue
+
+            chunk_recommendations.append(track_data)
+            seen_track_ids.add(track_id)
+
+        yield {
+            "seed_track_id": seed_id,
+            "seed_track": seed_track,
+            **status,
+            "recommendations": chunk_recommendations,
+        }
+
+
+def _seed_status(chunk: dict) -> dict:
+    """The per-seed status entry of a batch chunk."""
+    return {
+        key: chunk[key]
+        for key in ("seed_track_id", "status", "error")
+        if key in chunk
+    }
+
+
+def _batch_ranking(options: dict):
+    """
+    Take the ranking options out of parsed batch request `options`.
+    Returns `(merger, top_k, max_per_artist)`, the merger being None for unranked requests.
+    """
+    rank, top_k, max_per_artist = options.pop("rank"), options.pop("top_k"), options.pop("max_per_artist")
+    merger = RadioMerger(options["limit_per_track"], exclude=options["track_ids"]) if rank else None
+    return merger, top_k, max_per_artist
+
+
+def _ranked_recommendations(merger: RadioMerger, top_k: int, max_per_artist: int) -> list:
+    recommendations = []
+    for candidate in merger.top(top_k, max_per_artist):
+        track_data = format_track_data(candidate.record, source_track_id=candidate.source_track_ids[0])
+        track_data.update(score=round(candidate.score, 4), seed_count=len(candidate.sources))
+        recommendations.append(track_data)
+    return recommendations
+
+
+def get_batch_recommendations(session: BrowserSession, request_data: dict):
+    """
+    Get recommended tracks for a list of track IDs using concurrent requests.
+
+    By default the seeds' radios are merged into one list of at most `top_k` tracks,
+    scored by how many seeds recommend a track and how high (see tidal_api.ranking),
+    without the seeds themselves and with at most `max_per_artist` tracks per artist.
+    With `"rank": false` every seed's radio is returned as fetched instead.
+
+    The per-seed calls run on the shared upstream executor; `max_concurrency` in the
+    request body lowers this request's share of it (default TIDAL_MCP_REQUEST_CONCURRENCY).
+    """
+    try:
+        options, error = _parse_batch_request(request_data)
+        if error:
+            return error
+        merger, top_k, max_per_artist = _batch_ranking(options)
+
+        all_recommendations = []
+        seeds = {}
+        statuses = {}
+        for chunk in _iter_batch_recommendations(session, merger=merger, **options):
+            seeds[chunk["seed_track_id"]] = chunk["seed_track"]
+            statuses[chunk["seed_track_id"]] = _seed_status(chunk)
+            all_recommendations.extend(chunk.get("recommendations", ()))
+
+        # Seed metadata in request order, for callers that only had the IDs
+        seed_tracks = [
+            seeds[track_id]
+            for track_id in dict.fromkeys(options["track_ids"])
+            if seeds.get(track_id) is not None
+        ]
+
+        # Which seeds failed, and why, in request order
+        seed_status = [statuses[track_id] for track_id in dict.fromkeys(options["track_ids"])]
+        result = {
+            "seed_tracks": seed_tracks,
+            "seed_status": seed_status,
+            "failed_seed_count": sum(1 for status in seed_status if status["status"] != "ok"),
+        }
+        if merger is None:
+            return {"recommendations": all_recommendations, **result}, 200
+        return {
+            "recommendations": _ranked_recommendations(merger, top_k, max_per_artist),
+            **result,
+            "candidate_count": len(merger.candidates),
+        }, 200
+    except Exception as e:
+        return {"error": f"Error fetching batch recommendations: {str(e)}"}, 500
+
+
+def stream_batch_recommendations(session: BrowserSession, request_data: dict):
+    """
+    Streaming variant of `get_batch_recommendations`.
+
+    Returns `(chunks, 200)` where `chunks` is a generator yielding one chunk per seed
+    as soon as it is ready (see `_iter_batch_recommendations`), followed by a final
+    `{"done": true, ...}` summary, or an `{"error": ...}` chunk if the batch fails
+    midway. Invalid requests return the usual `(error, status_code)` tuple.
+
+    Ranked requests can only be ranked once every radio is in, so their per-seed
+    chunks only report progress and the summary carries the `recommendations`.
+    """
+    options, error = _parse_batch_request(request_data)
+    if error:
+        return error
+    merger, top_k, max_per_artist = _batch_ranking(options)
+
+    def chunks():
+        total_count = 0
+        failed_seed_count = 0
+        try:
+            for chunk in _iter_batch_recommendations(session, merger=merger, **options):
+                total_count += len(chunk.get("recommendations", ()))
+                failed_seed_count += chunk["status"] != "ok"
+                yield chunk
+            summary = {
+                "done": True,
+                "seed_count": len(options["track_ids"]),
+                "failed_seed_count": failed_seed_count,
+            }
+            if merger is not None:
+                recommendations = _ranked_recommendations(merger, top_k, max_per_artist)
+                summary.update(recommendations=recommendations, candidate_count=len(merger.candidates))
+                total_count = len(recommendations)
+        except Exception as e:
+            yield {"error": f"Error fetching batch recommendations: {str(e)}"}
+            return
+
+        summary["total_count"] = total_count
+        yield summary
+
+    return chunks(), 200
+
+
+def _parse_expand_request(request_data: Optional[dict]):
+    """
+    Validate an expand request body.
+    Returns `(options, None)` on success or `(None, (error, status_code))`.
+    """
+    request_data = request_data or {}
+    track_ids = request_data.get('track_ids') or []
+    if not isinstance(track_ids, list):
+        return None, ({"error": "track_ids must be a list"}, 400)
+
+    try:
+        seeds = [int(track_id) for track_id in track_ids]
+        # Without explicit seeds, start from the newest favorites
+        from_favorites = int(request_data.get('from_favorites', 0 if seeds else 20))
+        hops = int(request_data.get('hops', 2))
+        limit_per_track = int(request_data.get('limit_per_track', 10))
+        max_nodes = int(request_data.get('max_nodes', 200))
+        limit = int(request_data.get('limit', 50))
+    except (TypeError, ValueError):
+        return None, ({"error": "track_ids and the numeric options must be integers"}, 400)
+
+    if not seeds and from_favorites <= 0:
+        return None, ({"error": "Provide track_ids or from_favorites"}, 400)
+
+    return {
+        "seeds": seeds,
+        "from_favorites": bound_limit(from_favorites, MAX_LISTING_ITEMS) if from_favorites > 0 else 0,
+        "hops": max(1, min(hops, GRAPH_MAX_HOPS)),
+        "limit_per_track": bound_limit(limit_per_track),
+        "max_nodes": bound_limit(max_nodes, GRAPH_MAX_NODES),
+        "limit": bound_limit(limit, GRAPH_MAX_NODES),
+        "max_concurrency": bound_concurrency(request_data.get('max_concurrency')),
+    }, None
+
+
+def expand_recommendations(session: BrowserSession, request_data: dict):
+    """
+    Multi-hop recommendations: tracks reachable within `hops` track radios of the
+    seeds (`track_ids` and/or the newest `from_favorites` favorites), ranked by
+    weighted in-degree. Radios come from the recommendation graph where stored,
+    only the others are fetched.
+    """
+    options, error = _parse_expand_request(request_data)
+    if error:
+        return error
+
+    try:
+        seeds = list(options["seeds"])
+        if options["from_favorites"]:
+            favorites, _ = library.favorites(session, 0, options["from_favorites"])
+            seeds += [int(track.id) for track in favorites]
+
+        limit_per_track = options["limit_per_track"]
+        # Radios that failed after retries, by error class
+        failed = {}
+
+        def fetch_radios(track_ids):
+            radios = {}
+            for track_id, future in map_unordered(
+                lambda track_id: _track_radio(session, track_id, limit_per_track),
+                track_ids,
+                options["max_concurrency"],
+            ):
+                try:
+                    records = future.result()
+                except Exception as e:
+                    logger.warning("Error getting recommendations for track %s: %s", track_id, e)
+                    kind = classify_error(e)
+                    failed[kind] = failed.get(kind, 0) + 1
+                    continue
+                radios[track_id] = [int(record.id) for record in records or ()]
+            return radios
+
+        reached, stats = expand(
+            graph, seeds, options["hops"], limit_per_track, options["max_nodes"], fetch_radios
+        )
+
+        ranked = sorted(reached.items(), key=lambda item: (-item[1]["score"], item[1]["hop"], item[0]))[:options["limit"]]
+        records = graph.tracks([track_id for track_id, _ in ranked])
+        recommendations = []
+        for track_id, entry in ranked:
+            record = records.get(track_id) or track_cache.get(str(track_id))
+            if record is None:
+                continue
+            track_data = format_track_data(record)
+            track_data.update(score=round(entry["score"], 4), in_degree=entry["in_degree"], hop=entry["hop"])
+            recommendations.append(track_data)
+
+        return {
+            "recommendations": recommendations,
+            "seed_count": len(set(seeds)),
+            "reached": len(reached),
+            **stats,
+            "failed_radios": failed,
+        }, 200
+    except Exception as e:
+        return {"error": f"Error expanding recommendations: {str(e)}"}, 500
+
+
+def _playlist_info(playlist) -> dict:
+    return {
+        "id": playlist.id,
+        "title": playlist.name,
+        "description": playlist.description,
+        "created": playlist.created,
+        "last_updated": playlist.last_updated,
+        "track_count": playlist.num_tracks,
+        "duration": playlist.duration,
+    }
+
+
+def create_playlist(session: BrowserSession, request_data: dict):
+    """
+    Create a new TIDAL playlist and add tracks to it in chunks.
+
+    If adding a chunk keeps failing, the response includes the job, and posting
+    {"job_id": ...} resumes it after the last committed chunk.
+    """
+    try:
+        if not request_data:
+            return {"error": "Missing request body"}, 400
+
+        if request_data.get('job_id'):
+            job = playlist_jobs.get(request_data['job_id'])
+            if job is None or job.user_id != session.user.id:
+                return {"error": f"Playlist job {request_data['job_id']} not found or expired"}, 404
+        else:
+            # Validate required fields
+            if 'title' not in request_data:
+                return {"error": "Missing 'title' in request body"}, 400
+
+            if 'track_ids' not in request_data or not request_data['track_ids']:
+                return {"error": "Missing 'track_ids' in request body or empty track list"}, 400
+
+            # Get parameters from request
+            title = request_data['title']
+            description = request_data.get('description', '')  # Optional
+            track_ids = request_data['track_ids']
+
+            # Validate track_ids is a list
+            if not isinstance(track_ids, list):
+                return {"error": "'track_ids' must be a list"}, 400
+
+            try:
+                chunk_size = int(request_data.get('chunk_size', PLAYLIST_CHUNK_SIZE))  # Optional
+            except (TypeError, ValueError):
+                return {"error": "'chunk_size' must be an integer"}, 400
+
+            job = PlaylistJob(session.user.id, title, description, track_ids, chunk_size)
+            playlist_jobs.set(job.id, job)
+
+        # Create the playlist and add the tracks
+        try:
+            playlist = job.run(session)
+        except JobBusyError as e:
+            return {"error": str(e), "job": job.to_dict()}, 409
+        except Exception as e:
+            return {
+                "error": f"Error creating playlist: {str(e)}",
+                "job": job.to_dict(),
+            }, 500
+        finally:
+            library.invalidate_playlists(session.user.id)
+
+        # Return playlist information
+        return {
+            "status": "success",
+            "message": f"Playlist '{job.title}' created successfully with {len(job.track_ids)} tracks",
+            "playlist": _playlist_info(playlist),
+            "job": job.to_dict(),
+        }, 200
+
+    except Exception as e:
+        return {"error": f"Error creating playlist: {str(e)}"}, 500
+
+
+def get_playlist_job(session: BrowserSession, job_id: str):
+    """
+    Get the progress of a playlist creation job.
+    """
+    job = playlist_jobs.get(job_id)
+    if job is None or job.user_id != session.user.id:
+        return {"error": f"Playlist job {job_id} not found or expired"}, 404
+    return {"job": job.to_dict()}, 200
+
+
+def get_user_playlists(
+    session: BrowserSession,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    sort: str = "last_updated",
+    order: Optional[str] = None,
+    fields=None,
+    max_age: Optional[float] = None,
+):
+    """
+    Get the user's playlists, most recently updated first unless `sort` (last_updated,
+    created, title, track_count or duration) and `order` (asc or desc) say otherwise,
+    starting at `offset` (or at `cursor`). `fields` keeps only some playlist fields.
+    Served from the library mirror, synced first if it is older than `max_age` seconds.
+    """
+    try:
+        offset = resolve_offset(offset, cursor)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    projection, error = parse_fields(fields, PLAYLIST_FIELDS)
+    if error:
+        return error
+    if sort not in PLAYLIST_SORTS:
+        return {"error": f"sort must be one of: {', '.join(PLAYLIST_SORTS)}"}, 400
+    if order not in (None, "", "asc", "desc"):
+        return {"error": "order must be 'asc' or 'desc'"}, 400
+
+    try:
+        limit = bound_limit(limit, MAX_LISTING_ITEMS)
+        playlists, total = library.playlists(session, offset, limit, sort, order or None, projection, max_age)
+
+        # Format playlist data
+        playlist_list = []
+        for playlist in playlists:
+            playlist_info = dict(playlist, url=f"https://tidal.com/playlist/{playlist['id']}")
+            if projection is not None:
+                playlist_info = {field: playlist_info[field] for field in projection}
+            playlist_list.append(playlist_info)
+
+        return {
+            "playlists": playlist_list,
+            "offset": offset,
+            "total_playlists": total,
+            "next_cursor": next_cursor(offset, len(playlist_list), limit, total),
+        }, 200
+    except Exception as e:
+        return {"error": f"Error fetching playlists: {str(e)}"}, 500
+
+
+def get_playlist_tracks(
+    session: BrowserSession,
+    playlist_id: str,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    max_age: Optional[float] = None,
+):
+    """
+    Get tracks from a specific TIDAL playlist, starting at `offset` (or at `cursor`).
+    Served from the library mirror, synced first if it is older than `max_age` seconds.
+    """
+    try:
+        offset = resolve_offset(offset, cursor)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    try:
+        limit = bound_limit(limit, MAX_LISTING_ITEMS)
+
+        try:
+            result = library.playlist_items(session, playlist_id, offset, limit, max_age)
+        except ObjectNotFound:
+            result = None
+        if result is None:
+            return {"error": f"Playlist with ID {playlist_id} not found"}, 404
+        tracks, total = result
+
+        # Format track data
+        track_list = [format_track_data(track) for track in tracks]
+
+        return {
+            "playlist_id": playlist_id,
+            "tracks": track_list,
+            "offset": offset,
+            "total_tracks": total,
+            "next_cursor": next_cursor(offset, len(track_list), limit, total),
+        }, 200
+
+    except Exception as e:
+        return {"error": f"Error fetching playlist tracks: {str(e)}"}, 500
+
+
+def _playlist_track_ids(playlist) -> list:
+    """Track IDs of a playlist in order, read from TIDAL rather than from the mirror."""
+    tracks, _ = fetch_range(
+        lambda page_offset, page_limit: (playlist.items(limit=page_limit, offset=page_offset), playlist_item_count(playlist)),
+        0,
+        sys.maxsize,
+    )
+    return [track.id for track in tracks]
+
+
+def _edit_counts(edits) -> dict:
+    def count(kind):
+        return sum(len(edit.items) for edit in edits if edit.kind == kind)
+    skipped = sum(edit.skipped for edit in edits)
+    return {"removed": count(REMOVE), "moved": count(MOVE), "added": count(ADD) - skipped, "not_found": skipped}
+
+
+def update_playlist(session: BrowserSession, playlist_id: str, request_data: dict):
+    """
+    Make a playlist's tracks match `track_ids` (in that order) with the fewest edit
+    requests, keeping the playlist and its ID (see tidal_api.playlist_diff).
+    `title` and `description` are changed when given. With `dry_run` the edits are
+    planned and returned, but not applied.
+
+    If an edit fails, the playlist is read again and the edits re-planned from the
+    state TIDAL actually has, instead of repeating an edit that may have been applied.
+    """
+    if not request_data or 'track_ids' not in request_data:
+        return {"error": "Missing 'track_ids' in request body"}, 400
+
+    track_ids = request_data['track_ids']
+    if not isinstance(track_ids, list):
+        return {"error": "'track_ids' must be a list"}, 400
+    dry_run = bool(request_data.get('dry_run', False))
+
+    try:
+        try:
+            # The mirror only fetches the items again if the playlist changed since the last read
+            result = library.playlist_items(session, playlist_id, 0, sys.maxsize, max_age=0)
+            playlist = call_with_retries(lambda: session.playlist(playlist_id)) if result is not None else None
+        except ObjectNotFound:
+            playlist = None
+        if not playlist:
+            return {"error": f"Playlist with ID {playlist_id} not found"}, 404
+        if not hasattr(playlist, 'remove_by_indices'):
+            return {"error": f"Playlist with ID {playlist_id} is not one of the user's playlists and can't be edited"}, 403
+        if playlist.num_videos is not None and playlist.num_videos > 0:
+            # tidalapi clamps insert and move positions to the track count, which misplaces items around videos
+            return {"error": f"Playlist with ID {playlist_id} contains videos and can't be updated track by track"}, 409
+
+        edits = plan_edits([record.id for record in result[0]], track_ids)
+        if dry_run:
+            return {
+                "status": "success",
+                "dry_run": True,
+                "playlist": _playlist_info(playlist),
+                "changes": _edit_counts(edits),
+                "edit_requests": len(edits),
+                "edits": [edit.to_dict() for edit in edits],
+            }, 200
+
+        try:
+            title = request_data.get('title')
+            description = request_data.get('description')
+            if title or description:
+                playlist.edit(title, description)
+                # edit() leaves the playlist's ETag as it was, the next edit would be sent with a stale one
+                playlist = call_with_retries(lambda: session.playlist(playlist_id))
+
+            # Edits that went through, across re-plans
+            applied = []
+            for attempt in range(PLAYLIST_CHUNK_ATTEMPTS):
+                try:
+                    apply_edits(playlist, edits, applied)
+                    break
+                except Exception as e:
+                    if attempt == PLAYLIST_CHUNK_ATTEMPTS - 1:
+                        raise
+                    logger.warning("Error updating playlist %s, re-planning the edits: %s", playlist_id, e)
+                    time.sleep(PLAYLIST_CHUNK_BACKOFF * 2 ** attempt)
+                    playlist = call_with_retries(lambda: session.playlist(playlist_id))
+                    edits = plan_edits(_playlist_track_ids(playlist), track_ids)
+        finally:
+            library.invalidate_playlist(playlist_id)
+            library.invalidate_playlists(session.user.id)
+
+        changes = _edit_counts(applied)
+        return {
+            "status": "success",
+            "message": (
+                f"Playlist updated: {changes['added']} tracks added, "
+                f"{changes['removed']} removed and {changes['moved']} moved"
+            ),
+            "playlist": _playlist_info(playlist),
+            "changes": changes,
+            "edit_requests": len(applied),
+        }, 200
+
+    except Exception as e:
+        return {"error": f"Error updating playlist: {str(e)}"}, 500
+
+
+def delete_playlist(session: BrowserSession, playlist_id: str):
+    """
+    Delete a TIDAL playlist by its ID.
+    """
+    try:
+        # Get the playlist object
+        playlist = session.playlist(playlist_id)
+        if not playlist:
+            return {"error": f"Playlist with ID {playlist_id} not found"}, 404
+
+        # Delete the playlist
+        playlist.delete()
+        library.forget_playlist(playlist_id)
+
+        return {
+            "status": "success",
+            "message": f"Playlist with ID {playlist_id} was successfully deleted"
+        }, 200
+
+    except Exception as e:
+        return {"error": f"Error deleting playlist: {str(e)}"}, 500
+
+
+def cache_stats():
+    """
+    Hit/miss counters and sizes of the in-memory caches, the size of the recommendation graph,
+    how many upstream calls were coalesced and what the background prefetch did.
+    """
+    return {
+        "radio": radio_cache.stats(),
+        "tracks": track_cache.stats(),
+        "graph": graph.stats(),
+        "single_flight": single_flight.stats(),
+        "prefetch": prefetcher.stats(),
+    }, 200
+
+
+def metrics_summary():
+    """
+    Request and upstream call counts and latencies, runtime gauges and cache stats.
+    """
+    return metrics.summary(), 200
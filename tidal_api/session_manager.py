@@ -0,0 +1,154 @@
+import os
+import logging
+import datetime
+import tempfile
+import threading
+
+from pathlib import Path
+from typing import Optional
+
+from tidal_api.browser_session import BrowserSession
+
+logger = logging.getLogger(__name__)
+
+token_path = os.path.join(tempfile.gettempdir(), 'tidal-session-oauth.json')
+SESSION_FILE = Path(token_path)
+
+# Refresh the OAuth token this many seconds before it expires
+TOKEN_REFRESH_MARGIN = int(os.environ.get("TIDAL_MCP_TOKEN_REFRESH_MARGIN", 300))
+
+
+class SessionManager:
+    """
+    Process-wide, thread-safe holder of the authenticated TIDAL session.
+
+    The session is loaded from the session file once and kept in memory.
+    It is only reloaded when the file's mtime changes, the file is only
+    rewritten when the tokens actually changed, and the OAuth access token
+    is refreshed in the background ahead of its expiry.
+    """
+
+    def __init__(self, session_file: Path, refresh_margin: int = TOKEN_REFRESH_MARGIN):
+        self.session_file = session_file
+        self.refresh_margin = refresh_margin
+        self._lock = threading.RLock()
+        self._session: Optional[BrowserSession] = None
+        self._mtime: Optional[int] = None
+        self._refresh_timer: Optional[threading.Timer] = None
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return self.session_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def get_session(self) -> Optional[BrowserSession]:
+        """
+        Return the authenticated session, loading it from the session file if needed.
+
+        Returns None if there is no session file or the stored session is invalid.
+        """
+        mtime = self._file_mtime()
+        if mtime is None:
+            self.clear()
+            return None
+
+        # Fast path: the in-memory session matches the file on disk
+        session = self._session
+        if session is not None and mtime == self._mtime:
+            return session
+
+        with self._lock:
+            # Another thread may have reloaded the session while we waited
+            if self._session is not None and mtime == self._mtime:
+                return self._session
+
+            session = BrowserSession()
+            try:
+                login_success = session.load_session_from_file(self.session_file)
+            except Exception as e:
+                logger.warning("Error loading TIDAL session from %s: %s", self.session_file, e)
+                login_success = False
+
+            if not login_success:
+                self._drop()
+                return None
+
+            # tidalapi only sets expiry_time when it had to refresh the token
+            # while loading, in which case the file holds a stale access token
+            if session.expiry_time is not None:
+                self._persist(session)
+            else:
+                self._mtime = mtime
+
+            self._session = session
+            self._schedule_refresh(session)
+            return session
+
+    def set_session(self, session: BrowserSession) -> None:
+        """
+        Adopt a freshly authenticated session, e.g. after an interactive login.
+        The session file is expected to have been written already.
+        """
+        with self._lock:
+            self._session = session
+            self._mtime = self._file_mtime()
+            self._schedule_refresh(session)
+
+    def clear(self) -> None:
+        """Forget the in-memory session."""
+        with self._lock:
+            self._drop()
+
+    def _drop(self) -> None:
+        self._session = None
+        self._mtime = None
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+    def _persist(self, session: BrowserSession) -> None:
+        session.save_session_to_file(self.session_file)
+        self._mtime = self._file_mtime()
+
+    def _schedule_refresh(self, session: BrowserSession) -> None:
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+        if not session.refresh_token:
+            return
+
+        # The session file does not store the expiry time, so when it is unknown
+        # refresh right away (in the background) to learn it
+        delay = 0.0
+        if session.expiry_time is not None:
+            remaining = session.expiry_time - datetime.datetime.utcnow()
+            delay = max(remaining.total_seconds() - self.refresh_margin, 0.0)
+
+        timer = threading.Timer(delay, self._refresh, args=(session,))
+        timer.daemon = True
+        self._refresh_timer = timer
+        timer.start()
+
+    def _refresh(self, session: BrowserSession) -> None:
+        try:
+            refreshed = session.token_refresh(session.refresh_token)
+        except Exception as e:
+            logger.warning("Error refreshing TIDAL token: %s", e)
+            refreshed = False
+
+        with self._lock:
+            # The session was replaced or dropped while we were refreshing
+            if session is not self._session:
+                return
+
+            if not refreshed:
+                self._drop()
+                return
+
+            self._persist(session)
+            self._schedule_refresh(session)
+
+
+session_manager = SessionManager(SESSION_FILE)
@@ -0,0 +1,92 @@
+"""
+Compact track metadata records and the shared track metadata cache.
+
+Every response that contains tracks (favorites, playlist items, radio results)
+is recorded here, so later lookups of the same tracks don't need a network call.
+"""
+import os
+
+from typing import Iterable, List, Optional
+
+from tidalapi.exceptions import ObjectNotFound
+
+from tidal_api.cache import TTLCache
+from tidal_api.upstream import call_with_retries, single_flight
+
+# Track metadata: time to live (seconds) and max number of tracks kept
+TRACK_CACHE_TTL = float(os.environ.get("TIDAL_MCP_TRACK_CACHE_TTL", 24 * 60 * 60))
+TRACK_CACHE_MAX_ENTRIES = int(os.environ.get("TIDAL_MCP_TRACK_CACHE_ENTRIES", 50000))
+
+
+class TrackRecord:
+    """
+    The track metadata we actually use, without the session, album and artist
+    objects a tidalapi Track carries around.
+    """
+
+    __slots__ = ("id", "title", "artist", "album", "duration")
+
+    def __init__(self, id, title: str, artist: str, album: str, duration: int):
+        self.id = id
+        self.title = title
+        self.artist = artist
+        self.album = album
+        self.duration = duration
+
+    @classmethod
+    def from_track(cls, track) -> "TrackRecord":
+        """Build a record from a tidalapi Track (or Video)."""
+        return cls(
+            track.id,
+            track.name,
+            track.artist.name if hasattr(track.artist, 'name') else "Unknown",
+            track.album.name if hasattr(track.album, 'name') else "Unknown",
+            track.duration if hasattr(track, 'duration') else 0,
+        )
+
+    def __repr__(self) -> str:
+        return f"TrackRecord(id={self.id!r}, title={self.title!r}, artist={self.artist!r})"
+
+
+# Sizes are not tracked (records are small and uniform), only the entry count is bounded
+track_cache = TTLCache(TRACK_CACHE_TTL, max_entries=TRACK_CACHE_MAX_ENTRIES)
+
+
+def remember_tracks(tracks: Iterable) -> List[TrackRecord]:
+    """Convert tidalapi tracks to records and add them to the track cache."""
+    records = []
+    for track in tracks:
+        record = track if isinstance(track, TrackRecord) else TrackRecord.from_track(track)
+        track_cache.set(str(record.id), record)
+        records.append(record)
+    return records
+
+
+def resolve_track(session, track_id) -> Optional[TrackRecord]:
+    """
+    Return the metadata record for `track_id`, fetching it from TIDAL only if
+    it hasn't been seen before (once for concurrent lookups of the same track).
+    Returns None if the track does not exist.
+    """
+    record = track_cache.get(str(track_id))
+    if record is not None:
+        return record
+
+    def fetch():
+        try:
+            track = call_with_retries(lambda: session.track(track_id))
+        except ObjectNotFound:
+            return None
+        return remember_tracks([track])[0]
+
+    return single_flight.do("track", (id(session), str(track_id)), fetch)
+
+
+def radio_seed(session, track_id):
+    """
+    A tidalapi Track bound to `session` with only its ID set, which is all
+    `get_track_radio()` needs. Unlike `session.track(track_id)` it makes no request.
+    """
+    seed = session.track()
+    seed.id = track_id
+    return seed
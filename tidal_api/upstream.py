@@ -0,0 +1,391 @@
+"""
+Shared machinery for calls to the TIDAL API: a process-wide bounded executor
+for fan-out work, a token-bucket rate limiter applied to every HTTP request
+a session makes, single-flight coalescing of identical concurrent calls, and
+retries of failed calls.
+
+Failed calls are classified as rate limited (429), transient (5xx, timeouts,
+connection errors) or permanent. The first two are retried with jittered
+exponential backoff, or after the `Retry-After` TIDAL asked for. Rate limits
+and transient errors also halve the fan-out concurrency, which then grows back
+by about one call per round of successful calls (AIMD).
+"""
+import os
+import time
+import random
+import threading
+import email.utils
+import concurrent.futures
+
+from typing import Callable, Dict, Hashable, Iterable, Iterator, Optional, Tuple
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from tidalapi.exceptions import TooManyRequests
+
+from tidal_api.metrics import rate_limit_wait, upstream_duration, upstream_operation, upstream_retry_delay
+
+# Maximum number of threads making upstream calls, across all requests
+UPSTREAM_WORKERS = int(os.environ.get("TIDAL_MCP_UPSTREAM_WORKERS", 16))
+# Default cap on concurrent upstream calls for a single API request
+REQUEST_CONCURRENCY = int(os.environ.get("TIDAL_MCP_REQUEST_CONCURRENCY", 8))
+# Sustained upstream request rate (requests/second, 0 disables the limit) and burst size
+UPSTREAM_RATE = float(os.environ.get("TIDAL_MCP_UPSTREAM_RATE", 20))
+UPSTREAM_BURST = int(os.environ.get("TIDAL_MCP_UPSTREAM_BURST", 40))
+# Retries of rate limited and transient upstream errors, base of the backoff and longest wait (seconds)
+UPSTREAM_RETRIES = int(os.environ.get("TIDAL_MCP_UPSTREAM_RETRIES", 3))
+UPSTREAM_RETRY_BACKOFF = float(os.environ.get("TIDAL_MCP_UPSTREAM_RETRY_BACKOFF", 0.5))
+UPSTREAM_RETRY_MAX_DELAY = float(os.environ.get("TIDAL_MCP_UPSTREAM_RETRY_MAX_DELAY", 10))
+# Adapt the fan-out concurrency to TIDAL's pushback, instead of always allowing UPSTREAM_WORKERS calls
+ADAPTIVE_CONCURRENCY = os.environ.get("TIDAL_MCP_ADAPTIVE_CONCURRENCY", "1").lower() in ("1", "true", "yes")
+
+# Upstream error classes
+RATE_LIMIT = "rate_limit"
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+# Retry-After of the last 429/503 response received by this thread, and that response's status
+_retry_hint = threading.local()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `acquire()` blocks until a token is available,
+    allowing bursts of up to `capacity` requests and `rate` requests/second
+    on average.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTP adapter that takes a token from the shared bucket before every request."""
+
+    def __init__(self, bucket: TokenBucket, **kwargs):
+        self.bucket = bucket
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        with rate_limit_wait.time():
+            self.bucket.acquire()
+
+        operation = upstream_operation(request.method, request.url)
+        status = "error"
+        started = time.perf_counter()
+        _retry_hint.seconds = None
+        _retry_hint.status = None
+        try:
+            response = super().send(request, **kwargs)
+            status = str(response.status_code)
+            # tidalapi may fail to parse an error body (an HTML gateway page) and raise
+            # a JSONDecodeError instead, keep the status to classify the error by
+            _retry_hint.status = response.status_code
+            if response.status_code in (429, 503):
+                # tidalapi raises without the response, keep the header for call_with_retries
+                _retry_hint.seconds = parse_retry_after(response.headers.get("Retry-After"))
+            return response
+        finally:
+            upstream_duration.observe(time.perf_counter() - started, operation=operation, status=status)
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call for `(operation, key)` is
+    in flight, further calls with the same operation and key wait for it and get
+    its result, or its exception, instead of making their own. Nothing is kept
+    once the call returns, caching is left to the caller.
+
+    Counts per operation the calls that were made and those that were coalesced.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Tuple[str, Hashable], _Flight] = {}
+        self._calls: Dict[str, int] = {}
+        self._coalesced: Dict[str, int] = {}
+
+    def do(self, operation: str, key: Hashable, fn: Callable[[], object]):
+        with self._lock:
+            flight = self._flights.get((operation, key))
+            leader = flight is None
+            if leader:
+                flight = self._flights[(operation, key)] = _Flight()
+                self._calls[operation] = self._calls.get(operation, 0) + 1
+            else:
+                self._coalesced[operation] = self._coalesced.get(operation, 0) + 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[(operation, key)]
+            flight.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                operation: {"calls": calls, "coalesced": self._coalesced.get(operation, 0)}
+                for operation, calls in self._calls.items()
+            }
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit adjusted by additive increase / multiplicative decrease:
+    every success raises the limit by 1/limit (about one slot per round of
+    calls), pushback from TIDAL multiplies it by `decrease`, at most once per
+    `cooldown` seconds so a burst of errors from calls already in flight only
+    counts once. Calls hold a slot with `with limit:`.
+    """
+
+    def __init__(self, maximum: int, minimum: int = 1, decrease: float = 0.5, cooldown: float = 1.0):
+        self.maximum = max(maximum, 1)
+        self.minimum = max(min(minimum, self.maximum), 1)
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.limit = float(self.maximum)
+        self.decreases = 0
+        self._in_use = 0
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self._in_use >= int(self.limit):
+                self._condition.wait()
+            self._in_use += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self._in_use -= 1
+            self._condition.notify()
+
+    def on_success(self) -> None:
+        with self._condition:
+            if self.limit < self.maximum:
+                slots = int(self.limit)
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                if int(self.limit) > slots:
+                    self._condition.notify()
+
+    def on_pushback(self) -> None:
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self.decreases += 1
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {"limit": int(self.limit), "in_use": self._in_use, "decreases": self.decreases}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delay in seconds or HTTP date), None if absent or invalid."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    RATE_LIMIT, TRANSIENT (worth retrying) or PERMANENT, from the status of the
+    error response when call_with_retries recorded one, else from the exception.
+    """
+    status = getattr(error, "upstream_status", None)
+    if status is not None and status >= 400:
+        if status == 429:
+            return RATE_LIMIT
+        if status >= 500 or status == 408:
+            return TRANSIENT
+        return PERMANENT
+    if isinstance(error, TooManyRequests):
+        return RATE_LIMIT
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        if status == 429:
+            return RATE_LIMIT
+        if status >= 500 or status == 408:
+            return TRANSIENT
+        return PERMANENT
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return TRANSIENT
+    return PERMANENT
+
+
+def _retry_delay(attempt: int) -> float:
+    hint = getattr(_retry_hint, "seconds", None)
+    if hint is not None:
+        return min(hint, UPSTREAM_RETRY_MAX_DELAY)
+    # Full jitter: retries of calls that failed together don't all come back at once
+    return random.uniform(0, min(UPSTREAM_RETRY_BACKOFF * 2 ** attempt, UPSTREAM_RETRY_MAX_DELAY))
+
+
+def call_with_retries(fn: Callable[[], object], retries: int = UPSTREAM_RETRIES):
+    """
+    Call `fn`, retrying rate limited and transient errors up to `retries` times
+    (see the module docstring). Reports successes and pushback to the adaptive
+    fan-out limit. The last error is raised once the retries are used up.
+    """
+    for attempt in range(retries + 1):
+        _retry_hint.seconds = None
+        _retry_hint.status = None
+        try:
+            result = fn()
+        except Exception as e:
+            # Travels with the error, which may be classified in another thread (futures, single flight)
+            e.upstream_status = getattr(_retry_hint, "status", None)
+            kind = classify_error(e)
+            if kind == PERMANENT:
+                raise
+            adaptive_limit.on_pushback()
+            if attempt == retries:
+                raise
+            delay = _retry_delay(attempt)
+            upstream_retry_delay.observe(delay, kind=kind)
+            time.sleep(delay)
+        else:
+            adaptive_limit.on_success()
+            return result
+
+
+rate_limiter = TokenBucket(UPSTREAM_RATE, UPSTREAM_BURST)
+
+# Fan-out calls running at once, across all requests
+adaptive_limit = AdaptiveLimit(UPSTREAM_WORKERS, minimum=1 if ADAPTIVE_CONCURRENCY else UPSTREAM_WORKERS)
+
+single_flight = SingleFlight()
+
+executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=UPSTREAM_WORKERS,
+    thread_name_prefix="tidal-upstream",
+)
+
+# Calls submitted through map_unordered that are waiting for a worker / running
+_executor_lock = threading.Lock()
+_queued = 0
+_active = 0
+
+
+def executor_stats() -> dict:
+    with _executor_lock:
+        return {"queued": _queued, "active": _active}
+
+
+def _tracked(fn: Callable) -> Callable:
+    def run(item):
+        global _queued, _active
+        # Queued until the adaptive limit has a slot free
+        with adaptive_limit:
+            with _executor_lock:
+                _queued -= 1
+                _active += 1
+            try:
+                return fn(item)
+            finally:
+                with _executor_lock:
+                    _active -= 1
+    return run
+
+
+def install_rate_limiter(http_session) -> None:
+    """
+    Route all HTTPS requests of a `requests.Session` through the shared rate limiter.
+    The connection pool is sized so that every upstream worker can keep a connection.
+    """
+    adapter = RateLimitedAdapter(rate_limiter, pool_maxsize=UPSTREAM_WORKERS)
+    http_session.mount("https://", adapter)
+
+
+def bound_concurrency(max_concurrency) -> int:
+    """Clamp a requested per-request concurrency to what the shared executor allows."""
+    if max_concurrency is None:
+        max_concurrency = REQUEST_CONCURRENCY
+    return max(1, min(int(max_concurrency), UPSTREAM_WORKERS))
+
+
+def map_unordered(
+    fn: Callable,
+    items: Iterable,
+    max_concurrency: int = REQUEST_CONCURRENCY,
+) -> Iterator[Tuple[object, concurrent.futures.Future]]:
+    """
+    Run `fn` over `items` on the shared executor, keeping at most `max_concurrency`
+    calls in flight for this caller. Yields `(item, future)` pairs as they complete.
+    """
+    items = iter(items)
+    in_flight = {}
+    run = _tracked(fn)
+
+    def submit_next() -> bool:
+        global _queued
+        for item in items:
+            with _executor_lock:
+                _queued += 1
+            in_flight[executor.submit(run, item)] = item
+            return True
+        return False
+
+    for _ in range(max_concurrency):
+        if not submit_next():
+            break
+
+    while in_flight:
+        done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            item = in_flight.pop(future)
+            submit_next()
+            yield item, future
@@ -1,21 +1,31 @@
+import logging
+
+from tidal_api.encoding import TRACK_URL
+from tidal_api.tracks import TrackRecord
+
+logger = logging.getLogger(__name__)
+
 def format_track_data(track, source_track_id=None):
     """
     Format a track object into a standardized dictionary.
     
     Args:
-        track: TIDAL track object
+        track: TIDAL track object or TrackRecord
         source_track_id: Optional ID of the track that led to this recommendation
         
     Returns:
         Dictionary with standardized track information
     """
+    if not isinstance(track, TrackRecord):
+        track = TrackRecord.from_track(track)
+    
     track_data = {
         "id": track.id,
-        "title": track.name,
-        "artist": track.artist.name if hasattr(track.artist, 'name') else "Unknown",
-        "album": track.album.name if hasattr(track.album, 'name') else "Unknown",
-        "duration": track.duration if hasattr(track, 'duration') else 0,
-        "url": f"https://tidal.com/browse/track/{track.id}?u"
+        "title": track.title,
+        "artist": track.artist,
+        "album": track.album,
+        "duration": track.duration,
+        "url": TRACK_URL.format(id=track.id)
     }
     
     # Include source track ID if provided
@@ -30,5 +40,5 @@ def bound_limit(limit: int, max_n: int = 50) -> int:
         limit = 1
     elif limit > max_n:
         limit = max_n
-    print(f"Limit set to {limit} (max {max_n})")    
+    logger.debug("Limit set to %d (max %d)", limit, max_n)
     return limit
@@ -0,0 +1,107 @@
+"""
+Production serving mode for the Flask app in app.py: waitress, a multi-threaded
+WSGI server, instead of Flask's development server (no debugger, no reloader).
+
+Requests are handled by `TIDAL_MCP_WSGI_THREADS` worker threads in one process.
+It is a single process on purpose: the caches, the upstream rate limiter, the
+library mirror and the playlist jobs are process-wide state that more processes
+would split up (and the rate limit would be multiplied).
+
+On SIGTERM (sent when the MCP server shuts the backend down) or SIGINT, the
+server stops accepting connections, lets in-flight requests finish for up to
+`TIDAL_MCP_SHUTDOWN_TIMEOUT` seconds and exits.
+
+Run with `python -m tidal_api.wsgi` (requires waitress).
+"""
+import os
+import time
+import signal
+import logging
+import threading
+
+from waitress import wasyncore
+from waitress.server import create_server as create_waitress_server
+
+from tidal_api import service
+from tidal_api.app import app
+
+# Worker threads handling requests
+WSGI_THREADS = int(os.environ.get("TIDAL_MCP_WSGI_THREADS", 16))
+# Open connections at most, further ones wait in the listen backlog
+WSGI_CONNECTIONS = int(os.environ.get("TIDAL_MCP_WSGI_CONNECTIONS", 100))
+# How long in-flight requests get to finish on shutdown, in seconds
+SHUTDOWN_TIMEOUT = float(os.environ.get("TIDAL_MCP_SHUTDOWN_TIMEOUT", 10))
+
+logger = logging.getLogger("tidal_api.wsgi")
+
+
+def create_server(port: int, socket_path: str = None, threads: int = WSGI_THREADS):
+    """A waitress server for the app on 127.0.0.1:`port`, or on the Unix socket at `socket_path`."""
+    listen = {"unix_socket": socket_path} if socket_path else {"host": "127.0.0.1", "port": port}
+    return create_waitress_server(
+        app,
+        threads=threads,
+        connection_limit=WSGI_CONNECTIONS,
+        ident="tidal_api",
+        **listen,
+    )
+
+
+def _busy(server) -> bool:
+    """Whether requests are queued, running or still sending their response."""
+    dispatcher = server.task_dispatcher
+    if dispatcher.active_count or dispatcher.queue:
+        return True
+    return any(
+        getattr(channel, "requests", None) or getattr(channel, "total_outbufs_len", 0)
+        for channel in list(server._map.values())
+    )
+
+
+def _drain_and_close(server, timeout: float) -> None:
+    # Closing the listening socket runs on the server loop, like everything touching its sockets
+    server.trigger.pull_trigger(lambda: wasyncore.dispatcher.close(server))
+
+    deadline = time.monotonic() + timeout
+    while _busy(server) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if _busy(server):
+        logger.warning("Shutdown timeout reached with requests still in flight")
+
+    # With every channel closed the server loop ends, and serve() returns
+    server.trigger.pull_trigger(lambda: wasyncore.close_all(server._map))
+
+
+def serve(server, shutdown_timeout: float = SHUTDOWN_TIMEOUT) -> None:
+    """Run `server` until SIGTERM or SIGINT, then shut it down gracefully."""
+    def shutdown(signum, frame):
+        logger.info("Received %s, finishing in-flight requests", signal.Signals(signum).name)
+        # The signal handler runs on the server loop, which has to keep going while draining
+        threading.Thread(target=_drain_and_close, args=(server, shutdown_timeout), daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    server.run()
+    server.task_dispatcher.shutdown(timeout=shutdown_timeout)
+    logger.info("Server stopped")
+
+
+if __name__ == '__main__':
+    from tidal_api.logs import configure_logging
+
+    configure_logging()
+
+    # Get port from environment variable or use default
+    port = int(os.environ.get("TIDAL_MCP_PORT", 5050))
+
+    # Optionally listen on a Unix domain socket instead of TCP
+    socket_path = os.environ.get("TIDAL_MCP_SOCKET")
+    server = create_server(port, socket_path)
+    # Warm up the caches in the background if a stored session is still valid
+    service.prefetcher.start()
+    logger.info(
+        "Starting WSGI app on %s with %d threads",
+        f"unix socket {socket_path}" if socket_path else f"port {port}", WSGI_THREADS,
+    )
+    serve(server)